@@ -0,0 +1,349 @@
+"""FrozeCrate - Command line interface
+
+Headless entry point for scripts and build agents. Nothing imported from
+here may pull in PySide6.
+
+Exit codes: 0 success, 1 failure, 2 usage error, 3 updates available
+(check), 4 unknown app (install).
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import secrets
+import socket
+import socketserver
+import sys
+import threading
+import time
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+DAEMON_FILE = os.path.join("data", "daemon.json")
+DAEMON_TIMEOUT = 600  # seconds a client waits for a command, installs can be slow
+SPECS_TTL = 3600  # seconds the daemon keeps system specs in memory
+CHECK_TTL = 900  # seconds the daemon reuses update check results (GitHub lookups are rate limited)
+
+EXIT_OK = 0
+EXIT_FAILURE = 1
+EXIT_USAGE = 2
+EXIT_UPDATES_AVAILABLE = 3
+EXIT_NOT_FOUND = 4
+
+
+def import_pre():
+    """The pre/ modules import each other as top-level core/services packages"""
+    pre_dir = os.path.join(ROOT_DIR, "pre")
+    if pre_dir not in sys.path:
+        sys.path.append(pre_dir)
+
+
+def file_version(path):
+    """(mtime, size) of a file, so cached data can tell it changed; None if missing"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+class WarmCache:
+    """Results kept between requests when running as a daemon"""
+
+    def __init__(self):
+        self.entries = {}
+        self.lock = threading.Lock()
+
+    def get(self, key, loader, ttl, version=None):
+        """Cached value for key, reloaded once ttl passed or version changed"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry and entry[1] == version and time.monotonic() - entry[0] < ttl:
+                return entry[2]
+        value = loader()
+        with self.lock:
+            self.entries[key] = (time.monotonic(), version, value)
+        return value
+
+    def clear(self, key=None):
+        with self.lock:
+            if key is None:
+                self.entries.clear()
+            else:
+                self.entries.pop(key, None)
+
+
+# Shared by every request a daemon serves; a one-shot run just fills it once
+_cache = WarmCache()
+_write_lock = threading.Lock()
+
+
+def catalog_version():
+    import_pre()
+    from core import metadata_handler
+
+    return file_version(metadata_handler.METADATA_FILE)
+
+
+def load_catalog():
+    """The app metadata, read again only when its file changes; treat it as read-only"""
+    import_pre()
+    from core import metadata_handler
+
+    return _cache.get("catalog", metadata_handler.load_metadata, float("inf"), catalog_version())
+
+
+def cmd_sync(args):
+    from engine.update_checker import UpdateChecker
+
+    checker = UpdateChecker()
+    with _write_lock:
+        checker.check_for_updates(force=args.get("force", False))
+    _cache.clear("check")
+    return (EXIT_FAILURE if checker.last_status == "failed" else EXIT_OK), {"status": checker.last_status}
+
+
+def cmd_check(args):
+    import_pre()
+    from services import update_checker
+
+    def check():
+        return [
+            {"id": app["id"], "name": app.get("name"), "version": app.get("version"),
+             "latest_version": app.get("latest_version")}
+            for app in update_checker.check_updates()
+        ]
+
+    if args.get("refresh"):
+        _cache.clear("check")
+    updates = _cache.get("check", check, CHECK_TTL, catalog_version())
+    return (EXIT_UPDATES_AVAILABLE if updates else EXIT_OK), {"updates": updates}
+
+
+def cmd_install(args):
+    import_pre()
+    from core import installer, metadata_handler
+
+    app = metadata_handler.get_app_metadata(args["app_id"])
+    if app is None:
+        return EXIT_NOT_FOUND, {"error": f"Unknown app: {args['app_id']}"}
+    with _write_lock:
+        installed = installer.install_app(app, args.get("version"))
+    _cache.clear("check")
+    return (EXIT_OK if installed else EXIT_FAILURE), {"app_id": app["id"], "installed": installed}
+
+
+def cmd_specs(args):
+    from engine.spec_checker import check_system_specs
+
+    if args.get("refresh"):
+        _cache.clear("specs")
+    return EXIT_OK, {"specs": _cache.get("specs", check_system_specs, SPECS_TTL)}
+
+
+def cmd_compat(args):
+    from engine.compatibility import evaluate_catalog
+    from engine.spec_checker import check_system_specs
+
+    apps = load_catalog()
+    results = evaluate_catalog(apps, _cache.get("specs", check_system_specs, SPECS_TTL), catalog_version())
+    statuses = args.get("status") or None
+    compat = [
+        {"id": app["id"], "name": app.get("name"), **results[app["id"]]}
+        for app in apps
+        if statuses is None or results[app["id"]]["status"] in statuses
+    ]
+    return EXIT_OK, {"apps": compat}
+
+
+COMMANDS = {
+    "sync": cmd_sync,
+    "check": cmd_check,
+    "install": cmd_install,
+    "specs": cmd_specs,
+    "compat": cmd_compat,
+}
+
+
+def run_command(command, args):
+    """Run a command in this process; returns (exit_code, result)"""
+    try:
+        return COMMANDS[command](args)
+    except Exception as e:
+        return EXIT_FAILURE, {"error": f"{type(e).__name__}: {e}"}
+
+
+class DaemonHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        try:
+            request = json.loads(self.rfile.readline())
+            if not secrets.compare_digest(str(request.get("token", "")), self.server.token):
+                response = {"exit_code": EXIT_USAGE, "result": {"error": "Invalid token"}}
+            elif request.get("command") == "ping":
+                response = {"exit_code": EXIT_OK, "result": {"pid": os.getpid()}}
+            elif request.get("command") == "shutdown":
+                response = {"exit_code": EXIT_OK, "result": {"stopping": True}}
+                threading.Thread(target=self.server.shutdown, daemon=True).start()
+            elif request.get("command") in COMMANDS:
+                exit_code, result = run_command(request["command"], request.get("args", {}))
+                response = {"exit_code": exit_code, "result": result}
+            else:
+                response = {"exit_code": EXIT_USAGE, "result": {"error": f"Unknown command: {request.get('command')}"}}
+        except (ValueError, AttributeError) as e:
+            response = {"exit_code": EXIT_USAGE, "result": {"error": f"Bad request: {e}"}}
+        self.wfile.write(json.dumps(response).encode() + b"\n")
+
+
+class DaemonServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, port=0, daemon_file=DAEMON_FILE):
+        super().__init__(("127.0.0.1", port), DaemonHandler)
+        self.token = secrets.token_hex(16)
+        self.daemon_file = daemon_file
+
+    def write_daemon_file(self):
+        os.makedirs(os.path.dirname(self.daemon_file) or ".", exist_ok=True)
+        tmp_path = f"{self.daemon_file}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"port": self.server_address[1], "token": self.token, "pid": os.getpid()}, f)
+        if os.name != "nt":
+            os.chmod(tmp_path, 0o600)
+        os.replace(tmp_path, self.daemon_file)
+
+    def remove_daemon_file(self):
+        try:
+            with open(self.daemon_file, "r", encoding="utf-8") as f:
+                if json.load(f).get("pid") != os.getpid():
+                    return
+            os.remove(self.daemon_file)
+        except (OSError, ValueError):
+            pass
+
+
+def serve(port=0, daemon_file=DAEMON_FILE):
+    """Run the daemon until it receives a shutdown request"""
+    server = DaemonServer(port, daemon_file)
+    server.write_daemon_file()
+    print(f"FrozeCrate daemon listening on 127.0.0.1:{server.server_address[1]}", file=sys.stderr)
+    # Command output (progress bars, log lines) belongs on the daemon's console, not in replies
+    with contextlib.redirect_stdout(sys.stderr):
+        try:
+            server.serve_forever()
+        finally:
+            server.server_close()
+            server.remove_daemon_file()
+    return EXIT_OK
+
+
+def send_request(command, args=None, daemon_file=DAEMON_FILE, timeout=DAEMON_TIMEOUT):
+    """Send a command to a running daemon; returns (exit_code, result) or None if none is running"""
+    try:
+        with open(daemon_file, "r", encoding="utf-8") as f:
+            info = json.load(f)
+        with socket.create_connection(("127.0.0.1", info["port"]), timeout=timeout) as sock:
+            request = {"token": info["token"], "command": command, "args": args or {}}
+            sock.sendall(json.dumps(request).encode() + b"\n")
+            with sock.makefile("rb") as reader:
+                response = json.loads(reader.readline())
+    except (OSError, ValueError, KeyError):
+        return None
+    return response["exit_code"], response["result"]
+
+
+def print_human(command, exit_code, result):
+    if "error" in result:
+        print(f"Error: {result['error']}", file=sys.stderr)
+    elif command == "sync":
+        print(f"Catalog sync: {result['status']}")
+    elif command == "check":
+        if not result["updates"]:
+            print("All apps are up to date.")
+        for app in result["updates"]:
+            print(f"{app['name'] or app['id']}: {app['version']} -> {app['latest_version']}")
+    elif command == "install":
+        print(f"{result['app_id']}: {'installed' if result['installed'] else 'installation failed'}")
+    elif command == "specs":
+        from engine.spec_checker import print_specs_summary
+        print_specs_summary(result["specs"])
+    elif command == "compat":
+        for app in result["apps"]:
+            missing = ", ".join(app["failed"] or app["below_recommended"])
+            print(f"{app['name'] or app['id']}: {app['status']}" + (f" ({missing})" if missing else ""))
+    else:
+        print(json.dumps(result, indent=2))
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="frozecrate", description="FrozeCrate headless interface")
+    parser.add_argument("--json", action="store_true", help="Print the result as JSON")
+    parser.add_argument("--no-daemon", action="store_true", help="Run locally even if a daemon is running")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    sync = subparsers.add_parser("sync", help="Sync the app catalog from the configured repositories")
+    sync.add_argument("--force", action="store_true", help="Ignore the update check interval")
+
+    check = subparsers.add_parser("check", help="List installed apps with updates available (exit code 3 if any)")
+    check.add_argument("--refresh", action="store_true", help="Don't use the daemon's cached results")
+
+    install = subparsers.add_parser("install", help="Install or update an app")
+    install.add_argument("app_id")
+    install.add_argument("--version", help="Install a specific (cached) version")
+
+    specs = subparsers.add_parser("specs", help="Show the system specifications")
+    specs.add_argument("--refresh", action="store_true", help="Don't use the daemon's cached specs")
+
+    compat = subparsers.add_parser("compat", help="Check the catalog against this machine's hardware")
+    compat.add_argument("--status", action="append", choices=["recommended", "supported", "unsupported", "unknown"],
+                        help="Only list apps with this status (repeatable)")
+
+    serve_cache = subparsers.add_parser("serve-cache", help="Serve installers to this network")
+    serve_cache.add_argument("--port", type=int, help="Port to listen on (default: the lan_cache_port setting)")
+    serve_cache.add_argument("--no-discovery", action="store_true", help="Don't answer discovery broadcasts")
+
+    daemon = subparsers.add_parser("daemon", help="Run or control the background daemon")
+    daemon.add_argument("action", choices=["start", "stop", "status"], nargs="?", default="start")
+    daemon.add_argument("--port", type=int, default=0, help="Port to listen on (default: any free port)")
+    return parser
+
+
+def main(argv=None):
+    try:
+        args = build_parser().parse_args(argv)
+    except SystemExit as e:
+        return e.code if isinstance(e.code, int) else EXIT_USAGE
+
+    if args.command == "serve-cache":
+        from engine import cache_server
+        cache_server.serve(args.port, discovery=not args.no_discovery)
+        return EXIT_OK
+
+    if args.command == "daemon":
+        if args.action == "start":
+            return serve(args.port)
+        reply = send_request("shutdown" if args.action == "stop" else "ping", timeout=10)
+        if reply is None:
+            print("Daemon is not running.", file=sys.stderr)
+            return EXIT_FAILURE
+        print(json.dumps(reply[1]) if args.json else f"Daemon {'stopping' if args.action == 'stop' else 'running'}")
+        return reply[0]
+
+    command_args = {key: value for key, value in vars(args).items()
+                    if key not in ("command", "json", "no_daemon")}
+    reply = None if args.no_daemon else send_request(args.command, command_args)
+    if reply is None:
+        # Keep stdout clean for the JSON result, progress output goes to stderr
+        with contextlib.redirect_stdout(sys.stderr if args.json else sys.stdout):
+            reply = run_command(args.command, command_args)
+    exit_code, result = reply
+
+    if args.json:
+        print(json.dumps({"command": args.command, "exit_code": exit_code, "result": result}, indent=2))
+    else:
+        print_human(args.command, exit_code, result)
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1 +1,6 @@
 """Module initialization file"""
+
+from .settings import (
+    DEFAULT_SETTINGS, SETTINGS_FILE, SettingsService, get_setting, get_settings_service,
+    load_settings, save_settings, subscribe,
+)
@@ -1,2 +1,226 @@
 """FrozeCrate - Settings"""
 
+import atexit
+import json
+import os
+import threading
+from pathlib import Path
+
+from utils.logger import log_event
+
+# Settings live in the project, never relative to the working directory
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+SETTINGS_FILE = PROJECT_ROOT / "data" / "settings.json"
+
+# Older settings files that are merged into SETTINGS_FILE once and then renamed
+LEGACY_SETTINGS_FILES = [
+    PROJECT_ROOT / "settings.json",
+    PROJECT_ROOT / "data" / "setting.json",
+    PROJECT_ROOT / "data" / "user_data" / "settings.json",
+]
+
+# Legacy key -> (current key, converter)
+LEGACY_KEYS = {
+    "update_checker": ("auto_update_check", bool),
+    "update_interval_hours": ("check_interval_minutes", lambda hours: int(float(hours) * 60)),
+}
+
+WRITE_DELAY = 0.5  # seconds to wait for more changes before writing
+
+DEFAULT_SETTINGS = {
+    "theme": "dark",
+    "auto_update_check": True,
+    "check_interval_minutes": 60,
+    # Bandwidth caps in KB/s, 0 means unlimited
+    "download_limit_kbps": 0,
+    "background_limit_kbps": 0,
+    # Cap for catalog syncs and prefetch while a user-initiated download runs
+    "busy_background_limit_kbps": 64,
+    # Download pending update installers while the machine is idle. Only apps whose catalog
+    # entry has a downloads[latest_version] entry with a sha256 can be prefetched
+    "prefetch_updates": False,
+    "prefetch_max_cpu_percent": 25,
+    "prefetch_max_network_kbps": 256,
+    "prefetch_on_battery": False,
+    # Where portable (zip/7z) apps are unpacked, empty for the default location
+    "portable_install_dir": "",
+    # Office cache server to try before the internet, e.g. "http://10.0.0.5:47912".
+    # Plain http, so only installers with a catalog sha256 are taken from it
+    "lan_cache_url": "",
+    # Look for a cache server on the local network when no URL is set
+    "lan_cache_discovery": False,
+    # Port `cli.py serve-cache` listens on
+    "lan_cache_port": 47912
+}
+
+def read_json_file(path):
+    """Read a JSON object from path, or None if missing or invalid."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+    return data if isinstance(data, dict) else None
+
+def is_settings_file(data):
+    """Whether a JSON object holds FrozeCrate settings, so other files are never migrated or renamed."""
+    return bool(data) and not data.keys().isdisjoint(DEFAULT_SETTINGS.keys() | LEGACY_KEYS.keys())
+
+class SettingsService:
+    """
+    In-memory settings shared by the whole app.
+
+    The file is read once; reads are plain dict lookups. Changes notify
+    subscribers right away and are written back after WRITE_DELAY, so a
+    burst of changes results in a single atomic write.
+    """
+
+    def __init__(self, path=SETTINGS_FILE, legacy_files=None, write_delay=WRITE_DELAY):
+        self.path = Path(path)
+        self.legacy_files = LEGACY_SETTINGS_FILES if legacy_files is None else legacy_files
+        self.write_delay = write_delay
+        self.lock = threading.RLock()
+        self.listeners = []
+        self.timer = None
+        self.dirty = False
+        self.data = self.load()
+
+    def load(self):
+        """Read the settings file, migrating legacy files on the way."""
+        stored = read_json_file(self.path) or {}
+        migrated = self.migrate_legacy(stored)
+        data = {**DEFAULT_SETTINGS, **stored}
+        if migrated:
+            self.data = data
+            if not self.write():
+                # Keep the legacy files, the next start tries again
+                return data
+            for legacy_path in migrated:
+                try:
+                    os.replace(legacy_path, f"{legacy_path}.migrated")
+                except OSError as e:
+                    log_event(f"Could not rename legacy settings file {legacy_path}: {e}", "WARNING")
+        return data
+
+    def migrate_legacy(self, stored):
+        """Merge legacy files into stored (current values win); returns the files used."""
+        migrated = []
+        for legacy_path in self.legacy_files:
+            legacy_path = Path(legacy_path)
+            if legacy_path.resolve() == self.path.resolve() or not legacy_path.exists():
+                continue
+            legacy = read_json_file(legacy_path)
+            if not is_settings_file(legacy):
+                continue
+            for key, value in legacy.items():
+                if key in LEGACY_KEYS:
+                    key, convert = LEGACY_KEYS[key]
+                    try:
+                        value = convert(value)
+                    except (TypeError, ValueError):
+                        continue
+                stored.setdefault(key, value)
+            migrated.append(legacy_path)
+            log_event(f"Migrated legacy settings from {legacy_path}", "INFO")
+        return migrated
+
+    def get(self, key, default=None):
+        return self.data.get(key, default)
+
+    def all(self):
+        return dict(self.data)
+
+    def set(self, key, value):
+        self.update({key: value})
+
+    def update(self, changes):
+        """Apply changes, notify subscribers and schedule a write."""
+        with self.lock:
+            changed = {k: v for k, v in changes.items() if self.data.get(k, object()) != v}
+            if not changed:
+                return {}
+            # Swap in a new dict so concurrent readers never see a half-applied update
+            self.data = {**self.data, **changed}
+            self.dirty = True
+            self.schedule_write()
+            listeners = list(self.listeners)
+
+        for callback in listeners:
+            try:
+                callback(changed)
+            except Exception as e:
+                log_event(f"Settings listener failed: {e}", "ERROR")
+        return changed
+
+    def subscribe(self, callback):
+        """Call callback(changed) after every change; returns an unsubscribe function."""
+        with self.lock:
+            self.listeners.append(callback)
+
+        def unsubscribe():
+            with self.lock:
+                if callback in self.listeners:
+                    self.listeners.remove(callback)
+        return unsubscribe
+
+    def schedule_write(self):
+        if self.timer is not None:
+            return
+        self.timer = threading.Timer(self.write_delay, self.flush)
+        self.timer.daemon = True
+        self.timer.start()
+
+    def flush(self):
+        """Write pending changes now."""
+        with self.lock:
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+            if self.dirty:
+                self.write()
+
+    def write(self):
+        """Atomically replace the settings file with the in-memory settings; returns whether it worked."""
+        with self.lock:
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                tmp_path = self.path.with_name(self.path.name + ".tmp")
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(self.data, f, indent=2)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.path)
+                self.dirty = False
+                return True
+            except OSError as e:
+                log_event(f"Error saving settings: {e}", "ERROR")
+                return False
+
+_service = None
+_service_lock = threading.Lock()
+
+def get_settings_service():
+    """Return the shared settings service, loading the file on first use."""
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = SettingsService()
+            atexit.register(_service.flush)
+    return _service
+
+def get_setting(key, default=None):
+    """Read a single setting without copying anything."""
+    return get_settings_service().get(key, default)
+
+def load_settings():
+    """Return a copy of the current settings."""
+    return get_settings_service().all()
+
+def save_settings(settings: dict):
+    """Save settings; the file is written shortly after, together with other changes."""
+    get_settings_service().update(settings)
+
+def subscribe(callback):
+    """Get notified with a dict of changed settings."""
+    return get_settings_service().subscribe(callback)
@@ -0,0 +1,171 @@
+"""FrozeCrate - App State Store"""
+
+import threading
+from contextlib import contextmanager
+
+from utils.logger import log_event
+
+# Catalog fields mirrored into the store when a catalog is loaded
+CATALOG_FIELDS = ("installed", "version", "latest_version")
+
+_MISSING = object()
+
+
+class Subscription:
+    def __init__(self, callback, app_ids=None, keys=None):
+        self.callback = callback
+        self.app_ids = None if app_ids is None else frozenset(app_ids)
+        self.keys = None if keys is None else frozenset(keys)
+
+    def filter(self, diff):
+        if diff is None or self.keys is None:
+            return diff
+        return {key: value for key, value in diff.items() if key in self.keys} or _MISSING
+
+
+class AppStateStore:
+    """
+    Per-app state (installed, version, latest_version, progress, status, ...)
+    shared by the installer, update checks and the UI.
+
+    Mutations only record the keys whose value actually changed. Pending
+    changes are coalesced until the next tick, so fifty progress updates in
+    one tick reach a view as one change carrying the latest value, and each
+    subscriber only hears about the apps (and keys) it subscribed to.
+
+    scheduler(callback) must run callback on the next event-loop tick; the
+    GUI passes one that hops to the Qt thread. Without a scheduler changes are
+    delivered on the mutating thread at the end of each update or batch().
+    """
+
+    def __init__(self, scheduler=None):
+        self.scheduler = scheduler
+        self.state = {}
+        self.pending = {}
+        self.lock = threading.RLock()
+        self.flush_scheduled = False
+        self.batch_depth = 0
+        self.by_app = {}  # app id -> [Subscription]
+        self.global_subscriptions = []
+
+    def get(self, app_id, key=None, default=None):
+        with self.lock:
+            app_state = self.state.get(app_id)
+            if app_state is None:
+                return default
+            return dict(app_state) if key is None else app_state.get(key, default)
+
+    def snapshot(self):
+        with self.lock:
+            return {app_id: dict(app_state) for app_id, app_state in self.state.items()}
+
+    def load(self, apps):
+        """Mirror catalog entries into the store"""
+        with self.batch():
+            for app in apps:
+                self.update(app["id"], **{key: app[key] for key in CATALOG_FIELDS if key in app})
+
+    def update(self, app_id, **values):
+        """Set state values for an app; returns the keys that changed"""
+        with self.lock:
+            app_state = self.state.setdefault(app_id, {})
+            diff = {key: value for key, value in values.items() if app_state.get(key, _MISSING) != value}
+            if not diff:
+                return {}
+            app_state.update(diff)
+            pending = self.pending.get(app_id, _MISSING)
+            if pending is None:
+                # Removed and re-added within one tick, views need the whole state
+                self.pending[app_id] = dict(app_state)
+            else:
+                self.pending.setdefault(app_id, {}).update(diff)
+        self.schedule()
+        return diff
+
+    def remove(self, app_id):
+        with self.lock:
+            if self.state.pop(app_id, None) is None:
+                return False
+            self.pending[app_id] = None
+        self.schedule()
+        return True
+
+    @contextmanager
+    def batch(self):
+        """Deliver everything changed inside the block as one update"""
+        with self.lock:
+            self.batch_depth += 1
+        try:
+            yield self
+        finally:
+            with self.lock:
+                self.batch_depth -= 1
+            self.schedule()
+
+    def subscribe(self, callback, app_ids=None, keys=None):
+        """
+        callback(changes) with app id -> {key: new value}, or None for removed
+        apps. Limit it to some apps or keys to skip unrelated changes entirely.
+        Returns an unsubscribe function.
+        """
+        subscription = Subscription(callback, app_ids, keys)
+        with self.lock:
+            if subscription.app_ids is None:
+                self.global_subscriptions.append(subscription)
+            else:
+                for app_id in subscription.app_ids:
+                    self.by_app.setdefault(app_id, []).append(subscription)
+
+        def unsubscribe():
+            with self.lock:
+                if subscription in self.global_subscriptions:
+                    self.global_subscriptions.remove(subscription)
+                for app_id in subscription.app_ids or ():
+                    subscriptions = self.by_app.get(app_id, [])
+                    if subscription in subscriptions:
+                        subscriptions.remove(subscription)
+                    if not subscriptions:
+                        self.by_app.pop(app_id, None)
+        return unsubscribe
+
+    def schedule(self):
+        with self.lock:
+            if self.batch_depth or not self.pending or self.flush_scheduled:
+                return
+            if self.scheduler is not None:
+                self.flush_scheduled = True
+        if self.scheduler is None:
+            self.flush()
+        else:
+            self.scheduler(self.flush)
+
+    def flush(self):
+        """Deliver pending changes; returns how many subscribers were called"""
+        with self.lock:
+            pending, self.pending = self.pending, {}
+            self.flush_scheduled = False
+            deliveries = {}
+            for app_id, diff in pending.items():
+                for subscription in self.by_app.get(app_id, []) + self.global_subscriptions:
+                    changes = subscription.filter(diff)
+                    if changes is not _MISSING:
+                        deliveries.setdefault(subscription, {})[app_id] = changes
+
+        for subscription, changes in deliveries.items():
+            try:
+                subscription.callback(changes)
+            except Exception as e:
+                log_event(f"App state subscriber failed: {str(e)}", "WARNING")
+        return len(deliveries)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = AppStateStore()
+        return _store
@@ -1,2 +1,161 @@
 """FrozeCrate - Background Tasks"""
 
+import threading
+import time
+
+import psutil
+
+from config import get_setting
+from engine.installer_cache import InstallerCache, cache_installer, get_version_source
+from engine.spec_checker import get_battery_info
+from utils.logger import log_event
+from utils.network_utils import PRIORITY_PREFETCH
+
+PREFETCH_POLL_INTERVAL = 30  # seconds between idle checks while waiting
+IDLE_SAMPLE_WINDOW = 5  # seconds of CPU and network use each idle check covers at least
+
+
+class IdleDetector:
+    """Decide whether the machine is idle enough for background downloads"""
+
+    def __init__(self, max_cpu_percent=None, max_network_kbps=None, allow_on_battery=None,
+                 sample_window=IDLE_SAMPLE_WINDOW):
+        self.max_cpu_percent = max_cpu_percent if max_cpu_percent is not None else get_setting("prefetch_max_cpu_percent", 25)
+        self.max_network_kbps = max_network_kbps if max_network_kbps is not None else get_setting("prefetch_max_network_kbps", 256)
+        self.allow_on_battery = allow_on_battery if allow_on_battery is not None else get_setting("prefetch_on_battery", False)
+        self.sample_window = sample_window
+        # Prime the counters, both psutil readings are relative to the previous call
+        psutil.cpu_percent(interval=None)
+        self.last_net = (time.monotonic(), self.net_bytes())
+
+    def net_bytes(self):
+        counters = psutil.net_io_counters()
+        return counters.bytes_sent + counters.bytes_recv if counters else 0
+
+    def sample(self):
+        """CPU percent and network KB/s since the last sample, plus battery state"""
+        last_time, last_total = self.last_net
+        # A reading right after the previous one covers almost no time and looks idle
+        remaining = last_time + self.sample_window - time.monotonic()
+        if remaining > 0:
+            time.sleep(remaining)
+        now, total = time.monotonic(), self.net_bytes()
+        self.last_net = (now, total)
+        elapsed = max(now - last_time, 1e-6)
+        battery = get_battery_info()
+        return {
+            "cpu_percent": psutil.cpu_percent(interval=None),
+            "network_kbps": (total - last_total) / 1024 / elapsed,
+            "on_battery": not battery.get("plugged_in", True),
+        }
+
+    def is_idle(self):
+        sample = self.sample()
+        if sample["on_battery"] and not self.allow_on_battery:
+            return False
+        return sample["cpu_percent"] <= self.max_cpu_percent and sample["network_kbps"] <= self.max_network_kbps
+
+
+class UpdatePrefetcher:
+    """
+    Downloads pending update installers into the installer cache while the
+    machine is idle, so the later update only runs the local install step.
+
+    Only apps whose catalog entry has a downloads[latest_version] entry with
+    a sha256 are prefetched (see get_version_source); others are skipped.
+    """
+
+    def __init__(self, idle_detector=None, cache=None, poll_interval=PREFETCH_POLL_INTERVAL):
+        self.idle_detector = idle_detector
+        # Installs use their own instances, index updates are locked across all of them
+        self.cache = cache or InstallerCache()
+        self.poll_interval = poll_interval
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def queue(self, apps):
+        """Queue apps with a newer latest_version; returns how many were added"""
+        added = 0
+        with self.lock:
+            for app in apps:
+                version = app.get("latest_version")
+                if not version or get_version_source(app, version) is None:
+                    continue  # nothing to download ahead of time (e.g. winget installs)
+                if self.is_staged(app) or app["id"] in self.pending:
+                    continue
+                self.pending[app["id"]] = app
+                added += 1
+        if added:
+            self.start()
+            self.wake.set()
+        return added
+
+    def is_staged(self, app):
+        return self.cache.lookup(app["id"], app.get("latest_version")) is not None
+
+    def start(self):
+        if self.thread and self.thread.is_alive():
+            return
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self.run, name="update-prefetch", daemon=True)
+        self.thread.start()
+
+    def stop(self, timeout=None):
+        self.stop_event.set()
+        self.wake.set()
+        if self.thread:
+            self.thread.join(timeout)
+
+    def next_app(self):
+        with self.lock:
+            return next(iter(self.pending.values()), None)
+
+    def run(self):
+        if self.idle_detector is None:
+            self.idle_detector = IdleDetector()
+        while not self.stop_event.is_set():
+            app = self.next_app()
+            if app is None:
+                self.wake.wait()
+                self.wake.clear()
+                continue
+            if not self.idle_detector.is_idle():
+                self.stop_event.wait(self.poll_interval)
+                continue
+            self.prefetch(app)
+            with self.lock:
+                self.pending.pop(app["id"], None)
+
+    def prefetch(self, app):
+        """Download, verify and stage one update installer"""
+        version = app["latest_version"]
+        try:
+            log_event(f"Prefetching {app.get('name', app['id'])} {version}", "INFO")
+            sha256 = cache_installer(app, version, PRIORITY_PREFETCH, cache=self.cache)
+            if sha256:
+                log_event(f"Staged update for {app['id']} {version} ({sha256[:12]})", "INFO")
+            return sha256
+        except Exception as e:
+            # The visible update will simply download it again
+            log_event(f"Prefetch of {app['id']} {version} failed: {str(e)}", "WARNING")
+            return None
+
+
+_prefetcher = None
+
+
+def get_prefetcher():
+    global _prefetcher
+    if _prefetcher is None:
+        _prefetcher = UpdatePrefetcher()
+    return _prefetcher
+
+
+def prefetch_updates(apps):
+    """Queue update installers for idle-time download if prefetching is enabled"""
+    if not get_setting("prefetch_updates", False):
+        return 0
+    return get_prefetcher().queue(apps)
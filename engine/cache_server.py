@@ -0,0 +1,381 @@
+"""FrozeCrate - Cache Server
+
+Serves installers to other FrozeCrate machines on the local network, so
+each installer crosses the internet once per office:
+
+    GET /ping                   identifies the server
+    GET /blobs/<sha256>         an installer by content hash
+    GET /apps/<id>/<version>    an installer by app version
+
+Installers support Range requests. An installer that isn't cached yet is
+downloaded from its origin once, and every client asking for it meanwhile
+is streamed the bytes as they arrive.
+
+The server is plain HTTP, so it only serves installers the catalog gives a
+sha256 for, which clients check the bytes against. The catalog itself is
+not served: install commands and checksums must come from the repositories.
+"""
+
+import json
+import os
+import re
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote, urlsplit
+
+from config import get_setting
+from engine.installer_cache import InstallerCache, cache_installer, get_version_source
+from engine.lan_cache import DISCOVERY_PORT, DISCOVERY_REQUEST, SERVICE_NAME
+from engine.update_checker import UpdateChecker
+from utils.logger import log_event
+from utils.network_utils import PRIORITY_INSTALL
+
+COPY_CHUNK_SIZE = 256 * 1024
+CATALOG_REFRESH_INTERVAL = 300  # seconds between catalog syncs, for finding installers
+FOLLOW_POLL_INTERVAL = 1.0  # seconds a follower waits before rechecking a fetch
+CLIENT_TIMEOUT = 60  # seconds a client may stop reading (or sending) before it is dropped
+SHA256_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+
+
+def parse_range(header, size):
+    """(start, end) inclusive for a Range header, None for the whole file.
+
+    Raises ValueError when the range can't be satisfied.
+    """
+    if not header:
+        return None
+    unit, _, spec = header.partition("=")
+    if unit.strip() != "bytes" or "," in spec:
+        return None  # multipart ranges aren't worth supporting, send everything
+    first, _, last = spec.strip().partition("-")
+    if not first:
+        length = int(last)
+        if length <= 0:
+            raise ValueError(header)
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or end < start:
+        raise ValueError(header)
+    return start, end
+
+
+class PullThrough:
+    """
+    One origin download of an installer the cache doesn't have yet.
+
+    Acts as the cache_installer observer. Followers read the part file up to
+    the reported progress, opening it for each chunk only, so the move into
+    the cache waits for reads in progress but never for a slow client. After
+    the move they continue from the cached blob.
+    """
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.part_path = None
+        self.available = 0
+        self.total = None
+        self.moving = False
+        self.readers = 0
+        self.finished = False
+        self.sha256 = None
+        self.error = None
+
+    def start(self, part_path):
+        with self.condition:
+            self.part_path = part_path
+
+    def progress(self, bytes_downloaded, total_size):
+        with self.condition:
+            self.available = bytes_downloaded
+            self.total = total_size or None
+            self.condition.notify_all()
+
+    def finish(self):
+        # Called before the part file is moved into the cache, wait for reads in progress
+        with self.condition:
+            self.moving = True
+            self.condition.notify_all()
+            while self.readers:
+                self.condition.wait()
+
+    def done(self, sha256=None, error=None):
+        with self.condition:
+            self.sha256 = sha256
+            self.error = error or (None if sha256 else "No download source")
+            self.finished = True
+            self.condition.notify_all()
+
+    def wait_for_size(self):
+        """Total size once the origin reported it, None if it finished without one"""
+        with self.condition:
+            while self.total is None and not self.finished:
+                self.condition.wait(FOLLOW_POLL_INTERVAL)
+            return self.total
+
+
+class CacheRequestHandler(BaseHTTPRequestHandler):
+    server_version = "FrozeCrateCache/1.0"
+    timeout = CLIENT_TIMEOUT
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_HEAD(self):
+        self.route(send_body=False)
+
+    def do_GET(self):
+        self.route(send_body=True)
+
+    def route(self, send_body):
+        path = [unquote(part) for part in urlsplit(self.path).path.strip("/").split("/")]
+        try:
+            if path == ["ping"]:
+                self.send_json({"service": SERVICE_NAME}, send_body)
+            elif len(path) == 2 and path[0] == "blobs" and SHA256_PATTERN.match(path[1]):
+                self.send_installer(self.server.find_by_sha256(path[1]), send_body)
+            elif len(path) == 3 and path[0] == "apps":
+                self.send_installer(self.server.find_by_version(path[1], path[2]), send_body)
+            else:
+                self.send_error(404)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def send_json(self, payload, send_body):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if send_body:
+            self.wfile.write(body)
+
+    def send_headers(self, size, byte_range, sha256=None):
+        start, end = byte_range or (0, size - 1)
+        self.send_response(206 if byte_range else 200)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("Content-Length", str(end - start + 1))
+        if byte_range:
+            self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        if sha256:
+            self.send_header("X-Content-SHA256", sha256)
+        self.end_headers()
+        return start, end
+
+    def parse_range(self, size):
+        try:
+            return True, parse_range(self.headers.get("Range"), size)
+        except ValueError:
+            self.send_response(416)
+            self.send_header("Content-Range", f"bytes */{size}")
+            self.end_headers()
+            return False, None
+
+    def send_installer(self, found, send_body):
+        if found is None:
+            self.send_error(404)
+            return
+        sha256, fetch = found
+        if sha256 is None:
+            size = fetch.wait_for_size()
+            if size is not None:
+                ok, byte_range = self.parse_range(size)
+                if ok:
+                    start, end = self.send_headers(size, byte_range)
+                    if send_body:
+                        self.follow(fetch, start, end)
+                return
+            # The origin sent no size, so there was nothing to follow until it finished
+            if not fetch.sha256:
+                self.send_error(502, f"Origin download failed: {fetch.error}")
+                return
+            sha256 = fetch.sha256
+
+        blob = self.server.cache.blob_path(sha256)
+        size = os.path.getsize(blob)
+        ok, byte_range = self.parse_range(size)
+        if ok:
+            start, end = self.send_headers(size, byte_range, sha256)
+            if send_body:
+                self.copy_file(blob, start, end)
+
+    def copy_file(self, path, start, end):
+        with open(path, "rb") as f:
+            f.seek(start)
+            remaining = end - start + 1
+            while remaining > 0:
+                data = f.read(min(COPY_CHUNK_SIZE, remaining))
+                if not data:
+                    raise ConnectionResetError("Cached file is shorter than expected")
+                self.wfile.write(data)
+                remaining -= len(data)
+
+    def follow(self, fetch, start, end):
+        """Stream bytes of an installer that is still being downloaded"""
+        position = start
+        while position <= end:
+            with fetch.condition:
+                while not fetch.finished and (fetch.moving or fetch.available <= position):
+                    fetch.condition.wait(FOLLOW_POLL_INTERVAL)
+                if fetch.finished:
+                    break
+                fetch.readers += 1
+                available = fetch.available
+            try:
+                # The part file is preallocated, only read what was reported as written
+                with open(fetch.part_path, "rb") as f:
+                    f.seek(position)
+                    data = f.read(min(COPY_CHUNK_SIZE, available - position, end - position + 1))
+            finally:
+                with fetch.condition:
+                    fetch.readers -= 1
+                    fetch.condition.notify_all()
+            # Closed before writing, a client that stops reading holds up nobody else
+            self.wfile.write(data)
+            position += len(data)
+
+        if position <= end:
+            if fetch.error:
+                raise ConnectionResetError(f"Origin download failed: {fetch.error}")
+            self.copy_file(self.server.cache.blob_path(fetch.sha256), position, end)
+
+
+class CacheServer(ThreadingHTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host="0.0.0.0", port=None, cache=None, checker=None):
+        port = get_setting("lan_cache_port", 47912) if port is None else port
+        super().__init__((host, port), CacheRequestHandler)
+        self.cache = cache or InstallerCache()
+        self.checker = checker or UpdateChecker()
+        self.fetches = {}  # (app id, version) -> PullThrough
+        self.lock = threading.Lock()
+        self.catalog = None  # (mtime_ns, size, apps)
+        self.stop_event = threading.Event()
+        self.discovery_socket = None
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{'127.0.0.1' if host == '0.0.0.0' else host}:{port}"
+
+    def load_catalog(self):
+        """Re-read the merged catalog when the synced file changed"""
+        try:
+            stat = os.stat(self.checker.server_db_path)
+            with self.lock:
+                if self.catalog and self.catalog[:2] == (stat.st_mtime_ns, stat.st_size):
+                    return self.catalog
+            with open(self.checker.server_db_path, "rb") as f:
+                apps = json.load(f)
+        except (OSError, ValueError):
+            return None
+        with self.lock:
+            self.catalog = (stat.st_mtime_ns, stat.st_size, apps)
+            return self.catalog
+
+    def catalog_apps(self):
+        catalog = self.load_catalog()
+        return catalog[2] if catalog else []
+
+    def get_sha256(self, app, version):
+        """The catalog's sha256 for an app version, None if it has none"""
+        source = get_version_source(app, version)
+        return source[1].lower() if source and source[1] else None
+
+    def find(self, app, version, sha256):
+        """(sha256, None) when cached, (None, PullThrough) while fetching"""
+        if os.path.exists(self.cache.blob_path(sha256)):
+            return sha256, None
+        return self.pull_through(app, version)
+
+    def find_by_version(self, app_id, version):
+        """Like find(), None if the catalog has no checksummed installer for it"""
+        app = next((app for app in self.catalog_apps() if app.get("id") == app_id), None)
+        sha256 = self.get_sha256(app, version) if app else None
+        return self.find(app, version, sha256) if sha256 else None
+
+    def find_by_sha256(self, sha256):
+        """Like find(), for any catalog version published with this sha256"""
+        for app in self.catalog_apps():
+            for version in [app.get("version"), *(app.get("downloads") or {})]:
+                if self.get_sha256(app, version) == sha256:
+                    return self.find(app, version, sha256)
+        return None
+
+    def pull_through(self, app, version):
+        key = (app["id"], version)
+        with self.lock:
+            fetch = self.fetches.get(key)
+            if fetch is None:
+                fetch = self.fetches[key] = PullThrough()
+                threading.Thread(target=self.run_fetch, args=(app, version, fetch), daemon=True).start()
+        return None, fetch
+
+    def run_fetch(self, app, version, fetch):
+        """Download from the origin once, however many clients are waiting"""
+        log_event(f"Cache miss for {app['id']} {version}, fetching from origin", "INFO")
+        sha256 = error = None
+        try:
+            sha256 = cache_installer(app, version, PRIORITY_INSTALL, fetch.progress, self.cache,
+                                     observer=fetch, use_lan_cache=False)
+        except Exception as e:
+            error = str(e)
+            log_event(f"Origin download of {app['id']} {version} failed: {error}", "WARNING")
+        finally:
+            with self.lock:
+                self.fetches.pop((app["id"], version), None)
+            fetch.done(sha256, error)
+
+    def refresh_catalog(self):
+        while not self.stop_event.is_set():
+            try:
+                self.checker.download_remote_db()
+            except Exception as e:
+                log_event(f"Catalog sync failed: {str(e)}", "WARNING")
+            self.stop_event.wait(CATALOG_REFRESH_INTERVAL)
+
+    def answer_discovery(self, port=DISCOVERY_PORT):
+        """Reply to discovery broadcasts with this server's HTTP port"""
+        self.discovery_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.discovery_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.discovery_socket.bind(("", port))
+        reply = json.dumps({"service": SERVICE_NAME, "port": self.server_address[1]}).encode("utf-8")
+
+        def run():
+            while not self.stop_event.is_set():
+                try:
+                    data, address = self.discovery_socket.recvfrom(1024)
+                    if data.strip() == DISCOVERY_REQUEST:
+                        self.discovery_socket.sendto(reply, address)
+                except OSError:
+                    return
+        threading.Thread(target=run, name="cache-discovery", daemon=True).start()
+
+    def start_background(self, sync_catalog=True, discovery=True, discovery_port=DISCOVERY_PORT):
+        if sync_catalog:
+            threading.Thread(target=self.refresh_catalog, name="cache-catalog-sync", daemon=True).start()
+        if discovery:
+            self.answer_discovery(discovery_port)
+
+    def server_close(self):
+        self.stop_event.set()
+        if self.discovery_socket is not None:
+            self.discovery_socket.close()
+        super().server_close()
+
+
+def serve(port=None, discovery=True):
+    """Run a cache server until interrupted"""
+    server = CacheServer(port=port)
+    server.start_background(discovery=discovery)
+    log_event(f"FrozeCrate cache serving on port {server.server_address[1]}", "INFO")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -0,0 +1,238 @@
+"""FrozeCrate - Hardware Compatibility
+
+Catalog entries may declare what they need to run:
+
+    "requirements": {
+        "minimum": {"ram_gb": 8, "cores": 4, "vram_gb": 2, "resolution": "1920x1080"},
+        "recommended": {"ram_gb": 32, "cores": 8, "vram_gb": 8}
+    }
+
+Supported keys are ram_gb, cores, threads, vram_gb, resolution, os (a name
+or list of names such as "Windows") and architecture ("64bit").
+"""
+
+import hashlib
+import json
+import operator
+import threading
+from collections import OrderedDict
+
+from utils.logger import log_event
+
+RECOMMENDED = "recommended"
+SUPPORTED = "supported"
+UNSUPPORTED = "unsupported"
+UNKNOWN = "unknown"  # the app declares no requirements
+
+# Reported RAM is a little below the installed amount (16 GB shows as ~15.8)
+RAM_TOLERANCE = 0.95
+MAX_CACHED_PROFILES = 32
+
+
+def parse_resolution(value):
+    """Parse "WIDTHxHEIGHT" into a tuple, None if it can't be parsed"""
+    try:
+        width, height = str(value).lower().split("x")
+        return int(width), int(height)
+    except ValueError:
+        return None
+
+
+def os_family(name):
+    """Lowercase OS family from a name like "Windows 10" """
+    parts = str(name or "").split()
+    return parts[0].lower() if parts else None
+
+
+def _require_resolution(value):
+    resolution = parse_resolution(value)
+    if resolution is None:
+        raise ValueError(f"Invalid resolution: {value}")
+    return resolution
+
+
+def _require_os(value):
+    names = [value] if isinstance(value, str) else list(value)
+    return frozenset(os_family(name) for name in names)
+
+
+# key -> (convert the requirement value, test(actual, required))
+REQUIREMENT_CHECKS = {
+    "ram_gb": (lambda value: float(value) * RAM_TOLERANCE, operator.ge),
+    "cores": (int, operator.ge),
+    "threads": (int, operator.ge),
+    "vram_gb": (float, operator.ge),
+    "resolution": (_require_resolution, lambda actual, required: actual[0] >= required[0] and actual[1] >= required[1]),
+    "os": (_require_os, lambda actual, required: actual in required),
+    "architecture": (lambda value: str(value).lower(), operator.eq),
+}
+
+
+def extract_features(specs):
+    """Reduce a spec snapshot to the values requirements are checked against, None where unknown"""
+    processor = specs.get("processor") or {}
+    dedicated = (specs.get("graphics") or {}).get("dedicated") or {}
+    operating_system = specs.get("operating_system") or {}
+
+    vram = dedicated.get("vram_gb") or 0
+    if not vram and dedicated.get("model", "Unknown") == "Unknown":
+        vram = None  # no GPU detection available, not the same as no VRAM
+
+    return {
+        "ram_gb": (specs.get("memory") or {}).get("total_ram_gb") or None,
+        "cores": processor.get("cores") or None,
+        "threads": processor.get("threads") or None,
+        "vram_gb": vram,
+        "resolution": parse_resolution((specs.get("display") or {}).get("resolution")),
+        "os": os_family(operating_system.get("name")),
+        "architecture": str(operating_system.get("architecture") or "").lower() or None,
+    }
+
+
+def get_spec_hash(features):
+    """Stable hash of a feature set, used to cache evaluation results"""
+    payload = json.dumps(features, sort_keys=True).encode("utf-8")
+    return hashlib.blake2b(payload, digest_size=16).hexdigest()
+
+
+def compile_checks(requirements, app_id=None):
+    """Turn a requirement dict into a tuple of (key, test, threshold)"""
+    checks = []
+    for key, value in (requirements or {}).items():
+        if key not in REQUIREMENT_CHECKS:
+            log_event(f"Ignoring unknown requirement '{key}' for {app_id}", "WARNING")
+            continue
+        convert, test = REQUIREMENT_CHECKS[key]
+        try:
+            checks.append((key, test, convert(value)))
+        except (TypeError, ValueError) as e:
+            log_event(f"Ignoring invalid requirement '{key}' for {app_id}: {e}", "WARNING")
+    return tuple(checks)
+
+
+def run_checks(checks, features):
+    """Returns (failed keys, unknown keys)"""
+    failed, unknown = [], []
+    for key, test, threshold in checks:
+        actual = features[key]
+        if actual is None:
+            unknown.append(key)
+        elif not test(actual, threshold):
+            failed.append(key)
+    return failed, unknown
+
+
+class CompiledRequirements:
+    """Minimum and recommended checks for one distinct requirement set"""
+
+    def __init__(self, requirements, app_id=None):
+        requirements = requirements or {}
+        self.declared = bool(requirements)
+        self.minimum = compile_checks(requirements.get("minimum"), app_id)
+        self.recommended = compile_checks(requirements.get("recommended"), app_id)
+
+    def evaluate(self, features):
+        if not self.declared:
+            return {"status": UNKNOWN, "failed": [], "below_recommended": [], "unknown": []}
+
+        failed, unknown = run_checks(self.minimum, features)
+        below, unknown_recommended = run_checks(self.recommended, features)
+        if failed:
+            status = UNSUPPORTED
+        elif below or not self.recommended:
+            status = SUPPORTED
+        else:
+            status = RECOMMENDED
+        return {
+            "status": status,
+            "failed": failed,
+            "below_recommended": below,
+            # Checks we couldn't run never fail an app, but the UI can say so
+            "unknown": sorted(set(unknown) | set(unknown_recommended)),
+        }
+
+
+class CompatibilityEngine:
+    """
+    Evaluates a whole catalog against spec snapshots.
+
+    Requirement sets are compiled once when the engine is built, and apps that
+    declare identical requirements share one compiled set, so evaluating a
+    profile runs each distinct set once. Results are cached per spec hash;
+    treat the returned result dicts as read-only, they are shared.
+    """
+
+    def __init__(self, apps, max_profiles=MAX_CACHED_PROFILES):
+        self.requirements = []
+        self.app_index = {}
+        compiled = {}
+        for app in apps:
+            key = json.dumps(app.get("requirements") or None, sort_keys=True)
+            index = compiled.get(key)
+            if index is None:
+                index = compiled[key] = len(self.requirements)
+                self.requirements.append(CompiledRequirements(app.get("requirements"), app.get("id")))
+            self.app_index[app.get("id")] = index
+
+        self.max_profiles = max_profiles
+        self._results = OrderedDict()
+        self._lock = threading.Lock()
+
+    def evaluate(self, specs):
+        """Returns a dict of app id -> result for a spec snapshot"""
+        features = extract_features(specs)
+        spec_hash = get_spec_hash(features)
+        with self._lock:
+            results = self._results.get(spec_hash)
+            if results is not None:
+                self._results.move_to_end(spec_hash)
+                return results
+
+        per_set = [requirements.evaluate(features) for requirements in self.requirements]
+        results = {app_id: per_set[index] for app_id, index in self.app_index.items()}
+        with self._lock:
+            self._results[spec_hash] = results
+            while len(self._results) > self.max_profiles:
+                self._results.popitem(last=False)
+        return results
+
+    def check(self, app_id, specs):
+        return self.evaluate(specs).get(app_id)
+
+    def filter(self, specs, statuses=(RECOMMENDED, SUPPORTED, UNKNOWN)):
+        """App ids whose status is one of statuses"""
+        return [app_id for app_id, result in self.evaluate(specs).items() if result["status"] in statuses]
+
+
+_engine = None
+_engine_key = None
+_engine_version = None
+_engine_lock = threading.Lock()
+
+
+def get_engine(apps, version=None):
+    """
+    Shared engine for a catalog, rebuilt only when ids or requirements change.
+
+    Asking again with the same version (such as the catalog file's mtime)
+    returns the engine without looking at the apps. Without a version the
+    apps are fingerprinted on every call, so edits made in place are always
+    seen, but that takes a while for large catalogs.
+    """
+    global _engine, _engine_key, _engine_version
+    with _engine_lock:
+        if _engine is not None and version is not None and version == _engine_version:
+            return _engine
+
+    payload = json.dumps([(app.get("id"), app.get("requirements")) for app in apps], sort_keys=True)
+    key = hashlib.blake2b(payload.encode("utf-8"), digest_size=16).hexdigest()
+    with _engine_lock:
+        if _engine is None or _engine_key != key:
+            _engine, _engine_key = CompatibilityEngine(apps), key
+        _engine_version = version
+        return _engine
+
+
+def evaluate_catalog(apps, specs, version=None):
+    """Compatibility of every app in a catalog, see CompatibilityEngine.evaluate and get_engine"""
+    return get_engine(apps, version).evaluate(specs)
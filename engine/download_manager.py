@@ -1,2 +1,410 @@
 """FrozeCrate - Download Manager"""
 
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime
+from urllib.parse import urlsplit
+
+import requests
+
+from utils.file_operations import check_space, file_lock, preallocate
+from utils.logger import log_event
+from utils.network_utils import PRIORITY_INSTALL, iter_limited
+
+MIRROR_SCORES_FILE = "data/cache/mirror_scores.json"
+CHUNK_SIZE = 64 * 1024
+FIRST_SEGMENT_SIZE = 512 * 1024  # bytes raced across the top mirrors
+RACE_CANDIDATES = 3
+CONNECT_TIMEOUT = 10
+STALL_TIMEOUT = 15  # seconds without any data before a mirror counts as stalled
+MIN_THROUGHPUT = 32 * 1024  # bytes/s over a window before switching mirrors
+THROUGHPUT_WINDOW = 5  # seconds, not counting time held back by the bandwidth limiter
+SCORE_SMOOTHING = 0.3  # weight of the newest sample in the moving averages
+
+
+class MirrorError(Exception):
+    """Raised when no mirror could deliver the file"""
+
+
+def get_app_mirrors(app):
+    """Return the list of download URLs for a catalog entry"""
+    mirrors = list(app.get("mirrors") or [])
+    if app.get("download_url") and app["download_url"] not in mirrors:
+        mirrors.insert(0, app["download_url"])
+    return mirrors
+
+
+def mirror_key(url):
+    """Scores are kept per host, so all files on a mirror share them"""
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+class MirrorScores:
+    """Persistent moving averages of latency and throughput per mirror.
+
+    Updates are kept until save(), which replays them onto the file's current
+    contents under a file lock, so downloads in other processes (or other
+    instances) saving the same file don't overwrite each other's scores.
+    """
+
+    def __init__(self, path=MIRROR_SCORES_FILE):
+        self.path = path
+        self.lock = threading.Lock()
+        self.scores = self.load()
+        self.pending = []  # unsaved updates, each a function applied to a scores dict
+
+    def load(self):
+        try:
+            with open(self.path, 'r', encoding="utf-8") as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
+        except (OSError, ValueError):
+            return {}
+
+    def save(self):
+        try:
+            with self.lock:
+                directory = os.path.dirname(self.path) or "."
+                os.makedirs(directory, exist_ok=True)
+                with file_lock(f"{self.path}.lock"):
+                    scores = self.load()
+                    for update in self.pending:
+                        update(scores)
+                    fd, tmp_path = tempfile.mkstemp(prefix=f"{os.path.basename(self.path)}.", suffix=".tmp",
+                                                    dir=directory)
+                    try:
+                        with os.fdopen(fd, 'w', encoding="utf-8") as f:
+                            json.dump(scores, f, indent=2)
+                        os.replace(tmp_path, self.path)
+                    except BaseException:
+                        if os.path.exists(tmp_path):
+                            os.remove(tmp_path)
+                        raise
+                self.scores = scores
+                self.pending = []
+        except OSError as e:
+            log_event(f"Error saving mirror scores: {str(e)}", "ERROR")
+
+    def _average(self, old, new):
+        return new if old is None else old + SCORE_SMOOTHING * (new - old)
+
+    def _update(self, url, update):
+        """Apply update(entry) now and again on save, call with the lock held"""
+        key = mirror_key(url)
+
+        def apply(scores):
+            update(scores.setdefault(key, {}))
+        apply(self.scores)
+        self.pending.append(apply)
+
+    def record_success(self, url, latency=None, throughput=None):
+        used = datetime.now().isoformat()
+
+        def update(entry):
+            if latency is not None:
+                entry["latency"] = self._average(entry.get("latency"), latency)
+            if throughput is not None:
+                entry["throughput"] = self._average(entry.get("throughput"), throughput)
+            entry["failures"] = max(0, entry.get("failures", 0) - 1)
+            entry["last_used"] = used
+        with self.lock:
+            self._update(url, update)
+
+    def record_failure(self, url):
+        used = datetime.now().isoformat()
+
+        def update(entry):
+            entry["failures"] = entry.get("failures", 0) + 1
+            entry["last_used"] = used
+        with self.lock:
+            self._update(url, update)
+
+    def score(self, url):
+        """Expected bytes/s, halved for every recent failure; unknown mirrors rank first"""
+        entry = self.scores.get(mirror_key(url))
+        if not entry or entry.get("throughput") is None:
+            return float("inf") if not entry or not entry.get("failures") else 0.0
+        return entry["throughput"] / (2 ** entry.get("failures", 0))
+
+    def rank(self, urls):
+        # sorted() is stable, so ties keep the catalog order
+        return sorted(urls, key=self.score, reverse=True)
+
+
+_scores = {}  # absolute path -> MirrorScores
+_scores_lock = threading.Lock()
+
+
+def get_scores(path=MIRROR_SCORES_FILE):
+    """The MirrorScores for a file, shared by every download in the process"""
+    with _scores_lock:
+        key = os.path.abspath(path)
+        scores = _scores.get(key)
+        if scores is None:
+            scores = _scores[key] = MirrorScores(path)
+        return scores
+
+
+class MirrorDownloader:
+    """Download one file from several mirrors.
+
+    The first segment is raced across the best ranked mirrors and the winner
+    keeps streaming the rest. If it stalls or drops below MIN_THROUGHPUT the
+    download resumes from the next mirror with a Range request.
+
+    Preferred mirrors (a LAN cache) are tried on their own before the race,
+    so a working cache never pulls even the first segment from the origin.
+    """
+
+    def __init__(self, mirrors, scores=None, priority=PRIORITY_INSTALL, preferred=None):
+        if isinstance(mirrors, str):
+            mirrors = [mirrors]
+        if not mirrors:
+            raise ValueError("At least one mirror URL is required")
+        self.mirrors = list(dict.fromkeys(mirrors))
+        self.preferred = [url for url in dict.fromkeys(preferred or []) if url not in self.mirrors]
+        self.scores = scores if scores is not None else get_scores()
+        self.priority = priority
+        self.first_segment_size = FIRST_SEGMENT_SIZE
+        self.race_candidates = RACE_CANDIDATES
+        self.connect_timeout = CONNECT_TIMEOUT
+        self.stall_timeout = STALL_TIMEOUT
+        self.min_throughput = MIN_THROUGHPUT
+        self.throughput_window = THROUGHPUT_WINDOW
+        # Racers still running after their race was decided; the last one saves
+        # the scores again if it finishes after download() already saved them
+        self.racers_lock = threading.Lock()
+        self.racers = 0
+        self.racers_done = threading.Event()
+        self.racers_done.set()
+        self.finished = False
+
+    def open(self, url, offset=0):
+        """Open a streaming GET, asking for everything from offset onwards"""
+        headers = {"Range": f"bytes={offset}-"}
+        response = requests.get(url, headers=headers, stream=True,
+                                timeout=(self.connect_timeout, self.stall_timeout))
+        response.raise_for_status()
+        if offset and response.status_code != 206:
+            response.close()
+            raise MirrorError(f"{url} does not support resuming")
+        return response
+
+    def get_size(self):
+        """Ask the best ranked mirrors for the file size with HEAD; None if none reports it"""
+        for url in self.scores.rank(self.mirrors)[:self.race_candidates]:
+            try:
+                response = requests.head(url, headers={"Accept-Encoding": "identity"}, allow_redirects=True,
+                                         timeout=self.connect_timeout)
+                response.raise_for_status()
+                size = int(response.headers.get("Content-Length") or 0)
+            except (requests.exceptions.RequestException, ValueError) as e:
+                log_event(f"Mirror {url} did not report a size: {str(e)}", "WARNING")
+                continue
+            if size:
+                return size
+        return None
+
+    def get_total_size(self, response):
+        content_range = response.headers.get("Content-Range", "")
+        if "/" in content_range and not content_range.endswith("/*"):
+            return int(content_range.rsplit("/", 1)[1])
+        if response.status_code == 200 and response.headers.get("Content-Length"):
+            return int(response.headers["Content-Length"])
+        return 0
+
+    def race_first_segment(self, candidates):
+        """Fetch the first segment from all candidates, return the first to finish"""
+        decided = threading.Event()
+        lock = threading.Lock()
+        winner = {}
+        remaining = [len(candidates)]
+        race_start = time.monotonic()
+        # url -> [latency, bytes received, limiter wait]; used to score the losers once a winner is known
+        progress = {url: [None, 0, 0.0] for url in candidates}
+
+        def score_race(winner_url):
+            now = time.monotonic()
+            for url, (latency, received, waited) in progress.items():
+                if latency is None:
+                    # Not connected yet, nothing is known about this mirror
+                    continue
+                elapsed = max(now - race_start - latency - waited, 1e-6)
+                self.scores.record_success(url, latency, received / elapsed)
+
+        def racer(url):
+            response = None
+            try:
+                response = self.open(url)
+                progress[url][0] = time.monotonic() - race_start
+                chunks = iter_limited(response, self.priority, CHUNK_SIZE)
+                buffer = bytearray()
+                while len(buffer) < self.first_segment_size and not decided.is_set():
+                    chunk = next(chunks, None)
+                    if chunk is None:
+                        break
+                    buffer.extend(chunk)
+                    progress[url][1] = len(buffer)
+                    progress[url][2] = chunks.waited
+                with lock:
+                    if decided.is_set():
+                        response.close()
+                        return
+                    decided.set()
+                    score_race(url)
+                    winner.update(url=url, response=response, chunks=chunks, buffer=bytes(buffer))
+            except Exception as e:
+                if response is not None:
+                    response.close()
+                log_event(f"Mirror {url} failed: {str(e)}", "WARNING")
+                with lock:
+                    progress.pop(url, None)
+                    self.scores.record_failure(url)
+            finally:
+                with lock:
+                    remaining[0] -= 1
+                    if remaining[0] == 0:
+                        decided.set()
+                self.racer_finished()
+
+        with self.racers_lock:
+            self.racers += len(candidates)
+            self.racers_done.clear()
+        for url in candidates:
+            threading.Thread(target=racer, args=(url,), daemon=True).start()
+        decided.wait()
+        return winner or None
+
+    def racer_finished(self):
+        with self.racers_lock:
+            self.racers -= 1
+            if self.racers:
+                return
+            late = self.finished
+        if late:
+            # Outcomes recorded after download() returned must still be persisted
+            self.scores.save()
+        self.racers_done.set()
+
+    def save_scores(self):
+        with self.racers_lock:
+            self.finished = True
+        self.scores.save()
+
+    def stream(self, f, url, chunks, offset, total, progress_callback):
+        """Copy a response into f; returns the new offset and whether the mirror gave up"""
+        # Time held back by the bandwidth limiter says nothing about the mirror
+        window_start = time.monotonic()
+        window_waited = chunks.waited
+        window_bytes = 0
+        transfer_start = window_start
+        transfer_waited = window_waited
+        transferred = 0
+        try:
+            for chunk in chunks:
+                if not chunk:
+                    continue
+                f.write(chunk)
+                offset += len(chunk)
+                transferred += len(chunk)
+                window_bytes += len(chunk)
+                if progress_callback:
+                    # Reported bytes must be readable by anyone following the file
+                    f.flush()
+                    progress_callback(offset, total)
+
+                now = time.monotonic()
+                active = now - window_start - (chunks.waited - window_waited)
+                if active >= self.throughput_window:
+                    if window_bytes / active < self.min_throughput:
+                        log_event(f"Mirror {url} is too slow, switching", "WARNING")
+                        self.scores.record_failure(url)
+                        return offset, False
+                    window_start, window_waited, window_bytes = now, chunks.waited, 0
+        except (requests.exceptions.RequestException, OSError) as e:
+            log_event(f"Mirror {url} stalled: {str(e)}", "WARNING")
+            self.scores.record_failure(url)
+            return offset, False
+
+        elapsed = time.monotonic() - transfer_start - (chunks.waited - transfer_waited)
+        if transferred and elapsed > 0:
+            self.scores.record_success(url, throughput=transferred / elapsed)
+        return offset, True
+
+    def download(self, dest_path, progress_callback=None):
+        """Download to dest_path and return it; raises MirrorError if every mirror fails"""
+        ranked = self.scores.rank(self.mirrors)
+        winner = self.race_first_segment(self.preferred) if self.preferred else None
+        while ranked and not winner:
+            candidates, ranked = ranked[:self.race_candidates], ranked[self.race_candidates:]
+            winner = self.race_first_segment(candidates)
+        if not winner:
+            self.save_scores()
+            raise MirrorError("All mirrors failed")
+
+        url = winner["url"]
+        response = winner["response"]
+        total = self.get_total_size(response)
+        fallbacks = [m for m in self.preferred + self.scores.rank(self.mirrors) if m != url]
+        log_event(f"Downloading from {url}", "INFO")
+
+        try:
+            with open(dest_path, 'wb') as f:
+                if total:
+                    # Usually planned already from get_size(), this catches catalogs without sizes
+                    # Fail on a full disk now rather than after minutes of downloading
+                    check_space([(dest_path, total)])
+                    preallocate(f, total, dest_path)
+                f.write(winner["buffer"])
+                offset = len(winner["buffer"])
+                if progress_callback:
+                    f.flush()
+                    progress_callback(offset, total)
+                chunks = winner["chunks"]
+
+                while True:
+                    offset, finished = self.stream(f, url, chunks, offset, total, progress_callback)
+                    response.close()
+                    if finished and (not total or offset >= total):
+                        break
+                    if finished:
+                        # Connection closed early without an error, resume elsewhere
+                        self.scores.record_failure(url)
+
+                    # Switch to the next mirror and resume where this one stopped
+                    response = None
+                    while fallbacks and response is None:
+                        next_url = fallbacks.pop(0)
+                        try:
+                            response = self.open(next_url, offset)
+                        except Exception as e:
+                            log_event(f"Mirror {next_url} failed: {str(e)}", "WARNING")
+                            self.scores.record_failure(next_url)
+                    if response is None:
+                        raise MirrorError(f"All mirrors failed after {offset} bytes")
+                    url = next_url
+                    log_event(f"Resuming from {url} at byte {offset}", "INFO")
+                    f.seek(offset)
+                    if not total:
+                        f.truncate()
+                    chunks = iter_limited(response, self.priority, CHUNK_SIZE)
+        finally:
+            if response is not None:
+                response.close()
+            self.save_scores()
+
+        return dest_path
+
+
+def get_download_size(mirrors):
+    """Size of the file behind one or more mirrors, None if they don't say"""
+    return MirrorDownloader(mirrors).get_size()
+
+
+def download_file(mirrors, dest_path, progress_callback=None, priority=PRIORITY_INSTALL, preferred=None):
+    """Convenience function to download a file from one or more mirrors"""
+    return MirrorDownloader(mirrors, priority=priority, preferred=preferred).download(dest_path, progress_callback)
@@ -0,0 +1,311 @@
+"""FrozeCrate - Installer Cache"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+from engine import download_manager, lan_cache
+from utils.file_operations import file_lock
+from utils.logger import log_event
+from utils.network_utils import PRIORITY_INSTALL
+
+INDEX_FILE = "index.json"
+LOCK_FILE = "index.lock"
+BLOB_DIR = "blobs"
+DEFAULT_MAX_SIZE = 10 * 1024 ** 3  # 10 GiB
+HASH_BUFFER_SIZE = 1024 * 1024
+DOWNLOAD_DIR = os.path.join("data", "cache", "downloads")
+
+# Shared by every InstallerCache in the process, the lock file covers other processes
+_index_lock = threading.Lock()
+
+
+def get_default_cache_dir():
+    """Machine-wide cache location so every user profile shares the blobs"""
+    if os.environ.get("FROZECRATE_CACHE_DIR"):
+        return os.environ["FROZECRATE_CACHE_DIR"]
+    if os.name == "nt" and os.environ.get("PROGRAMDATA"):
+        return os.path.join(os.environ["PROGRAMDATA"], "FrozeCrate", "cache", "installers")
+    return os.path.join("data", "cache", "installers")
+
+
+def file_sha256(file_path):
+    """SHA-256 of a file, read in large chunks into a reused buffer"""
+    hasher = hashlib.sha256()
+    buffer = bytearray(HASH_BUFFER_SIZE)
+    view = memoryview(buffer)
+    with open(file_path, "rb", buffering=0) as f:
+        while True:
+            read = f.readinto(buffer)
+            if not read:
+                break
+            hasher.update(view[:read])
+    return hasher.hexdigest()
+
+
+def link_or_copy(source, dest):
+    """Hardlink source to dest, falling back to a copy across volumes"""
+    if os.path.exists(dest):
+        os.remove(dest)
+    try:
+        os.link(source, dest)
+    except OSError:
+        shutil.copy2(source, dest)
+
+
+class InstallerCache:
+    """Content-addressed store of downloaded installers.
+
+    Blobs are stored once per SHA-256 under blobs/<2 hex>/<sha256>. The index
+    maps each blob to the app versions that use it and tracks when it was last
+    used, so the cache can be trimmed least-recently-used first.
+    """
+
+    def __init__(self, cache_dir=None, max_size=DEFAULT_MAX_SIZE):
+        self.cache_dir = cache_dir or get_default_cache_dir()
+        self.max_size = max_size
+        self.index_path = os.path.join(self.cache_dir, INDEX_FILE)
+        self.lock_path = os.path.join(self.cache_dir, LOCK_FILE)
+
+    @contextmanager
+    def locked(self):
+        """Hold the index for a read-modify-write against other instances and processes"""
+        with _index_lock, file_lock(self.lock_path):
+            yield
+
+    def blob_path(self, sha256):
+        return os.path.join(self.cache_dir, BLOB_DIR, sha256[:2], sha256)
+
+    def load_index(self):
+        try:
+            with open(self.index_path, 'r', encoding="utf-8") as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            index = {}
+        index.setdefault("blobs", {})
+        index.setdefault("apps", {})
+        return index
+
+    def save_index(self, index):
+        """Atomically replace the index; call with locked() held"""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(prefix=f"{INDEX_FILE}.", suffix=".tmp", dir=self.cache_dir)
+        try:
+            with os.fdopen(fd, 'w', encoding="utf-8") as f:
+                json.dump(index, f, indent=2)
+            os.replace(tmp_path, self.index_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def add(self, file_path, app_id, version, expected_sha256=None):
+        """Move a downloaded installer into the cache and return its SHA-256.
+
+        If the same content is already cached the new file is dropped and the
+        existing blob is reused. Raises ValueError on a checksum mismatch.
+        """
+        sha256 = file_sha256(file_path)
+        if expected_sha256 and sha256 != expected_sha256.lower():
+            os.remove(file_path)
+            raise ValueError(f"Checksum mismatch for {app_id} {version}: expected {expected_sha256}, got {sha256}")
+
+        with self.locked():
+            index = self.load_index()
+            blob = self.blob_path(sha256)
+            if os.path.exists(blob):
+                os.remove(file_path)
+            else:
+                os.makedirs(os.path.dirname(blob), exist_ok=True)
+                try:
+                    os.replace(file_path, blob)
+                except OSError:
+                    # Different volume, fall back to copy + delete
+                    shutil.move(file_path, blob)
+
+            entry = index["blobs"].setdefault(sha256, {"refs": []})
+            entry["size"] = os.path.getsize(blob)
+            entry["last_used"] = time.time()
+            ref = {"app_id": app_id, "version": version}
+            if ref not in entry["refs"]:
+                entry["refs"].append(ref)
+            entry.setdefault("added", datetime.now().isoformat())
+            index["apps"].setdefault(app_id, {})[version] = sha256
+
+            self._evict(index, self.max_size, keep=sha256)
+            self.save_index(index)
+
+        log_event(f"Cached installer for {app_id} {version} ({sha256[:12]})", "INFO")
+        return sha256
+
+    def lookup(self, app_id, version):
+        """Return the SHA-256 cached for an app version, or None"""
+        sha256 = self.load_index()["apps"].get(app_id, {}).get(version)
+        if sha256 and os.path.exists(self.blob_path(sha256)):
+            return sha256
+        return None
+
+    def get(self, app_id, version):
+        """Return the blob path for an app version and mark it as recently used"""
+        with self.locked():
+            index = self.load_index()
+            sha256 = index["apps"].get(app_id, {}).get(version)
+            if not sha256:
+                return None
+            blob = self.blob_path(sha256)
+            if not os.path.exists(blob):
+                # Blob removed behind our back, forget about it
+                self._forget(index, sha256)
+                self.save_index(index)
+                return None
+            index["blobs"].setdefault(sha256, {"refs": []})["last_used"] = time.time()
+            self.save_index(index)
+        return blob
+
+    def link(self, sha256, dest_path):
+        """Place a cached blob at dest_path without copying when possible"""
+        os.makedirs(os.path.dirname(os.path.abspath(dest_path)), exist_ok=True)
+        link_or_copy(self.blob_path(sha256), dest_path)
+        return dest_path
+
+    def versions(self, app_id):
+        """Cached versions of an app, e.g. for rolling back"""
+        return sorted(self.load_index()["apps"].get(app_id, {}))
+
+    def total_size(self):
+        return sum(entry.get("size", 0) for entry in self.load_index()["blobs"].values())
+
+    def _forget(self, index, sha256):
+        index["blobs"].pop(sha256, None)
+        for app_id in list(index["apps"]):
+            versions = index["apps"][app_id]
+            for version in [v for v, s in versions.items() if s == sha256]:
+                del versions[version]
+            if not versions:
+                del index["apps"][app_id]
+
+    def _evict(self, index, max_size, keep=None):
+        """Drop least recently used blobs until the cache fits in max_size"""
+        removed = []
+        total = sum(entry.get("size", 0) for entry in index["blobs"].values())
+        by_age = sorted(index["blobs"].items(), key=lambda item: item[1].get("last_used", 0))
+        for sha256, entry in by_age:
+            if total <= max_size:
+                break
+            if sha256 == keep:
+                continue
+            try:
+                os.remove(self.blob_path(sha256))
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                # Probably in use by a running installer, try again next time
+                log_event(f"Could not evict cached installer {sha256[:12]}: {str(e)}", "WARNING")
+                continue
+            total -= entry.get("size", 0)
+            self._forget(index, sha256)
+            removed.append(sha256)
+        return removed
+
+    def prune(self, max_size=None):
+        """Trim the cache to max_size bytes and drop files the index does not know.
+
+        Returns the list of evicted SHA-256 digests.
+        """
+        max_size = self.max_size if max_size is None else max_size
+        with self.locked():
+            index = self.load_index()
+
+            # Index entries whose blob is gone
+            for sha256 in [s for s in index["blobs"] if not os.path.exists(self.blob_path(s))]:
+                self._forget(index, sha256)
+
+            # Blobs (or leftover temp files) missing from the index
+            blob_root = os.path.join(self.cache_dir, BLOB_DIR)
+            for dirpath, _, filenames in os.walk(blob_root):
+                for filename in filenames:
+                    if filename not in index["blobs"]:
+                        os.remove(os.path.join(dirpath, filename))
+
+            removed = self._evict(index, max_size)
+            self.save_index(index)
+        return removed
+
+
+def get_version_source(app, version=None):
+    """
+    Download sources the catalog lists for an app version, as (mirrors, sha256).
+
+    The top-level download_url, mirrors and sha256 belong to the catalog's
+    version. Any other version needs its own entry in the app's downloads map
+    ({version: {"download_url", "mirrors", "sha256"}}) with a checksum, so a
+    file is never filed under a version it was not published as. Returns None
+    when the catalog has no source for the version.
+    """
+    version = version or app.get("version")
+    entry = (app.get("downloads") or {}).get(version)
+    if entry is not None:
+        mirrors = download_manager.get_app_mirrors(entry)
+        return (mirrors, entry["sha256"]) if mirrors and entry.get("sha256") else None
+    if version != app.get("version"):
+        return None
+    mirrors = download_manager.get_app_mirrors(app)
+    return (mirrors, app.get("sha256")) if mirrors else None
+
+
+def get_installer_filename(app, version=None):
+    """File name to give an app's installer, taken from its first download URL"""
+    source = get_version_source(app, version)
+    mirrors = source[0] if source else download_manager.get_app_mirrors(app)
+    if mirrors:
+        name = os.path.basename(mirrors[0].split("?")[0])
+        if name:
+            return name
+    return f"{app['id']}-{version or app.get('version')}"
+
+
+def cache_installer(app, version=None, priority=PRIORITY_INSTALL, progress_callback=None, cache=None,
+                    observer=None, use_lan_cache=True):
+    """Make sure an app version's installer is cached; returns its SHA-256.
+
+    Returns None when the version is not cached and the catalog has no
+    download source for it (see get_version_source). Downloads are verified
+    against the catalog's sha256 when it has one. An observer's start(part_path) and finish() are
+    called around the download so it can read the file while it grows.
+    A configured or discovered LAN cache is tried before the app's mirrors,
+    but only for versions with a catalog sha256 to check its bytes against.
+    """
+    version = version or app.get("version")
+    cache = cache or InstallerCache()
+    sha256 = cache.lookup(app["id"], version)
+    if sha256:
+        return sha256
+
+    source = get_version_source(app, version)
+    if source is None:
+        return None
+    mirrors, expected_sha256 = source
+
+    # Unique temp name, a prefetch and an install of the same app may overlap
+    os.makedirs(DOWNLOAD_DIR, exist_ok=True)
+    fd, part_path = tempfile.mkstemp(prefix=f"{app['id']}-", suffix=".part", dir=DOWNLOAD_DIR)
+    os.close(fd)
+    try:
+        if observer:
+            observer.start(part_path)
+        try:
+            preferred = lan_cache.get_installer_urls(expected_sha256) if use_lan_cache else []
+            download_manager.download_file(mirrors, part_path, progress_callback, priority, preferred=preferred)
+        finally:
+            if observer:
+                observer.finish()
+        return cache.add(part_path, app["id"], version, expected_sha256)
+    finally:
+        if os.path.exists(part_path):
+            os.remove(part_path)
@@ -0,0 +1,93 @@
+"""FrozeCrate - LAN Cache
+
+Client side of the office cache server (see engine/cache_server.py). Finds
+a cache, either configured in lan_cache_url or discovered by UDP broadcast,
+and builds the installer URLs to try before the origin.
+
+The cache is plain HTTP and anyone on the network can answer discovery, so
+it is only trusted as transport: installers are fetched from it by the
+sha256 the origin catalog published and verified against it, and installers
+without one always come from the origin. The catalog never comes from it.
+"""
+
+import json
+import socket
+import threading
+import time
+import requests
+
+from config import get_setting
+from utils.logger import log_event
+
+SERVICE_NAME = "frozecrate-cache"
+DISCOVERY_PORT = 47913
+DISCOVERY_REQUEST = b"FROZECRATE-CACHE-DISCOVER"
+DISCOVERY_TIMEOUT = 1.0  # seconds to wait for a cache to answer
+DISCOVERY_TTL = 600  # seconds a discovery result (or the lack of one) is reused
+PING_TIMEOUT = 2
+
+_discovered = None  # (monotonic time, url or None)
+_discovery_lock = threading.Lock()
+
+
+def ping(url, timeout=PING_TIMEOUT):
+    """Check that url is a FrozeCrate cache server"""
+    try:
+        response = requests.get(f"{url}/ping", timeout=timeout)
+        return response.ok and response.json().get("service") == SERVICE_NAME
+    except (requests.exceptions.RequestException, ValueError):
+        return False
+
+
+def discover(timeout=DISCOVERY_TIMEOUT, address="<broadcast>", port=DISCOVERY_PORT):
+    """Broadcast for a cache server on the local network; returns its URL or None"""
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+        sock.settimeout(timeout)
+        try:
+            sock.sendto(DISCOVERY_REQUEST, (address, port))
+            deadline = time.monotonic() + timeout
+            while time.monotonic() < deadline:
+                data, (host, _) = sock.recvfrom(1024)
+                try:
+                    reply = json.loads(data)
+                except ValueError:
+                    continue
+                if reply.get("service") == SERVICE_NAME and reply.get("port"):
+                    url = f"http://{host}:{reply['port']}"
+                    if ping(url):
+                        return url
+        except OSError:
+            pass
+    return None
+
+
+def get_cache_url():
+    """URL of the cache server to prefer, or None to go straight to the origin"""
+    configured = get_setting("lan_cache_url", "")
+    if configured:
+        return configured.rstrip("/")
+    if not get_setting("lan_cache_discovery", False):
+        return None
+
+    global _discovered
+    with _discovery_lock:
+        if _discovered and time.monotonic() - _discovered[0] < DISCOVERY_TTL:
+            return _discovered[1]
+        url = discover()
+        if url:
+            log_event(f"Using LAN cache at {url}", "INFO")
+        _discovered = (time.monotonic(), url)
+        return url
+
+
+def get_blob_url(cache_url, sha256):
+    return f"{cache_url}/blobs/{sha256.lower()}"
+
+
+def get_installer_urls(sha256):
+    """Cache URLs to try before the app's own mirrors, none without an origin checksum"""
+    if not sha256:
+        return []
+    cache_url = get_cache_url()
+    return [get_blob_url(cache_url, sha256)] if cache_url else []
@@ -0,0 +1,483 @@
+"""FrozeCrate - Portable Installer"""
+
+import os
+import shutil
+import struct
+import tempfile
+import threading
+import time
+import zipfile
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import py7zr
+except ImportError:
+    py7zr = None
+
+from config import get_setting
+from engine.installer_cache import InstallerCache, cache_installer, get_installer_filename
+from utils.logger import log_event
+from utils.network_utils import PRIORITY_INSTALL
+
+ARCHIVE_FORMATS = {".zip": "zip", ".7z": "7z"}
+COPY_BUFFER_SIZE = 1024 * 1024
+DEFAULT_WORKERS = min(8, os.cpu_count() or 1)
+
+LOCAL_HEADER = struct.Struct("<4sHHHHHIIIHH")
+LOCAL_HEADER_SIGNATURE = b"PK\x03\x04"
+DATA_DESCRIPTOR_SIGNATURE = b"PK\x07\x08"
+# Central directory / end records, once seen there are no more file entries
+END_SIGNATURES = (b"PK\x01\x02", b"PK\x05\x06", b"PK\x06\x06", b"PK\x06\x07")
+ZIP64_EXTRA_ID = 0x0001
+
+
+def get_archive_format(filename):
+    """Return "zip" or "7z" for a portable archive file name, None otherwise"""
+    for extension, archive_format in ARCHIVE_FORMATS.items():
+        if filename.lower().endswith(extension):
+            return archive_format
+    return None
+
+
+def get_default_install_root():
+    if os.name == "nt" and os.environ.get("LOCALAPPDATA"):
+        return os.path.join(os.environ["LOCALAPPDATA"], "FrozeCrate", "apps")
+    return os.path.join("data", "apps")
+
+
+def get_portable_install_dir(app):
+    # Set when the install planner put the app on another volume
+    if app.get("install_dir"):
+        return app["install_dir"]
+    return os.path.join(get_setting("portable_install_dir") or get_default_install_root(), app["id"])
+
+
+def safe_path(root, member_name):
+    """Join an archive member name onto root, refusing names that escape it"""
+    name = member_name.replace("\\", "/")
+    if name.startswith("/") or (len(name) > 1 and name[1] == ":"):
+        raise ValueError(f"Absolute path in archive: {member_name}")
+    target = os.path.normpath(os.path.join(root, name))
+    if os.path.commonpath([os.path.abspath(root), os.path.abspath(target)]) != os.path.abspath(root):
+        raise ValueError(f"Archive member escapes the install directory: {member_name}")
+    return target
+
+
+def extract_zip(archive_path, dest_dir, members=None, workers=DEFAULT_WORKERS):
+    """Extract a zip on several threads, each with its own handle on the archive.
+
+    zlib releases the GIL while inflating, so members really are decompressed
+    in parallel. Returns (files, bytes) extracted.
+    """
+    with zipfile.ZipFile(archive_path) as archive:
+        infos = [info for info in archive.infolist() if members is None or info.filename in members]
+
+    targets = {info.filename: safe_path(dest_dir, info.filename) for info in infos}
+    for info in infos:
+        os.makedirs(targets[info.filename] if info.is_dir() else os.path.dirname(targets[info.filename]), exist_ok=True)
+    # Largest first so one big file doesn't end up last on a single thread
+    files = sorted((info for info in infos if not info.is_dir()), key=lambda info: info.file_size, reverse=True)
+
+    local = threading.local()
+    handles = []
+
+    def extract_one(info):
+        archive = getattr(local, "archive", None)
+        if archive is None:
+            archive = local.archive = zipfile.ZipFile(archive_path)
+            handles.append(archive)
+        # ZipExtFile checks the CRC once the member has been read completely
+        with archive.open(info) as src, open(targets[info.filename], "wb") as dst:
+            shutil.copyfileobj(src, dst, COPY_BUFFER_SIZE)
+        return info.file_size
+
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            total = sum(executor.map(extract_one, files))
+    finally:
+        for archive in handles:
+            archive.close()
+    return len(files), total
+
+
+def extract_7z(archive_path, dest_dir):
+    """Extract a 7z archive with py7zr. Returns (files, bytes) extracted."""
+    if py7zr is None:
+        raise RuntimeError("py7zr is required to install 7z archives")
+    with py7zr.SevenZipFile(archive_path, "r") as archive:
+        infos = [info for info in archive.list() if not info.is_directory]
+        for name in archive.getnames():
+            safe_path(dest_dir, name)
+        archive.extractall(path=dest_dir)
+    return len(infos), sum(info.uncompressed or 0 for info in infos)
+
+
+def extract_archive(archive_path, dest_dir, archive_format, workers=DEFAULT_WORKERS):
+    if archive_format == "zip":
+        return extract_zip(archive_path, dest_dir, workers=workers)
+    if archive_format == "7z":
+        return extract_7z(archive_path, dest_dir)
+    raise ValueError(f"Unsupported archive format: {archive_format}")
+
+
+class UnsupportedStream(Exception):
+    """The zip can't be extracted from a stream, fall back to the central directory"""
+
+
+class ZipStreamExtractor:
+    """
+    Extract a zip from its bytes in order, using the local file headers.
+
+    Works for stored and deflated members, including ones with data
+    descriptors. Anything else (encryption, other methods, odd layouts) stops
+    streaming; whatever was not extracted is picked up from the finished
+    archive afterwards.
+    """
+
+    def __init__(self, dest_dir):
+        self.dest_dir = dest_dir
+        self.buffer = bytearray()
+        self.entry = None
+        self.done = False
+        self.failed = None
+        self.extracted = {}
+        self.bytes_written = 0
+        self.seconds = 0.0  # time spent extracting, not waiting for data
+
+    def feed(self, data):
+        if self.done or self.failed:
+            return
+        start = time.monotonic()
+        self.buffer += data
+        try:
+            while not self.done and (self.read_data() if self.entry else self.read_header()):
+                pass
+        except (UnsupportedStream, ValueError, OSError, zlib.error) as e:
+            self.failed = str(e)
+            self.discard_entry()
+            log_event(f"Streaming extraction stopped: {self.failed}", "INFO")
+        finally:
+            self.seconds += time.monotonic() - start
+
+    def read_header(self):
+        if len(self.buffer) < 4:
+            return False
+        signature = bytes(self.buffer[:4])
+        if signature in END_SIGNATURES:
+            self.done = True
+            return False
+        if signature != LOCAL_HEADER_SIGNATURE:
+            raise UnsupportedStream("unexpected record in zip stream")
+        if len(self.buffer) < LOCAL_HEADER.size:
+            return False
+        (_, _, flags, method, _, _, crc, compressed_size, size,
+         name_length, extra_length) = LOCAL_HEADER.unpack_from(self.buffer)
+        header_length = LOCAL_HEADER.size + name_length + extra_length
+        if len(self.buffer) < header_length:
+            return False
+
+        raw_name = bytes(self.buffer[LOCAL_HEADER.size:LOCAL_HEADER.size + name_length])
+        extra = bytes(self.buffer[LOCAL_HEADER.size + name_length:header_length])
+        del self.buffer[:header_length]
+
+        name = raw_name.decode("utf-8" if flags & 0x800 else "cp437")
+        zip64 = False
+        offset = 0
+        while offset + 4 <= len(extra):
+            field_id, field_length = struct.unpack_from("<HH", extra, offset)
+            if field_id == ZIP64_EXTRA_ID:
+                zip64 = True
+                values = list(struct.unpack_from(f"<{field_length // 8}Q", extra, offset + 4))
+                if size == 0xFFFFFFFF and values:
+                    size = values.pop(0)
+                if compressed_size == 0xFFFFFFFF and values:
+                    compressed_size = values.pop(0)
+            offset += 4 + field_length
+
+        if flags & 0x1:
+            raise UnsupportedStream(f"{name} is encrypted")
+        if method not in (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED):
+            raise UnsupportedStream(f"{name} uses compression method {method}")
+        has_descriptor = bool(flags & 0x8)
+        if has_descriptor and method == zipfile.ZIP_STORED:
+            raise UnsupportedStream(f"{name} has no size in its local header")
+
+        target = safe_path(self.dest_dir, name)
+        self.entry = {
+            "name": name,
+            "method": method,
+            "crc": crc,
+            "size": size,
+            "remaining": compressed_size,
+            "descriptor": has_descriptor,
+            "zip64": zip64,
+            "crc_calc": 0,
+            "written": 0,
+            "target": target,
+            "file": None,
+            "inflater": zlib.decompressobj(-15) if method == zipfile.ZIP_DEFLATED else None,
+        }
+        if name.endswith("/"):
+            os.makedirs(target, exist_ok=True)
+            self.entry["directory"] = True
+        else:
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            self.entry["file"] = open(target, "wb")
+        if not has_descriptor and compressed_size == 0:
+            self.finish_entry()
+        return True
+
+    def write(self, data):
+        if data and self.entry["file"] is not None:
+            self.entry["file"].write(data)
+            self.entry["crc_calc"] = zlib.crc32(data, self.entry["crc_calc"])
+            self.entry["written"] += len(data)
+
+    def read_data(self):
+        entry = self.entry
+        inflater = entry["inflater"]
+
+        if entry["descriptor"]:
+            # Size unknown up front: inflate until the deflate stream ends
+            if not inflater.eof:
+                if not self.buffer:
+                    return False
+                data = bytes(self.buffer)
+                self.buffer.clear()
+                self.write(inflater.decompress(data))
+                if inflater.eof:
+                    self.buffer[:0] = inflater.unused_data
+                return True
+            size_field = 8 if entry["zip64"] else 4
+            if len(self.buffer) < 4:
+                return False
+            start = 4 if bytes(self.buffer[:4]) == DATA_DESCRIPTOR_SIGNATURE else 0
+            length = start + 4 + 2 * size_field
+            if len(self.buffer) < length:
+                return False
+            entry["crc"] = struct.unpack_from("<I", self.buffer, start)[0]
+            entry["size"] = struct.unpack_from("<Q" if entry["zip64"] else "<I", self.buffer, start + 4 + size_field)[0]
+            del self.buffer[:length]
+            self.finish_entry()
+            return True
+
+        take = min(entry["remaining"], len(self.buffer))
+        if not take:
+            return False
+        data = bytes(self.buffer[:take])
+        del self.buffer[:take]
+        entry["remaining"] -= take
+        self.write(inflater.decompress(data) if inflater else data)
+        if entry["remaining"] == 0:
+            if inflater:
+                self.write(inflater.flush())
+            self.finish_entry()
+        return True
+
+    def finish_entry(self):
+        entry = self.entry
+        if entry["file"] is not None:
+            entry["file"].close()
+        if entry.get("directory"):
+            self.extracted[entry["name"]] = 0
+        elif entry["crc_calc"] != entry["crc"] or entry["written"] != entry["size"]:
+            os.remove(entry["target"])
+            self.entry = None
+            raise UnsupportedStream(f"{entry['name']} failed its CRC check")
+        else:
+            self.extracted[entry["name"]] = entry["written"]
+            self.bytes_written += entry["written"]
+        self.entry = None
+
+    def discard_entry(self):
+        if self.entry and self.entry["file"] is not None:
+            self.entry["file"].close()
+            try:
+                os.remove(self.entry["target"])
+            except OSError:
+                pass
+        self.entry = None
+
+
+class DownloadFollower:
+    """Feeds a download's part file to a ZipStreamExtractor while it is written"""
+
+    def __init__(self, extractor):
+        self.extractor = extractor
+        self.condition = threading.Condition()
+        self.available = 0
+        self.finished = False
+        self.thread = None
+        self.path = None
+
+    def start(self, part_path):
+        self.path = part_path
+        self.thread = threading.Thread(target=self.run, name="zip-stream", daemon=True)
+        self.thread.start()
+
+    def progress(self, bytes_downloaded, total_size):
+        with self.condition:
+            self.available = bytes_downloaded
+            self.condition.notify()
+
+    def finish(self):
+        with self.condition:
+            self.finished = True
+            self.condition.notify()
+        if self.thread:
+            self.thread.join()
+
+    def run(self):
+        position = 0
+        with open(self.path, "rb") as f:
+            while True:
+                with self.condition:
+                    while position >= self.available and not self.finished:
+                        self.condition.wait()
+                    finished = self.finished
+                    available = self.available
+                # The file may be preallocated, only bytes reported as written are real
+                data = f.read(COPY_BUFFER_SIZE if finished else min(COPY_BUFFER_SIZE, available - position))
+                if data:
+                    position += len(data)
+                    self.extractor.feed(data)
+                    if self.extractor.done or self.extractor.failed:
+                        return
+                elif finished:
+                    return
+                else:
+                    time.sleep(0.01)
+
+
+def swap_into_place(staging_dir, install_dir):
+    """Replace install_dir with the staged files, keeping the old copy until it worked"""
+    source = staging_dir
+    entries = os.listdir(staging_dir)
+    # Most portable archives wrap everything in one top-level folder
+    if len(entries) == 1 and os.path.isdir(os.path.join(staging_dir, entries[0])):
+        source = os.path.join(staging_dir, entries[0])
+
+    old_dir = None
+    if os.path.exists(install_dir):
+        old_dir = f"{install_dir}.old-{os.getpid()}"
+        os.replace(install_dir, old_dir)
+    try:
+        os.replace(source, install_dir)
+    except OSError:
+        if old_dir:
+            os.replace(old_dir, install_dir)
+        raise
+    if old_dir:
+        shutil.rmtree(old_dir, ignore_errors=True)
+    if source != staging_dir:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+
+
+class StreamingDownload:
+    """Download observer that extracts a zip while it downloads"""
+
+    def __init__(self, staging_dir, progress_callback=None):
+        self.extractor = ZipStreamExtractor(staging_dir)
+        self.follower = DownloadFollower(self.extractor)
+        self.progress_callback = progress_callback
+
+    def start(self, part_path):
+        self.follower.start(part_path)
+
+    def progress(self, bytes_downloaded, total_size):
+        self.follower.progress(bytes_downloaded, total_size)
+        if self.progress_callback:
+            self.progress_callback(bytes_downloaded, total_size)
+
+    def finish(self):
+        self.follower.finish()
+
+
+def install_portable(app, version=None, install_dir=None, progress_callback=None,
+                     cache=None, workers=DEFAULT_WORKERS):
+    """
+    Install a portable app from its zip/7z archive.
+
+    The archive comes from the installer cache or is downloaded into it; zips
+    are extracted while downloading. Files go to a staging directory next to
+    install_dir that is swapped in once everything is extracted. Returns a dict
+    with the install path, timings and extraction throughput (mb_per_s).
+    """
+    version = version or app.get("version")
+    cache = cache or InstallerCache()
+    install_dir = install_dir or get_portable_install_dir(app)
+    archive_format = get_archive_format(get_installer_filename(app, version))
+    if archive_format is None:
+        raise ValueError(f"{app['id']} does not point to a zip or 7z archive")
+    if archive_format == "7z" and py7zr is None:
+        raise RuntimeError("py7zr is required to install 7z archives")
+
+    parent_dir = os.path.dirname(os.path.abspath(install_dir))
+    os.makedirs(parent_dir, exist_ok=True)
+    staging_dir = tempfile.mkdtemp(prefix=f".{os.path.basename(install_dir)}-staging-", dir=parent_dir)
+    try:
+        start = time.monotonic()
+        streamed = {}
+        # Extraction done while the zip was still downloading
+        streamed_seconds = 0.0
+        sha256 = cache.lookup(app["id"], version)
+        if sha256 is None:
+            observer = StreamingDownload(staging_dir, progress_callback) if archive_format == "zip" else None
+            sha256 = cache_installer(
+                app, version, PRIORITY_INSTALL,
+                observer.progress if observer else progress_callback,
+                cache, observer=observer,
+            )
+            if sha256 is None:
+                raise RuntimeError(f"No download source for {app['id']} {version}")
+            if observer:
+                streamed = observer.extractor.extracted
+                streamed_seconds = observer.extractor.seconds
+        download_seconds = time.monotonic() - start
+        extract_start = time.monotonic()
+        archive_path = cache.get(app["id"], version)
+
+        if archive_format == "zip":
+            with zipfile.ZipFile(archive_path) as archive:
+                infos = archive.infolist()
+            # Whatever the stream could not extract comes from the finished archive
+            missing = {info.filename for info in infos if streamed.get(info.filename) != info.file_size}
+            if missing:
+                extract_zip(archive_path, staging_dir, missing, workers)
+            files = sum(1 for info in infos if not info.is_dir())
+            size = sum(info.file_size for info in infos)
+        else:
+            files, size = extract_7z(archive_path, staging_dir)
+
+        swap_into_place(staging_dir, install_dir)
+    except Exception:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        raise
+
+    end = time.monotonic()
+    extract_seconds = streamed_seconds + end - extract_start
+    stats = {
+        "path": install_dir,
+        "files": files,
+        "bytes": size,
+        "streamed_files": sum(1 for name in streamed if not name.endswith("/")),
+        "seconds": end - start,
+        "download_seconds": download_seconds,
+        "extract_seconds": extract_seconds,
+        # Extraction throughput only, the download is timed separately
+        "mb_per_s": size / (1024 ** 2) / extract_seconds if extract_seconds else 0.0,
+    }
+    log_event(f"Installed {app['id']} {version}: {files} files, {size / (1024 ** 2):.1f} MB "
+              f"in {stats['seconds']:.1f}s (download {download_seconds:.1f}s, extraction {extract_seconds:.1f}s "
+              f"at {stats['mb_per_s']:.1f} MB/s, {stats['streamed_files']} streamed)", "INFO")
+    return stats
+
+
+def uninstall_portable(app, install_dir=None):
+    """Remove a portable app's directory"""
+    install_dir = install_dir or get_portable_install_dir(app)
+    if not os.path.isdir(install_dir):
+        return False
+    shutil.rmtree(install_dir)
+    return True
@@ -0,0 +1,324 @@
+"""FrozeCrate - Resource Monitor"""
+
+import os
+import threading
+import time
+from collections import deque
+
+import psutil
+
+from utils.logger import log_event
+
+MONITOR_INTERVAL = 2  # seconds between samples
+HISTORY_LENGTH = 60  # samples kept per app for the sparklines
+CHILD_SCAN_INTERVAL = 5  # samples between process tree rescans
+
+CPU_COUNT = psutil.cpu_count() or 1
+MB = 1024 * 1024
+
+
+class AppSample:
+    """Resource usage of one app's process tree at a point in time"""
+
+    __slots__ = ("cpu_percent", "rss", "io_rate", "processes")
+
+    def __init__(self, cpu_percent, rss, io_rate, processes):
+        self.cpu_percent = cpu_percent  # of the whole machine, like Task Manager
+        self.rss = rss  # bytes
+        self.io_rate = io_rate  # bytes/s read + written, None where the OS doesn't report it
+        self.processes = processes
+
+    def display_key(self):
+        """What the status panel shows; samples with the same key aren't pushed again"""
+        io_kb = None if self.io_rate is None else round(self.io_rate / 1024)
+        return round(self.cpu_percent, 1), round(self.rss / MB), io_kb, self.processes
+
+    def to_dict(self):
+        return {"cpu_percent": self.cpu_percent, "rss": self.rss, "io_rate": self.io_rate, "processes": self.processes}
+
+
+def own_session(process):
+    """The session id if the process leads its own session (POSIX), else None"""
+    try:
+        return process.pid if os.getsid(process.pid) == process.pid else None
+    except (AttributeError, OSError):
+        return None
+
+
+class TrackedApp:
+    def __init__(self, app_id, root, popen=None, history=HISTORY_LENGTH):
+        self.app_id = app_id
+        self.root = root
+        self.popen = popen
+        self.started = root.create_time()
+        # Children the shell leaves behind are re-parented to init, but stay in its session
+        self.session = own_session(root)
+        self.processes = {}  # (pid, create_time) -> psutil.Process
+        self.previous = {}  # (pid, create_time) -> (cpu seconds, io bytes)
+        self.history = deque(maxlen=history)
+        self.pushed = None
+
+    def add(self, process):
+        try:
+            self.processes.setdefault((process.pid, process.create_time()), process)
+        except psutil.Error:
+            pass
+
+
+class ResourceMonitor:
+    """
+    Tracks launched apps and their process trees.
+
+    All tracked processes are sampled together once per interval by a single
+    thread, using one oneshot() read per process. Children are rediscovered
+    every few samples rather than every time, since walking the process table
+    costs more than sampling a handful of known processes.
+
+    Processes outliving their parent are kept. On POSIX they stay in the
+    app's session (the launcher gives each app its own), which is checked for
+    pids that are new since the last sample. Windows keeps the parent's pid
+    in its orphans, so the table is searched for them when a tracked process
+    exits. Subscribers only receive apps whose displayed values changed, and
+    None once an app exits.
+    """
+
+    def __init__(self, interval=MONITOR_INTERVAL, history=HISTORY_LENGTH, child_scan_interval=CHILD_SCAN_INTERVAL):
+        self.interval = interval
+        self.history = history
+        self.child_scan_interval = child_scan_interval
+        self.apps = {}
+        self.subscribers = []
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.samples = 0
+        self.last_time = None
+        self.cpu_time = 0.0  # time this monitor spent sampling, see overhead()
+        self.started = None
+        self.known_pids = None  # every pid at the last sample, for the session check
+
+    def track(self, app_id, process):
+        """Start tracking a launched app, process is a Popen or a pid"""
+        pid = getattr(process, "pid", process)
+        try:
+            root = psutil.Process(pid)
+        except psutil.Error:
+            log_event(f"Cannot monitor {app_id}, process {pid} is gone", "WARNING")
+            return False
+        popen = process if hasattr(process, "poll") else None
+        try:
+            new = TrackedApp(app_id, root, popen, self.history)
+        except psutil.Error:
+            log_event(f"Cannot monitor {app_id}, process {pid} is gone", "WARNING")
+            return False
+        with self.lock:
+            tracked = self.apps.setdefault(app_id, new)
+            tracked.add(root)
+            self.start()
+        return True
+
+    def untrack(self, app_id):
+        with self.lock:
+            return self.apps.pop(app_id, None) is not None
+
+    def history_for(self, app_id):
+        """Recent AppSamples for an app, oldest first"""
+        with self.lock:
+            tracked = self.apps.get(app_id)
+            return list(tracked.history) if tracked else []
+
+    def subscribe(self, callback):
+        """callback(changes) with app id -> AppSample, or None for exited apps; returns an unsubscribe function"""
+        with self.lock:
+            self.subscribers.append(callback)
+
+        def unsubscribe():
+            with self.lock:
+                if callback in self.subscribers:
+                    self.subscribers.remove(callback)
+        return unsubscribe
+
+    def start(self):
+        """Called with the lock held, run() exits under the same lock once nothing is tracked"""
+        if self.thread and self.thread.is_alive():
+            return
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self.run, name="resource-monitor", daemon=True)
+        self.thread.start()
+
+    def stop(self, timeout=None):
+        self.stop_event.set()
+        thread = self.thread
+        if thread:
+            thread.join(timeout)
+
+    def run(self):
+        while not self.stop_event.is_set():
+            with self.lock:
+                if not self.apps:
+                    self.thread = None  # track() starts a new one
+                    return
+            try:
+                self.sample()
+            except Exception as e:
+                log_event(f"Resource monitor sample failed: {str(e)}", "WARNING")
+            self.stop_event.wait(self.interval)
+
+    def overhead(self):
+        """Fraction of one core spent sampling since the first sample"""
+        if not self.started:
+            return 0.0
+        return self.cpu_time / max(time.monotonic() - self.started, 1e-6)
+
+    def scan_children(self, tracked):
+        pids = {pid for pid, _ in tracked.processes}
+        for process in list(tracked.processes.values()):
+            try:
+                if process.ppid() in pids:
+                    continue  # covered by its parent's walk
+                for child in process.children(recursive=True):
+                    tracked.add(child)
+            except psutil.Error:
+                pass
+
+    def new_pids(self):
+        """Pids that appeared since the last call, all of them on the first"""
+        pids = set(psutil.pids())
+        new = pids - self.known_pids if self.known_pids is not None else pids
+        self.known_pids = pids
+        return new
+
+    def scan_session(self, tracked, pids):
+        """Add processes among pids that belong to the app's session"""
+        for pid in pids:
+            try:
+                if os.getsid(pid) != tracked.session:
+                    continue
+                process = psutil.Process(pid)
+                # A session id outlives its leader, a reused pid may lead an unrelated session
+                if process.create_time() >= tracked.started:
+                    tracked.add(process)
+            except (OSError, psutil.Error):
+                pass
+
+    def adopt_orphans(self, tracked, exited):
+        """Add the children of exited processes, exited is pid -> create_time"""
+        if os.name != "nt":
+            return  # re-parented to init, scan_session finds them
+        # Windows keeps the exited parent's pid, but only the table can tell who has it
+        for process in psutil.process_iter(["ppid", "create_time"]):
+            parent_time = exited.get(process.info["ppid"])
+            if parent_time is not None and (process.info["create_time"] or 0) >= parent_time:
+                tracked.add(process)
+                try:
+                    for child in process.children(recursive=True):
+                        tracked.add(child)
+                except psutil.Error:
+                    pass
+
+    def sample(self):
+        """Sample every tracked process once and push changed values; returns the changes"""
+        cpu_start = time.thread_time()
+        now = time.monotonic()
+        if self.started is None:
+            self.started = now
+        elapsed = now - self.last_time if self.last_time else None
+        self.last_time = now
+        rescan = self.samples % self.child_scan_interval == 0
+        self.samples += 1
+
+        with self.lock:
+            apps = list(self.apps.values())
+        new_pids = self.new_pids() if any(tracked.session is not None for tracked in apps) else ()
+
+        changes = {}
+        for tracked in apps:
+            if tracked.popen is not None:
+                tracked.popen.poll()  # reap the shell so it doesn't linger as a zombie
+            if new_pids and tracked.session is not None:
+                self.scan_session(tracked, new_pids)
+            if rescan:
+                self.scan_children(tracked)
+            sample, exited = self.sample_app(tracked, elapsed)
+            if exited:
+                self.adopt_orphans(tracked, exited)
+                if sample is None and tracked.processes:
+                    sample, _ = self.sample_app(tracked, elapsed)
+            if sample is None:
+                self.untrack(tracked.app_id)
+                changes[tracked.app_id] = None
+                continue
+            tracked.history.append(sample)
+            key = sample.display_key()
+            if key != tracked.pushed:
+                tracked.pushed = key
+                changes[tracked.app_id] = sample
+
+        self.cpu_time += time.thread_time() - cpu_start
+        if changes:
+            self.notify(changes)
+        return changes
+
+    def sample_app(self, tracked, elapsed):
+        """Aggregate one app's process tree, None once every process has exited.
+
+        Also returns the processes that exited, pid -> create_time.
+        """
+        cpu_seconds = rss = io_bytes = 0
+        io_known = False
+        current = {}
+        exited = {}
+        for key, process in list(tracked.processes.items()):
+            try:
+                with process.oneshot():
+                    if process.status() == psutil.STATUS_ZOMBIE:
+                        raise psutil.NoSuchProcess(process.pid)
+                    times = process.cpu_times()
+                    memory = process.memory_info()
+                    try:
+                        io = process.io_counters()
+                        io_total = io.read_bytes + io.write_bytes
+                    except (psutil.AccessDenied, AttributeError, NotImplementedError):
+                        io_total = None
+            except psutil.Error:
+                del tracked.processes[key]
+                exited[key[0]] = key[1]
+                continue
+
+            cpu_total = times.user + times.system
+            rss += memory.rss
+            last_cpu, last_io = tracked.previous.get(key, (cpu_total, io_total))
+            cpu_seconds += cpu_total - last_cpu
+            if io_total is not None:
+                io_known = True
+                io_bytes += io_total - (last_io if last_io is not None else io_total)
+            current[key] = (cpu_total, io_total)
+
+        # Processes that exited drop out of the deltas instead of going negative
+        tracked.previous = current
+        if not tracked.processes:
+            return None, exited
+        if not elapsed:
+            return AppSample(0.0, rss, 0.0 if io_known else None, len(current)), exited
+        cpu_percent = max(cpu_seconds, 0) / elapsed / CPU_COUNT * 100
+        io_rate = max(io_bytes, 0) / elapsed if io_known else None
+        return AppSample(cpu_percent, rss, io_rate, len(current)), exited
+
+    def notify(self, changes):
+        with self.lock:
+            subscribers = list(self.subscribers)
+        for callback in subscribers:
+            try:
+                callback(changes)
+            except Exception as e:
+                log_event(f"Resource monitor subscriber failed: {str(e)}", "WARNING")
+
+
+_monitor = None
+
+
+def get_monitor():
+    global _monitor
+    if _monitor is None:
+        _monitor = ResourceMonitor()
+    return _monitor
@@ -57,7 +57,9 @@ def get_storage_info():
                     storage_devices.append({
                         "type": "Unknown",  # SSD/HDD detection requires specialized tools
                         "interface": "Unknown",
-                        "capacity_gb": round(usage.total / (1024**3), 2)
+                        "capacity_gb": round(usage.total / (1024**3), 2),
+                        "free_gb": round(usage.free / (1024**3), 2),
+                        "mountpoint": partition.mountpoint
                     })
                     processed_devices.add(partition.device)
                 except PermissionError:
@@ -202,14 +204,19 @@ def get_battery_info():
         if battery:
             return {
                 "capacity_wh": 0,  # Requires specialized tools
-                "estimated_life_hours": f"{round(battery.secsleft / 3600, 1)} hours" if battery.secsleft != psutil.POWER_TIME_UNLIMITED else "Unknown"
+                "estimated_life_hours": f"{round(battery.secsleft / 3600, 1)} hours" if battery.secsleft not in (psutil.POWER_TIME_UNLIMITED, psutil.POWER_TIME_UNKNOWN) else "Unknown",
+                "percent": round(battery.percent),
+                "plugged_in": bool(battery.power_plugged)
             }
     except Exception:
         pass
     
+    # No battery (desktop) or unknown state, treat as mains powered
     return {
         "capacity_wh": 0,
-        "estimated_life_hours": "Unknown"
+        "estimated_life_hours": "Unknown",
+        "percent": None,
+        "plugged_in": True
     }
 
 def get_firmware_info():
@@ -0,0 +1,84 @@
+"""FrozeCrate - Storage Planner"""
+
+import os
+
+from config import get_setting
+from engine import download_manager, portable_installer
+from engine.installer_cache import DOWNLOAD_DIR, InstallerCache, get_version_source
+from engine.spec_checker import get_storage_info
+from utils.file_operations import InsufficientSpaceError, check_space, get_volume_id
+from utils.logger import log_event
+
+PORTABLE_DIR_NAME = os.path.join("FrozeCrate", "apps")
+
+
+def get_system_install_root():
+    """Where regular installers put programs"""
+    return os.environ.get("ProgramFiles") or os.path.abspath(os.sep)
+
+
+def get_candidate_volumes():
+    """Writable volumes from the spec checker, most free space first"""
+    volumes = []
+    for device in get_storage_info():
+        mountpoint = device.get("mountpoint")
+        if mountpoint and os.access(mountpoint, os.W_OK):
+            volumes.append((device.get("free_gb", 0), mountpoint))
+    return [mountpoint for _, mountpoint in sorted(volumes, reverse=True)]
+
+
+def plan_install(app, version=None, download_size=None, install_dir=None, cache=None):
+    """
+    Check that an app can be downloaded and installed before starting.
+
+    Sizes come from the catalog's download_size and install_size (bytes), or
+    download_size when the caller already knows the Content-Length. Without
+    either, the mirrors are asked with a HEAD request before anything is
+    downloaded. Cached installers need no download. Portable apps without a configured install
+    folder move to the volume with the most free space when the default one
+    is too small. Returns a dict with the chosen paths and sizes; raises
+    InsufficientSpaceError if nothing fits.
+    """
+    version = version or app.get("version")
+    cache = cache or InstallerCache()
+    if cache.lookup(app["id"], version):
+        download_size = 0
+    elif download_size is None:
+        # The catalog's size belongs to its own version only
+        download_size = app.get("download_size") if version == app.get("version") else None
+        source = get_version_source(app, version)
+        if not download_size and source:
+            download_size = download_manager.get_download_size(source[0])
+        download_size = download_size or 0
+    install_size = app.get("install_size") or 0
+
+    staging = [(DOWNLOAD_DIR, download_size)]
+    if download_size and get_volume_id(DOWNLOAD_DIR) != get_volume_id(cache.cache_dir):
+        staging.append((cache.cache_dir, download_size))  # moving into the cache copies across volumes
+
+    portable = app.get("install_type") == "portable"
+    if not portable:
+        candidates = [get_system_install_root()]
+    elif install_dir or app.get("install_dir") or get_setting("portable_install_dir"):
+        candidates = [install_dir or portable_installer.get_portable_install_dir(app)]
+    else:
+        candidates = [portable_installer.get_portable_install_dir(app)] + [
+            os.path.join(mountpoint, PORTABLE_DIR_NAME, app["id"]) for mountpoint in get_candidate_volumes()
+        ]
+
+    error = None
+    for target in candidates:
+        try:
+            check_space(staging + [(target, install_size)])
+        except InsufficientSpaceError as e:
+            error = error or e
+            continue
+        if target != candidates[0]:
+            log_event(f"Not enough space for {app['id']} on the default volume, installing to {target}", "INFO")
+        return {
+            "install_dir": target if portable else None,
+            "staging_dir": DOWNLOAD_DIR,
+            "download_size": download_size,
+            "install_size": install_size,
+        }
+    raise error
@@ -1,9 +1,18 @@
 import json
-import requests
 import os
 import shutil
+from concurrent.futures import ThreadPoolExecutor, wait
 from datetime import datetime, timedelta
 import hashlib
+import threading
+
+from config import get_setting
+from utils.network_utils import PRIORITY_SYNC, limited_get
+
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
 
 # Import custom modules (assuming they exist in your project)
 try:
@@ -24,26 +33,64 @@ except ImportError:
         timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         print(f"[{timestamp}] {level}: {message}")
 
+# Digest backends used for change detection. The DB files are only compared
+# against each other, so a fast non-cryptographic hash is good enough.
+HASH_BACKENDS = {
+    "blake2b": hashlib.blake2b,
+    "sha256": hashlib.sha256,
+    "md5": hashlib.md5,
+}
+if xxhash is not None:
+    HASH_BACKENDS["xxh3_64"] = xxhash.xxh3_64
+    HASH_BACKENDS["xxh3_128"] = xxhash.xxh3_128
+
+DEFAULT_HASH_ALGORITHM = "xxh3_64" if xxhash is not None else "blake2b"
+HASH_BUFFER_SIZE = 1024 * 1024  # 1 MiB per read
+
+# (path, algorithm) -> (size, mtime_ns, digest); lets unchanged files skip hashing
+_hash_cache = {}
+
+REPOSITORIES_FILE = "config/repositories.json"
+REPOSITORY_CACHE_DIR = "data/cache/repositories"
+DEFAULT_REPOSITORY_PRIORITY = 100
+DEFAULT_REPOSITORY_TTL_MINUTES = 60
+# How long a catalog sync waits for slow repositories before using their cached copy
+REPOSITORY_FETCH_DEADLINE = 15
+
+_repository_cache_lock = threading.Lock()
+# Background refreshes of stale repository caches, keyed by cache path
+_revalidation_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="repo-revalidate")
+_revalidations = {}
+
 class UpdateChecker:
-    def __init__(self):
+    def __init__(self, hash_algorithm=None):
         self.remote_url = "https://www.example.com/app-data/api=1"
         self.local_db_path = "data/app.db"
         self.server_db_path = "data/server_app.db"
-        self.settings_path = "settings.json"
         self.last_check_file = "data/last_update_check.json"
+        self.repositories_path = REPOSITORIES_FILE
+        self.repository_cache_dir = REPOSITORY_CACHE_DIR
+        self.fetch_deadline = REPOSITORY_FETCH_DEADLINE
+        # Repository name -> Future of its background revalidation
+        self.revalidations = {}
+        # Repositories the last fetch_repositories served from a stale cache
+        self.stale_repositories = []
+        # Outcome of the last check_for_updates: skipped, failed, updated or up_to_date
+        self.last_status = None
+        self.hash_algorithm = hash_algorithm or DEFAULT_HASH_ALGORITHM
+        if self.hash_algorithm not in HASH_BACKENDS:
+            raise ValueError(f"Unknown hash algorithm: {self.hash_algorithm}")
         
     def should_check_for_updates(self):
-        """Check if 24 hours have passed since last update check"""
+        """Check if the configured interval has passed since last update check"""
         try:
-            settings = load_json(self.settings_path)
-            
             # Check if update checker is enabled
-            if not settings.get("update_checker", False):
+            if not get_setting("auto_update_check", False):
                 log_event("Update checker is disabled in settings", "INFO")
                 return False
             
-            # Check interval setting (default 24 hours)
-            interval_hours = settings.get("update_interval_hours", 24)
+            # Check interval setting
+            interval_hours = get_setting("check_interval_minutes", 60) / 60
             
             # Check last update time
             try:
@@ -69,7 +116,11 @@ class UpdateChecker:
             return False
     
     def update_last_check_time(self):
-        """Update the last check timestamp"""
+        """Update the last check timestamp, unless the catalog was partly stale"""
+        if self.stale_repositories:
+            # Check again next time rather than keeping the stale copy for a full interval
+            log_event(f"Served stale catalogs for {', '.join(self.stale_repositories)}, not recording the check", "INFO")
+            return
         try:
             os.makedirs(os.path.dirname(self.last_check_file), exist_ok=True)
             last_check_data = {
@@ -80,42 +131,237 @@ class UpdateChecker:
         except Exception as e:
             log_event(f"Error updating last check time: {str(e)}", "ERROR")
     
-    def get_file_hash(self, file_path):
-        """Calculate MD5 hash of a file for comparison"""
+    def get_file_hash(self, file_path, stat_result=None):
+        """Calculate a digest of a file for comparison, reusing it if the file is unchanged"""
         try:
-            if not os.path.exists(file_path):
-                return None
-                
-            hash_md5 = hashlib.md5()
-            with open(file_path, "rb") as f:
-                for chunk in iter(lambda: f.read(4096), b""):
-                    hash_md5.update(chunk)
-            return hash_md5.hexdigest()
+            if stat_result is None:
+                if not os.path.exists(file_path):
+                    return None
+                stat_result = os.stat(file_path)
+
+            # Cheap pre-check: same size and mtime means the cached digest still holds
+            cache_key = (os.path.abspath(file_path), self.hash_algorithm)
+            cached = _hash_cache.get(cache_key)
+            if cached and cached[:2] == (stat_result.st_size, stat_result.st_mtime_ns):
+                return cached[2]
+
+            hasher = HASH_BACKENDS[self.hash_algorithm]()
+            buffer = bytearray(HASH_BUFFER_SIZE)
+            view = memoryview(buffer)
+            with open(file_path, "rb", buffering=0) as f:
+                while True:
+                    read = f.readinto(buffer)
+                    if not read:
+                        break
+                    hasher.update(view[:read])
+            digest = hasher.hexdigest()
+
+            _hash_cache[cache_key] = (stat_result.st_size, stat_result.st_mtime_ns, digest)
+            return digest
         except Exception as e:
             log_event(f"Error calculating hash for {file_path}: {str(e)}", "ERROR")
             return None
     
+    def load_repositories(self):
+        """Load enabled repositories ordered by priority (lowest number first)"""
+        try:
+            config = load_json(self.repositories_path)
+        except (ValueError, OSError) as e:
+            log_event(f"Error reading {self.repositories_path}: {str(e)}", "ERROR")
+            config = {}
+
+        repositories = []
+        for name, repo in config.items():
+            if not isinstance(repo, dict) or not repo.get("url"):
+                log_event(f"Repository {name} has no url - skipping", "WARNING")
+                continue
+            if not repo.get("enabled", True):
+                continue
+            repositories.append({
+                "name": name,
+                "url": repo["url"],
+                "priority": repo.get("priority", DEFAULT_REPOSITORY_PRIORITY),
+                "cache_ttl_minutes": repo.get("cache_ttl_minutes", DEFAULT_REPOSITORY_TTL_MINUTES),
+            })
+
+        if not repositories:
+            # No repository configuration, fall back to the built-in catalog URL
+            repositories.append({
+                "name": "default",
+                "url": self.remote_url,
+                "priority": DEFAULT_REPOSITORY_PRIORITY,
+                "cache_ttl_minutes": DEFAULT_REPOSITORY_TTL_MINUTES,
+            })
+
+        # Name breaks priority ties so the merge order never depends on the JSON layout
+        repositories.sort(key=lambda repo: (repo["priority"], repo["name"]))
+        return repositories
+
+    def get_repository_cache_path(self, repo):
+        """Path of the cached catalog for a repository"""
+        return os.path.join(self.repository_cache_dir, f"{repo['name']}.json")
+
+    def load_repository_cache(self, repo):
+        """Return the cached catalog entry for a repository, or None"""
+        try:
+            with open(self.get_repository_cache_path(repo), 'r', encoding="utf-8") as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            return None
+        # A cache written for a different URL is not a copy of this repository
+        if cached.get("url") != repo["url"] or not isinstance(cached.get("apps"), list):
+            return None
+        return cached
+
+    def save_repository_cache(self, repo, apps, etag=None):
+        """Atomically store a repository catalog in the cache"""
+        cache_path = self.get_repository_cache_path(repo)
+        entry = {
+            "url": repo["url"],
+            "fetched_at": datetime.now().isoformat(),
+            "etag": etag,
+            "apps": apps,
+        }
+        with _repository_cache_lock:
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            tmp_path = f"{cache_path}.tmp"
+            with open(tmp_path, 'w', encoding="utf-8") as f:
+                json.dump(entry, f, indent=2)
+            os.replace(tmp_path, cache_path)
+        return entry
+
+    def is_repository_cache_fresh(self, repo, cached):
+        """Check whether a cached catalog is still inside its TTL"""
+        try:
+            fetched_at = datetime.fromisoformat(cached["fetched_at"])
+        except (KeyError, TypeError, ValueError):
+            return False
+        return datetime.now() - fetched_at < timedelta(minutes=repo["cache_ttl_minutes"])
+
+    def parse_catalog(self, payload):
+        """Extract the app list from a repository response"""
+        if isinstance(payload, dict):
+            payload = payload.get("apps")
+        if not isinstance(payload, list):
+            raise ValueError("Repository response is not an app catalog")
+        return [app for app in payload if isinstance(app, dict) and app.get("id")]
+
+    def fetch_repository(self, repo, cached=None):
+        """Download a repository catalog, revalidating against the cached copy"""
+        headers = {}
+        if cached and cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+
+        response, content = limited_get(repo["url"], PRIORITY_SYNC, headers=headers, timeout=30)
+        if response.status_code == 304 and cached:
+            log_event(f"Repository {repo['name']} unchanged", "INFO")
+            return self.save_repository_cache(repo, cached["apps"], cached.get("etag"))
+        response.raise_for_status()
+
+        apps = self.parse_catalog(json.loads(content))
+        log_event(f"Repository {repo['name']} fetched ({len(apps)} apps)", "INFO")
+        return self.save_repository_cache(repo, apps, response.headers.get("ETag"))
+
+    def revalidate_repository(self, repo, cached):
+        """Refresh a stale cached catalog in the background; returns the Future"""
+        cache_path = os.path.abspath(self.get_repository_cache_path(repo))
+        with _repository_cache_lock:
+            future = _revalidations.get(cache_path)
+            if future is not None and not future.done():
+                self.revalidations[repo["name"]] = future
+                return future
+
+            def run():
+                try:
+                    return self.fetch_repository(repo, cached)
+                except Exception as e:
+                    log_event(f"Error revalidating repository {repo['name']}: {str(e)}", "WARNING")
+                    return None
+
+            future = _revalidations[cache_path] = _revalidation_executor.submit(run)
+            self.revalidations[repo["name"]] = future
+            return future
+
+    def fetch_repositories(self, repositories):
+        """Fetch all repositories concurrently, falling back to cached copies.
+
+        Fresh caches are used as-is. Stale ones are served immediately and
+        revalidated in the background, and the new copy replaces them if it
+        arrives while this sync is still running. Only repositories without
+        any cached copy are waited for, and at most until the deadline; a
+        failing or slow one is left out. Returns a dict of repository name ->
+        app list; the names still served stale end up in stale_repositories.
+        """
+        catalogs = {}
+        pending = {}
+        stale = {}
+        executor = ThreadPoolExecutor(max_workers=max(1, len(repositories)))
+        try:
+            for repo in repositories:
+                cached = self.load_repository_cache(repo)
+                if cached:
+                    if not self.is_repository_cache_fresh(repo, cached):
+                        log_event(f"Using cached catalog for {repo['name']} from {cached.get('fetched_at')}, revalidating", "INFO")
+                        stale[repo["name"]] = self.revalidate_repository(repo, cached)
+                    catalogs[repo["name"]] = cached["apps"]
+                    continue
+                pending[executor.submit(self.fetch_repository, repo)] = repo
+
+            done, not_done = wait(pending, timeout=self.fetch_deadline)
+            for future, repo in pending.items():
+                if future in not_done:
+                    log_event(f"Repository {repo['name']} timed out", "WARNING")
+                elif future.exception() is not None:
+                    log_event(f"Error fetching repository {repo['name']}: {str(future.exception())}", "ERROR")
+                else:
+                    catalogs[repo["name"]] = future.result()["apps"]
+        finally:
+            # Don't wait for timed-out fetches, they finish and fill the cache on their own
+            executor.shutdown(wait=False)
+
+        self.stale_repositories = []
+        for name, future in stale.items():
+            entry = future.result() if future.done() else None
+            if entry is not None:
+                catalogs[name] = entry["apps"]
+            else:
+                self.stale_repositories.append(name)
+        return catalogs
+
+    def merge_catalogs(self, repositories, catalogs):
+        """Merge repository catalogs; on duplicate app ids the higher priority repo wins"""
+        merged = {}
+        for repo in repositories:
+            for app in catalogs.get(repo["name"], []):
+                if app["id"] in merged:
+                    continue
+                merged[app["id"]] = {**app, "repository": repo["name"]}
+        return list(merged.values())
+
     def download_remote_db(self):
-        """Download the remote database file"""
+        """Download the enabled repositories and write the merged catalog"""
         try:
             log_event("Downloading remote database...", "INFO")
-            
-            response = requests.get(self.remote_url, timeout=30)
-            response.raise_for_status()
-            
+
+            # Always from the repositories themselves: install commands and checksums
+            # are trusted, so a LAN cache only ever carries installer bytes
+            repositories = self.load_repositories()
+            catalogs = self.fetch_repositories(repositories)
+            if not catalogs:
+                log_event("No repository could be fetched and none is cached", "ERROR")
+                return False
+            merged = self.merge_catalogs(repositories, catalogs)
+
             # Ensure directory exists
             os.makedirs(os.path.dirname(self.server_db_path), exist_ok=True)
             
-            # Save the downloaded file
-            with open(self.server_db_path, 'wb') as f:
-                f.write(response.content)
+            # Save the merged catalog
+            with open(self.server_db_path, 'w', encoding="utf-8") as f:
+                json.dump(merged, f, indent=2)
                 
-            log_event(f"Remote database downloaded successfully to {self.server_db_path}", "INFO")
+            log_event(f"Remote database ({len(merged)} apps from {len(catalogs)} repositories) downloaded successfully to {self.server_db_path}", "INFO")
             return True
             
-        except requests.exceptions.RequestException as e:
-            log_event(f"Error downloading remote database: {str(e)}", "ERROR")
-            return False
         except Exception as e:
             log_event(f"Unexpected error downloading database: {str(e)}", "ERROR")
             return False
@@ -123,9 +369,26 @@ class UpdateChecker:
     def compare_versions(self, app_local, app_remote):
         """Compare local and remote app versions"""
         try:
+            try:
+                local_stat = os.stat(app_local)
+            except OSError:
+                log_event(f"Local file {app_local} not found or unreadable", "WARNING")
+                return True  # Treat as update needed
+
+            try:
+                remote_stat = os.stat(app_remote)
+            except OSError:
+                log_event(f"Remote file {app_remote} not found or unreadable", "ERROR")
+                return False  # Cannot determine, don't update
+
+            # Files of different sizes can never be identical, no need to hash them
+            if local_stat.st_size != remote_stat.st_size:
+                log_event(f"Files are different - Local: {local_stat.st_size} bytes, Remote: {remote_stat.st_size} bytes", "INFO")
+                return True
+
             # Compare file hashes
-            local_hash = self.get_file_hash(app_local)
-            remote_hash = self.get_file_hash(app_remote)
+            local_hash = self.get_file_hash(app_local, local_stat)
+            remote_hash = self.get_file_hash(app_remote, remote_stat)
             
             if local_hash is None:
                 log_event(f"Local file {app_local} not found or unreadable", "WARNING")
@@ -175,13 +438,15 @@ class UpdateChecker:
             log_event(f"Error replacing local database: {str(e)}", "ERROR")
             return False
     
-    def check_for_updates(self):
+    def check_for_updates(self, force=False):
         """Main function to check for updates and apply them if needed"""
+        self.last_status = "failed"
         try:
             log_event("Starting update check...", "INFO")
             
             # Check if we should perform update check
-            if not self.should_check_for_updates():
+            if not force and not self.should_check_for_updates():
+                self.last_status = "skipped"
                 return False
             
             # Download remote database
@@ -198,6 +463,7 @@ class UpdateChecker:
                 if self.replace_local_db():
                     log_event("Database update completed successfully", "INFO")
                     self.update_last_check_time()
+                    self.last_status = "updated"
                     return True
                 else:
                     log_event("Failed to replace local database", "ERROR")
@@ -208,6 +474,7 @@ class UpdateChecker:
                 if os.path.exists(self.server_db_path):
                     os.remove(self.server_db_path)
                 self.update_last_check_time()
+                self.last_status = "up_to_date"
                 return False
                 
         except Exception as e:
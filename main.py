@@ -1,8 +1,14 @@
 import sys
-from PySide6.QtWidgets import QApplication
-from ui.main_window import MainWindow
 
 def main():
+    # Subcommands (sync, check, install, specs, daemon) run headless without Qt
+    if len(sys.argv) > 1:
+        import cli
+        sys.exit(cli.main(sys.argv[1:]))
+
+    from PySide6.QtWidgets import QApplication
+    from ui.main_window import MainWindow
+
     app = QApplication(sys.argv)
 
     # Load stylesheet
@@ -1,48 +1,140 @@
 from pathlib import Path
-import requests
+import shutil
 import subprocess
 import os
 import sys
+import tempfile
+
+from core import metadata_handler
+from engine import app_state, portable_installer, storage_planner
+from engine.installer_cache import InstallerCache, cache_installer, get_installer_filename
+from utils.file_operations import InsufficientSpaceError
+from utils.network_utils import PRIORITY_INSTALL
+
+DOWNLOAD_DIR = Path("data/cache/downloads")
+
+def print_progress(bytes_downloaded, total_size):
+    """Draw a text progress bar on stdout."""
+    done = int(50 * bytes_downloaded / total_size) if total_size else 0
+    sys.stdout.write(f"\r[{'█' * done}{'.' * (50 - done)}] {bytes_downloaded / 1024:.1f} KB")
+    sys.stdout.flush()
+
+def store_progress(app_id):
+    """Progress callback that draws the text bar and publishes the fraction done."""
+    store = app_state.get_store()
+
+    def progress(bytes_downloaded, total_size):
+        print_progress(bytes_downloaded, total_size)
+        if total_size:
+            store.update(app_id, progress=round(bytes_downloaded / total_size, 3))
+    return progress
+
+def download_installer(app, version=None, dest_dir=DOWNLOAD_DIR, progress_callback=print_progress):
+    """
+    Get the installer for an app version, from the installer cache if possible.
+    Returns the local path, or None when the app has no download sources.
+    """
+    version = version or app.get("version")
+    cache = InstallerCache()
+    was_cached = cache.get(app["id"], version) is not None
+
+    sha256 = cache_installer(app, version, PRIORITY_INSTALL, progress_callback, cache)
+    if not sha256:
+        return None
+    if was_cached:
+        print(f"Using cached installer for {app.get('name', app['id'])} {version}")
+    else:
+        print("\nDownload complete.")
+    dest_path = Path(dest_dir) / get_installer_filename(app, version)
+    return cache.link(sha256, str(dest_path))
+
+def install_portable_app(app, version=None, progress_callback=print_progress, install_dir=None):
+    """Install a portable (zip/7z) app by unpacking it into its own folder."""
+    try:
+        stats = portable_installer.install_portable(app, version, install_dir, progress_callback)
+    except Exception as e:
+        print(f"\nInstallation failed: {e}")
+        return False
+    if install_dir and install_dir != portable_installer.get_portable_install_dir(app):
+        # Remember where it went so updates and uninstalls find it
+        app["install_dir"] = install_dir
+        metadata_handler.update_app_metadata(app["id"], {"install_dir": install_dir})
+    print(f"\nInstalled to {stats['path']} (extracted at {stats['mb_per_s']:.1f} MB/s)")
+    return True
+
+def install_app(app, version=None):
+    """
+    Install an app using the install command (for Windows).
+    If the app has a download source the installer is fetched first and
+    substituted for {installer} in the command. Portable apps are unpacked
+    instead. Progress and the outcome are published to the app state store.
+    """
+    store = app_state.get_store()
+    try:
+        # Checked up front so a full disk fails before anything is downloaded
+        plan = storage_planner.plan_install(app, version)
+    except InsufficientSpaceError as e:
+        print(f"Installation failed: {e}")
+        store.update(app["id"], status="failed", progress=None)
+        return False
+
+    store.update(app["id"], status="installing", progress=0.0)
+    installed = run_install(app, version, store_progress(app["id"]), plan["install_dir"])
+    if installed:
+        store.update(app["id"], installed=True, version=version or app.get("version"), status=None, progress=None)
+    else:
+        store.update(app["id"], status="failed", progress=None)
+    return installed
+
+def run_install(app, version, progress_callback, install_dir=None):
+    if app.get("install_type") == "portable":
+        return install_portable_app(app, version, progress_callback, install_dir)
 
-def download_file_with_progress(url, dest_path):
-    """Download a file from the given URL with a progress bar."""
-    response = requests.get(url, stream=True)
-    response.raise_for_status()
-    
-    total_size = int(response.headers.get('content-length', 0))
-    bytes_downloaded = 0
-
-    dest_path = Path(dest_path)
-    dest_path.parent.mkdir(parents=True, exist_ok=True)
-
-    with open(dest_path, 'wb') as f:
-        for chunk in response.iter_content(chunk_size=1024):
-            if chunk:
-                f.write(chunk)
-                bytes_downloaded += len(chunk)
-                done = int(50 * bytes_downloaded / total_size)
-                sys.stdout.write(f"\r[{'█' * done}{'.' * (50 - done)}] {bytes_downloaded / 1024:.1f} KB")
-                sys.stdout.flush()
-    print("\nDownload complete.")
-    return str(dest_path)
-
-def install_app(app):
-    """Install an app using the install command (for Windows)."""
     install_cmd = app.get("install_command")
     if install_cmd:
+        staging_dir = None
         try:
+            if "{installer}" in install_cmd:
+                # The installer gets its file name in a folder of its own, removed again
+                # afterwards so the cached blob stays the only copy
+                DOWNLOAD_DIR.mkdir(parents=True, exist_ok=True)
+                staging_dir = tempfile.mkdtemp(prefix=f"{app['id']}-", dir=DOWNLOAD_DIR)
+                installer_path = download_installer(app, version, staging_dir, progress_callback)
+                if not installer_path:
+                    print("No installer available.")
+                    return False
+                install_cmd = install_cmd.replace("{installer}", f'"{installer_path}"')
             subprocess.run(install_cmd, shell=True, check=True)
             print("Installation completed.")
             return True
         except subprocess.CalledProcessError as e:
             print(f"Installation failed: {e}")
             return False
+        except Exception as e:
+            print(f"Failed to get installer: {e}")
+            return False
+        finally:
+            if staging_dir:
+                shutil.rmtree(staging_dir, ignore_errors=True)
     else:
         print("No install command provided.")
         return False
 
 def uninstall_app(app):
     """Uninstall an app using the uninstall command (for Windows)."""
+    uninstalled = run_uninstall(app)
+    if uninstalled:
+        app_state.get_store().update(app["id"], installed=False, latest_version=None)
+    return uninstalled
+
+def run_uninstall(app):
+    if app.get("install_type") == "portable":
+        if portable_installer.uninstall_portable(app):
+            print("Uninstallation completed.")
+            return True
+        print("App is not installed.")
+        return False
+
     uninstall_cmd = app.get("uninstall_command")
     if uninstall_cmd:
         try:
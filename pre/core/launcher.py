@@ -3,6 +3,8 @@
 import subprocess
 import os
 
+from engine import resource_monitor
+
 def launch_app(app):
     """
     Launches an installed application.
@@ -14,7 +16,10 @@ def launch_app(app):
         return False
 
     try:
-        subprocess.Popen(launch_cmd, shell=True)
+        # Its own session lets the monitor keep whatever the shell starts, even after the shell exits
+        process = subprocess.Popen(launch_cmd, shell=True, start_new_session=True)
+        # The monitor follows the shell's process tree, so the app itself is picked up too
+        resource_monitor.get_monitor().track(app.get("id", launch_cmd), process)
         print(f"Launched: {app.get('name', 'Unknown App')}")
         return True
     except Exception as e:
@@ -1,8 +1,10 @@
 # Re-run after environment reset
 
 from packaging import version
-import requests
-import subprocess
+import json
+
+from core import installer
+from utils.network_utils import PRIORITY_SYNC, limited_get
 
 def get_latest_version_github(repo_url):
     """
@@ -10,9 +12,9 @@ def get_latest_version_github(repo_url):
     Expects a URL like: https://api.github.com/repos/OWNER/REPO/releases/latest
     """
     try:
-        response = requests.get(repo_url)
+        response, content = limited_get(repo_url, PRIORITY_SYNC, timeout=30)
         response.raise_for_status()
-        data = response.json()
+        data = json.loads(content)
         return data.get("tag_name") or data.get("name")
     except Exception as e:
         print(f"Failed to fetch latest version: {e}")
@@ -32,17 +34,25 @@ def update_app(app):
     """
     Runs the update command for the app.
     Assumes the update method is the same as install (e.g., winget).
+    The installer is kept in the installer cache, so retrying a failed
+    update does not download it again.
     """
-    update_cmd = app.get("install_command")  # Using install command as update
-    if update_cmd:
-        try:
-            subprocess.run(update_cmd, shell=True, check=True)
-            print("Update complete.")
-            return True
-        except subprocess.CalledProcessError as e:
-            print(f"Update failed: {e}")
-            return False
-    else:
+    if not app.get("install_command") and app.get("install_type") != "portable":
         print("No update command found.")
         return False
 
+    if installer.install_app(app, app.get("latest_version")):
+        print("Update complete.")
+        return True
+    print("Update failed.")
+    return False
+
+def rollback_app(app, target_version):
+    """
+    Reinstalls a previously cached version of the app.
+    Only works offline for versions whose installer is still in the cache.
+    """
+    if not installer.InstallerCache().lookup(app["id"], target_version):
+        print(f"No cached installer for {app.get('name', app['id'])} {target_version}.")
+        return False
+    return installer.install_app(app, target_version)
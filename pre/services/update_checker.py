@@ -1,4 +1,5 @@
 from core import metadata_handler, updater
+from engine import app_state, background_tasks
 
 def check_updates():
     """
@@ -7,6 +8,7 @@ def check_updates():
     """
     apps = metadata_handler.load_metadata()
     apps_with_updates = []
+    store = app_state.get_store()
 
     for app in apps:
         if not app.get("installed") or not app.get("version_url"):
@@ -18,5 +20,9 @@ def check_updates():
         if latest_version and updater.is_update_available(current_version, latest_version):
             app["latest_version"] = latest_version
             apps_with_updates.append(app)
+            store.update(app["id"], latest_version=latest_version)
+
+    # Optionally download the new installers in the background while idle
+    background_tasks.prefetch_updates(apps_with_updates)
 
     return apps_with_updates
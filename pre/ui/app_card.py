@@ -1,15 +1,23 @@
 from PySide6.QtWidgets import (
-    QWidget, QLabel, QPushButton, QHBoxLayout, QVBoxLayout
+    QWidget, QLabel, QPushButton, QHBoxLayout, QVBoxLayout, QProgressBar
 )
 from PySide6.QtGui import QPixmap
 from PySide6.QtCore import QSize
 
+from engine import app_state
+
 class AppCard(QWidget):
-    def __init__(self, app_data, parent=None):
+    def __init__(self, app_data, store=None, parent=None):
         super().__init__(parent)
         self.app_data = app_data
+        self.store = store or app_state.get_store()
         self.init_ui()
 
+        # Only changes to this app reach the card, so a busy install elsewhere doesn't repaint it
+        self.unsubscribe = self.store.subscribe(self.apply_state, app_ids=[app_data["id"]])
+        self.destroyed.connect(lambda: self.unsubscribe())
+        self.show_state(self.store.get(app_data["id"], default={}))
+
     def init_ui(self):
         self.setStyleSheet("border: 1px solid #aaa; padding: 10px; margin: 5px;")
         layout = QHBoxLayout(self)
@@ -27,8 +35,16 @@ class AppCard(QWidget):
         name_label.setStyleSheet("font-weight: bold; font-size: 16px;")
         version_label = QLabel(f"Version: {self.app_data.get('version', 'N/A')}")
 
+        self.version_label = version_label
+        self.status_label = QLabel()
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setRange(0, 1000)
+        self.progress_bar.hide()
+
         info_layout.addWidget(name_label)
         info_layout.addWidget(version_label)
+        info_layout.addWidget(self.status_label)
+        info_layout.addWidget(self.progress_bar)
         layout.addLayout(info_layout)
 
         # Buttons
@@ -43,3 +59,28 @@ class AppCard(QWidget):
         btn_layout.addWidget(launch_btn)
         btn_layout.addWidget(update_btn)
         layout.addLayout(btn_layout)
+
+    def apply_state(self, changes):
+        changed = changes.get(self.app_data["id"])
+        if changed is not None:
+            self.show_state(changed)
+
+    def show_state(self, changed):
+        """Update only the widgets whose state keys changed"""
+        if "version" in changed:
+            self.version_label.setText(f"Version: {changed['version'] or 'N/A'}")
+        if "progress" in changed:
+            progress = changed["progress"]
+            self.progress_bar.setVisible(progress is not None)
+            if progress is not None:
+                self.progress_bar.setValue(int(progress * 1000))
+        if {"status", "latest_version", "installed"} & changed.keys():
+            state = self.store.get(self.app_data["id"], default={})
+            if state.get("status") == "installing":
+                self.status_label.setText("Installing...")
+            elif state.get("status") == "failed":
+                self.status_label.setText("Installation failed")
+            elif state.get("installed") and state.get("latest_version"):
+                self.status_label.setText(f"Update available: {state['latest_version']}")
+            else:
+                self.status_label.setText("Installed" if state.get("installed") else "")
@@ -2,11 +2,34 @@ from PySide6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout,
     QLabel, QPushButton, QScrollArea
 )
-from PySide6.QtCore import Qt
+from PySide6.QtCore import QObject, Qt, Signal
 import sys
+import threading
 from ui.app_card import AppCard
+from engine import app_state
 import json
 
+class QtTickScheduler(QObject):
+    """Runs store flushes on the next tick of the Qt event loop, from any thread"""
+    tick = Signal()
+
+    def __init__(self):
+        super().__init__()
+        self.callbacks = []
+        self.lock = threading.Lock()
+        self.tick.connect(self.run, Qt.QueuedConnection)
+
+    def __call__(self, callback):
+        with self.lock:
+            self.callbacks.append(callback)
+        self.tick.emit()
+
+    def run(self):
+        with self.lock:
+            callbacks, self.callbacks = self.callbacks, []
+        for callback in callbacks:
+            callback()
+
 class MainWindow(QMainWindow):
     def __init__(self):
         super().__init__()
@@ -32,6 +55,8 @@ class MainWindow(QMainWindow):
 
         self.layout.addWidget(self.scroll)
 
+        self.store = app_state.get_store()
+        self.store.scheduler = QtTickScheduler()
         self.load_apps()
 
     def load_apps(self):
@@ -41,8 +66,9 @@ class MainWindow(QMainWindow):
         except (FileNotFoundError, json.JSONDecodeError):
             apps = []
 
+        self.store.load(apps)
         for app in apps:
-            card = AppCard(app)
+            card = AppCard(app, self.store)
             self.scroll_layout.addWidget(card)
 
 if __name__ == "__main__":
@@ -1,2 +1,40 @@
 """FrozeCrate - Cleanup"""
 
+import argparse
+import os
+import sys
+
+# Allow running as `python scripts/cleanup.py` from the project root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from engine.installer_cache import InstallerCache
+
+
+def prune_cache(args):
+    """Trim the installer cache to the given size"""
+    cache = InstallerCache(cache_dir=args.cache_dir)
+    max_size = 0 if args.all else int(args.max_size_mb * 1024 * 1024) if args.max_size_mb is not None else None
+    before = cache.total_size()
+    removed = cache.prune(max_size)
+    after = cache.total_size()
+    print(f"Removed {len(removed)} installer(s), freed {(before - after) / (1024 ** 2):.1f} MB "
+          f"({after / (1024 ** 2):.1f} MB left in {cache.cache_dir})")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Clean up FrozeCrate temporary files and caches")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    prune = subparsers.add_parser("prune-cache", help="Trim the installer cache, least recently used first")
+    prune.add_argument("--max-size-mb", type=float, help="Size limit in MB (default: the cache's configured limit)")
+    prune.add_argument("--all", action="store_true", help="Remove every cached installer")
+    prune.add_argument("--cache-dir", help="Cache directory (default: machine-wide installer cache)")
+    prune.set_defaults(func=prune_cache)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,15 @@
+"""FrozeCrate - Test configuration"""
+
+import pytest
+
+from config import settings
+from utils import network_utils
+
+
+@pytest.fixture(autouse=True)
+def isolated_settings(tmp_path, monkeypatch):
+    """Keep tests away from the real settings files and shared limiter"""
+    service = settings.SettingsService(tmp_path / "settings.json", legacy_files=[])
+    monkeypatch.setattr(settings, "_service", service)
+    monkeypatch.setattr(network_utils, "_limiter", None)
+    return service
@@ -0,0 +1,183 @@
+"""FrozeCrate - Test CLI"""
+
+import json
+import sys
+import threading
+
+import pytest
+
+import cli
+from engine import spec_checker
+from engine.update_checker import UpdateChecker
+
+
+class QtBlocker:
+    """Meta path finder that fails any PySide6 import"""
+
+    def __init__(self):
+        self.attempts = []
+
+    def find_spec(self, name, path=None, target=None):
+        if name == "PySide6" or name.startswith("PySide6."):
+            self.attempts.append(name)
+            raise ImportError(f"{name} must not be imported in headless mode")
+        return None
+
+
+@pytest.fixture
+def no_qt(monkeypatch):
+    blocker = QtBlocker()
+    monkeypatch.setattr(sys, "meta_path", [blocker] + sys.meta_path)
+    yield blocker
+    assert blocker.attempts == []
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "data").mkdir()
+    cli._cache.clear()
+    return tmp_path
+
+
+@pytest.fixture
+def fake_specs(monkeypatch):
+    calls = []
+
+    def check_system_specs():
+        calls.append(1)
+        return {"memory": {"total_ram_gb": 16}}
+
+    monkeypatch.setattr(spec_checker, "check_system_specs", check_system_specs)
+    return calls
+
+
+def run_json(capsys, *argv):
+    code = cli.main(["--json", "--no-daemon", *argv])
+    output = json.loads(capsys.readouterr().out)
+    assert output["exit_code"] == code
+    return code, output["result"]
+
+
+def test_specs_json(no_qt, workdir, fake_specs, capsys):
+    code, result = run_json(capsys, "specs")
+    assert code == cli.EXIT_OK
+    assert result["specs"]["memory"]["total_ram_gb"] == 16
+
+
+def test_check_exit_codes(no_qt, workdir, capsys, monkeypatch):
+    cli.import_pre()
+    from services import update_checker as services_update_checker
+
+    monkeypatch.setattr(services_update_checker, "check_updates", lambda: [])
+    assert run_json(capsys, "check") == (cli.EXIT_OK, {"updates": []})
+
+    monkeypatch.setattr(services_update_checker, "check_updates", lambda: [
+        {"id": "gimp", "name": "GIMP", "version": "2.10", "latest_version": "3.0"}])
+    code, result = run_json(capsys, "check", "--refresh")
+    assert code == cli.EXIT_UPDATES_AVAILABLE
+    assert result["updates"][0]["latest_version"] == "3.0"
+
+
+def test_install_unknown_app(no_qt, workdir, capsys):
+    code, result = run_json(capsys, "install", "nope")
+    assert code == cli.EXIT_NOT_FOUND
+    assert "nope" in result["error"]
+
+
+def test_install_leaves_only_the_cached_installer(no_qt, workdir):
+    cli.import_pre()
+    from core import metadata_handler
+    from engine.installer_cache import DOWNLOAD_DIR, InstallerCache
+
+    installer = workdir / "tool-setup.bin"
+    installer.write_bytes(b"setup" * 1000)
+    cache = InstallerCache()
+    sha256 = cache.add(str(installer), "tool", "1.0")
+    command = f'"{sys.executable}" -c "import shutil, sys; shutil.copy(sys.argv[1], \'installed.bin\')" {{installer}}'
+    metadata_handler.METADATA_FILE.write_text(json.dumps([
+        {"id": "tool", "name": "Tool", "version": "1.0", "install_command": command}]))
+
+    assert cli.main(["--no-daemon", "install", "tool"]) == cli.EXIT_OK
+    assert (workdir / "installed.bin").read_bytes() == b"setup" * 1000
+    # The linked copy the command ran is gone, the cache still has the blob
+    assert list((workdir / DOWNLOAD_DIR).iterdir()) == []
+    assert cache.lookup("tool", "1.0") == sha256
+    cache.prune(0)
+    assert cache.lookup("tool", "1.0") is None
+
+
+def test_sync_failure(no_qt, workdir, capsys, monkeypatch):
+    monkeypatch.setattr(UpdateChecker, "download_remote_db", lambda self: False)
+    assert run_json(capsys, "sync", "--force") == (cli.EXIT_FAILURE, {"status": "failed"})
+
+
+def test_usage_error(no_qt, workdir, capsys):
+    assert cli.main(["frobnicate"]) == cli.EXIT_USAGE
+
+
+@pytest.fixture
+def daemon(workdir):
+    server = cli.DaemonServer(0, str(workdir / "data" / "daemon.json"))
+    server.write_daemon_file()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+    thread.join(5)
+
+
+def test_daemon_keeps_warm_cache(no_qt, daemon, fake_specs, capsys):
+    assert cli.send_request("ping", daemon_file=daemon.daemon_file)[0] == cli.EXIT_OK
+
+    for _ in range(3):
+        code, result = cli.send_request("specs", daemon_file=daemon.daemon_file)
+        assert code == cli.EXIT_OK
+        assert result["specs"]["memory"]["total_ram_gb"] == 16
+    assert len(fake_specs) == 1
+
+    # The CLI forwards to the running daemon by default
+    assert cli.main(["--json", "specs"]) == cli.EXIT_OK
+    assert len(fake_specs) == 1
+
+
+def test_daemon_caches_catalog_and_checks(no_qt, daemon, fake_specs, monkeypatch):
+    cli.import_pre()
+    from core import metadata_handler
+    from services import update_checker as services_update_checker
+
+    metadata = metadata_handler.METADATA_FILE
+    metadata.write_text(json.dumps([{"id": "gimp", "name": "GIMP", "installed": True}]))
+    loads, checks = [], []
+    load_metadata = metadata_handler.load_metadata
+    monkeypatch.setattr(metadata_handler, "load_metadata", lambda: loads.append(1) or load_metadata())
+    monkeypatch.setattr(services_update_checker, "check_updates", lambda: checks.append(1) or [])
+
+    for _ in range(3):
+        assert cli.send_request("compat", daemon_file=daemon.daemon_file)[0] == cli.EXIT_OK
+        assert cli.send_request("check", daemon_file=daemon.daemon_file)[0] == cli.EXIT_OK
+    assert (len(loads), len(checks)) == (1, 1)
+
+    # Installs and syncs rewrite the metadata file, which invalidates both
+    metadata.write_text(json.dumps([{"id": "gimp", "name": "GIMP"}, {"id": "krita", "name": "Krita"}]))
+    code, result = cli.send_request("compat", daemon_file=daemon.daemon_file)
+    assert [app["id"] for app in result["apps"]] == ["gimp", "krita"]
+    assert cli.send_request("check", daemon_file=daemon.daemon_file)[0] == cli.EXIT_OK
+    assert (len(loads), len(checks)) == (2, 2)
+
+
+def test_daemon_rejects_bad_token(daemon, tmp_path):
+    with open(daemon.daemon_file) as f:
+        info = json.load(f)
+    info["token"] = "wrong"
+    forged = tmp_path / "forged.json"
+    forged.write_text(json.dumps(info))
+
+    code, result = cli.send_request("specs", daemon_file=str(forged))
+    assert code == cli.EXIT_USAGE
+    assert result["error"] == "Invalid token"
+
+
+def test_no_daemon_running(workdir):
+    assert cli.send_request("ping", daemon_file=str(workdir / "data" / "daemon.json")) is None
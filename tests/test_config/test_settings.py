@@ -0,0 +1,132 @@
+"""FrozeCrate - Test Settings"""
+
+import json
+import time
+
+from config import settings
+from config.settings import DEFAULT_SETTINGS, SettingsService
+from engine.update_checker import UpdateChecker
+from utils import network_utils
+
+
+def test_defaults_without_file(tmp_path):
+    service = SettingsService(tmp_path / "settings.json", legacy_files=[])
+    assert service.all() == DEFAULT_SETTINGS
+    assert not (tmp_path / "settings.json").exists()
+
+
+def test_file_is_read_once(tmp_path, monkeypatch):
+    path = tmp_path / "settings.json"
+    path.write_text(json.dumps({"theme": "light"}))
+    service = SettingsService(path, legacy_files=[])
+
+    monkeypatch.setattr(settings, "read_json_file", lambda *a: (_ for _ in ()).throw(AssertionError("re-read")))
+    assert service.get("theme") == "light"
+    assert service.get("auto_update_check") is True
+
+
+def test_burst_of_changes_is_written_once(tmp_path, monkeypatch):
+    path = tmp_path / "settings.json"
+    service = SettingsService(path, legacy_files=[], write_delay=0.1)
+    writes = []
+    original_write = service.write
+    monkeypatch.setattr(service, "write", lambda: (writes.append(1), original_write()))
+
+    for minutes in range(1, 51):
+        service.set("check_interval_minutes", minutes)
+    assert not path.exists()
+
+    time.sleep(0.3)
+    assert len(writes) == 1
+    assert json.loads(path.read_text())["check_interval_minutes"] == 50
+    assert not (tmp_path / "settings.json.tmp").exists()
+
+
+def test_flush_writes_immediately(tmp_path):
+    path = tmp_path / "settings.json"
+    service = SettingsService(path, legacy_files=[], write_delay=60)
+    service.update({"theme": "light"})
+    service.flush()
+    assert json.loads(path.read_text())["theme"] == "light"
+
+
+def test_subscribers_get_only_changes(tmp_path):
+    service = SettingsService(tmp_path / "settings.json", legacy_files=[], write_delay=60)
+    received = []
+    unsubscribe = service.subscribe(received.append)
+
+    service.update({"theme": "dark", "download_limit_kbps": 500})
+    unsubscribe()
+    service.set("theme", "light")
+
+    assert received == [{"download_limit_kbps": 500}]
+
+
+def test_legacy_files_are_migrated(tmp_path):
+    path = tmp_path / "settings.json"
+    path.write_text(json.dumps({"theme": "light"}))
+    legacy = tmp_path / "setting.json"
+    legacy.write_text(json.dumps({"update_checker": False, "update_interval_hours": 24, "theme": "dark"}))
+
+    service = SettingsService(path, legacy_files=[legacy, tmp_path / "missing.json"])
+
+    assert service.get("auto_update_check") is False
+    assert service.get("check_interval_minutes") == 1440
+    assert service.get("theme") == "light"
+    assert not legacy.exists()
+    assert (tmp_path / "setting.json.migrated").exists()
+    assert json.loads(path.read_text())["check_interval_minutes"] == 1440
+
+
+def test_legacy_files_kept_when_write_fails(tmp_path):
+    # A file where the settings folder should be makes every write fail
+    (tmp_path / "data").write_text("")
+    legacy = tmp_path / "setting.json"
+    legacy.write_text(json.dumps({"theme": "light"}))
+
+    service = SettingsService(tmp_path / "data" / "settings.json", legacy_files=[legacy])
+
+    assert service.get("theme") == "light"
+    assert legacy.exists()
+
+
+def test_unrelated_files_are_left_alone(tmp_path):
+    path = tmp_path / "data" / "settings.json"
+    other = tmp_path / "settings.json"
+    other.write_text(json.dumps({"name": "some other tool"}))
+
+    service = SettingsService(path, legacy_files=[other])
+
+    assert "name" not in service.all()
+    assert other.exists()
+
+
+def test_legacy_files_ignore_working_directory(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "settings.json").write_text(json.dumps({"theme": "light"}))
+
+    assert settings.SETTINGS_FILE.is_absolute()
+    assert all(legacy.is_absolute() for legacy in settings.LEGACY_SETTINGS_FILES)
+    assert not any(legacy.exists() and legacy.samefile(tmp_path / "settings.json")
+                   for legacy in settings.LEGACY_SETTINGS_FILES)
+
+
+def test_update_checker_reads_shared_settings(isolated_settings, tmp_path):
+    checker = UpdateChecker()
+    checker.last_check_file = str(tmp_path / "last_check.json")
+    assert checker.should_check_for_updates() is True
+
+    isolated_settings.set("auto_update_check", False)
+    assert checker.should_check_for_updates() is False
+
+    isolated_settings.update({"auto_update_check": True, "check_interval_minutes": 30})
+    checker.update_last_check_time()
+    assert checker.should_check_for_updates() is False
+
+
+def test_limiter_follows_settings(isolated_settings):
+    limiter = network_utils.get_limiter()
+    assert limiter.total.rate == 0
+
+    isolated_settings.set("download_limit_kbps", 256)
+    assert limiter.total.rate == 256 * 1024
@@ -0,0 +1,126 @@
+"""FrozeCrate - Test App State"""
+
+import threading
+
+from engine.app_state import AppStateStore
+
+
+class ManualTicks:
+    """Stands in for the event loop: flushes run when the test ticks"""
+
+    def __init__(self):
+        self.callbacks = []
+
+    def __call__(self, callback):
+        self.callbacks.append(callback)
+
+    def tick(self):
+        callbacks, self.callbacks = self.callbacks, []
+        for callback in callbacks:
+            callback()
+
+
+def test_diffs_only_contain_changes():
+    store = AppStateStore()
+    changes = []
+    store.subscribe(changes.append)
+
+    store.load([{"id": "gimp", "name": "GIMP", "version": "2.10", "installed": True}])
+    assert changes == [{"gimp": {"version": "2.10", "installed": True}}]
+
+    assert store.update("gimp", version="2.10", installed=True) == {}
+    store.update("gimp", version="2.10", latest_version="3.0")
+    assert changes[-1] == {"gimp": {"latest_version": "3.0"}}
+    assert len(changes) == 2
+
+    store.remove("gimp")
+    assert changes[-1] == {"gimp": None}
+    assert store.get("gimp") is None
+
+
+def test_changes_batched_per_tick():
+    ticks = ManualTicks()
+    store = AppStateStore(ticks)
+    changes = []
+    store.subscribe(changes.append)
+
+    for i in range(50):
+        store.update("blender", progress=i / 50)
+    store.update("krita", status="installing")
+    assert changes == []
+    assert len(ticks.callbacks) == 1  # one flush per tick, however many updates
+
+    ticks.tick()
+    assert changes == [{"blender": {"progress": 0.98}, "krita": {"status": "installing"}}]
+
+
+def test_removed_and_readded_in_one_tick():
+    ticks = ManualTicks()
+    store = AppStateStore(ticks)
+    store.load([{"id": "gimp", "version": "2.10", "installed": True}])
+    ticks.tick()
+    changes = []
+    store.subscribe(changes.append)
+
+    store.remove("gimp")
+    store.update("gimp", version="3.0")
+    ticks.tick()
+    assert changes == [{"gimp": {"version": "3.0"}}]
+
+
+def test_delivered_only_to_affected_views():
+    store = AppStateStore()
+    seen = {"gimp": [], "krita": []}
+    store.subscribe(seen["gimp"].append, app_ids=["gimp"])
+    unsubscribe = store.subscribe(seen["krita"].append, app_ids=["krita"])
+    versions = []
+    store.subscribe(versions.append, keys=["version"])
+
+    store.update("gimp", progress=0.5)
+    store.update("krita", version="5.2")
+    assert seen == {"gimp": [{"gimp": {"progress": 0.5}}], "krita": [{"krita": {"version": "5.2"}}]}
+    assert versions == [{"krita": {"version": "5.2"}}]
+
+    unsubscribe()
+    store.update("krita", version="5.3")
+    assert len(seen["krita"]) == 1
+    assert store.by_app.keys() == {"gimp"}
+
+
+def test_parallel_install_progress_repaints_few_rows():
+    ticks = ManualTicks()
+    store = AppStateStore(ticks)
+    apps = [{"id": f"app{i}", "version": "1.0", "installed": False} for i in range(1000)]
+    store.load(apps)
+    ticks.tick()
+
+    repaints = []
+    for app in apps:
+        store.subscribe(lambda changes, app_id=app["id"]: repaints.append((app_id, changes[app_id])),
+                        app_ids=[app["id"]])
+
+    # Four installs streaming 50 updates a second, ticks at 20 Hz in between
+    installing = ["app3", "app10", "app500", "app999"]
+    for tick in range(20):
+        threads = [
+            threading.Thread(target=lambda app_id=app_id: [
+                store.update(app_id, progress=(tick * 3 + step) / 60) for step in range(3)])
+            for app_id in installing
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        repaints.clear()
+        ticks.tick()
+        # One repaint per installing row carrying only the newest progress
+        assert sorted(repaints) == sorted((app_id, {"progress": (tick * 3 + 2) / 60}) for app_id in installing)
+
+
+def test_subscriber_errors_do_not_stop_delivery():
+    store = AppStateStore()
+    received = []
+    store.subscribe(lambda changes: 1 / 0)
+    store.subscribe(received.append)
+    store.update("gimp", installed=True)
+    assert received == [{"gimp": {"installed": True}}]
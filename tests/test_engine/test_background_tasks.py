@@ -0,0 +1,181 @@
+"""FrozeCrate - Test Background Tasks"""
+
+import hashlib
+import threading
+import time
+
+import pytest
+
+from engine import background_tasks, download_manager
+from engine.background_tasks import IdleDetector, UpdatePrefetcher
+from engine.installer_cache import InstallerCache, cache_installer
+from utils.network_utils import PRIORITY_INSTALL, PRIORITY_PREFETCH
+
+PAYLOAD = b"blender 4.1 installer"
+SHA256 = hashlib.sha256(PAYLOAD).hexdigest()
+
+
+class FakeIdle:
+    def __init__(self, idle):
+        self.idle = idle
+        self.checks = 0
+
+    def is_idle(self):
+        self.checks += 1
+        return self.idle
+
+
+@pytest.fixture
+def downloads(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    calls = []
+
+    def fake_download(mirrors, dest_path, progress_callback=None, priority=None, preferred=None):
+        calls.append((mirrors, priority))
+        with open(dest_path, "wb") as f:
+            f.write(PAYLOAD)
+        return dest_path
+
+    monkeypatch.setattr(download_manager, "download_file", fake_download)
+    return calls
+
+
+def make_app(sha256=SHA256, **extra):
+    app = {"id": "blender", "name": "Blender", "version": "4.0", "latest_version": "4.1",
+           "download_url": "http://mirror/blender-4.0.exe",
+           "downloads": {"4.1": {"download_url": "http://mirror/blender-4.1.exe", "sha256": sha256}}}
+    app.update(extra)
+    return app
+
+
+def wait_for(predicate, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_queue_skips_apps_without_downloads(tmp_path, downloads):
+    prefetcher = UpdatePrefetcher(FakeIdle(True), InstallerCache(str(tmp_path / "cache")))
+    apps = [make_app(), make_app(id="gimp", downloads=None), make_app(id="krita", latest_version=None)]
+    try:
+        assert prefetcher.queue(apps) == 1
+    finally:
+        prefetcher.stop(5)
+
+
+def test_prefetch_stages_verified_installer(tmp_path, downloads):
+    cache = InstallerCache(str(tmp_path / "cache"))
+    prefetcher = UpdatePrefetcher(FakeIdle(True), cache)
+    app = make_app()
+    try:
+        prefetcher.queue([app])
+        assert wait_for(lambda: prefetcher.is_staged(app))
+    finally:
+        prefetcher.stop(5)
+
+    assert downloads == [(["http://mirror/blender-4.1.exe"], PRIORITY_PREFETCH)]
+    with open(cache.get("blender", "4.1"), "rb") as f:
+        assert f.read() == PAYLOAD
+    # Already staged, nothing new to queue
+    assert prefetcher.queue([app]) == 0
+
+
+def test_prefetch_and_install_overlap(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    both_running = threading.Barrier(2, timeout=5)
+
+    def fake_download(mirrors, dest_path, progress_callback=None, priority=None, preferred=None):
+        both_running.wait()
+        with open(dest_path, "wb") as f:
+            f.write(mirrors[0].encode())
+        return dest_path
+
+    monkeypatch.setattr(download_manager, "download_file", fake_download)
+    apps = []
+    for i in range(20):
+        url = f"http://mirror/app-{i}-1.1.exe"
+        apps.append({"id": f"app-{i}", "version": "1.0", "latest_version": "1.1",
+                     "downloads": {"1.1": {"download_url": url, "sha256": hashlib.sha256(url.encode()).hexdigest()}}})
+    # The prefetcher and the installer each use their own cache instance, as in the app
+    prefetcher = UpdatePrefetcher(FakeIdle(True), InstallerCache(str(tmp_path / "cache")))
+    install_cache = InstallerCache(str(tmp_path / "cache"))
+    results = {}
+
+    def prefetch_all():
+        results["prefetch"] = [prefetcher.prefetch(app) for app in apps[::2]]
+
+    def install_all():
+        results["install"] = [cache_installer(app, "1.1", PRIORITY_INSTALL, cache=install_cache) for app in apps[1::2]]
+
+    threads = [threading.Thread(target=prefetch_all), threading.Thread(target=install_all)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(30)
+
+    assert all(results["prefetch"]) and all(results["install"])
+    assert len(install_cache.load_index()["blobs"]) == len(apps)
+    assert install_cache.prune() == []
+    assert all(install_cache.lookup(app["id"], "1.1") for app in apps)
+
+
+def test_prefetch_rejects_bad_checksum(tmp_path, downloads):
+    cache = InstallerCache(str(tmp_path / "cache"))
+    prefetcher = UpdatePrefetcher(FakeIdle(True), cache)
+    assert prefetcher.prefetch(make_app(sha256="0" * 64)) is None
+    assert cache.lookup("blender", "4.1") is None
+
+
+def test_waits_while_busy(tmp_path, downloads):
+    idle = FakeIdle(False)
+    prefetcher = UpdatePrefetcher(idle, InstallerCache(str(tmp_path / "cache")), poll_interval=0.01)
+    try:
+        prefetcher.queue([make_app()])
+        assert wait_for(lambda: idle.checks >= 3)
+        assert downloads == []
+
+        idle.idle = True
+        assert wait_for(lambda: len(downloads) == 1)
+    finally:
+        prefetcher.stop(5)
+
+
+def test_prefetch_disabled_by_default(downloads):
+    assert background_tasks.prefetch_updates([make_app()]) == 0
+
+
+def test_idle_detector(monkeypatch):
+    battery = {"plugged_in": True}
+    cpu = [5.0]
+    monkeypatch.setattr(background_tasks, "get_battery_info", lambda: battery)
+    monkeypatch.setattr(background_tasks.psutil, "cpu_percent", lambda interval=None: cpu[0])
+    monkeypatch.setattr(IdleDetector, "net_bytes", lambda self: 0)
+    detector = IdleDetector(max_cpu_percent=20, max_network_kbps=100, sample_window=0)
+
+    assert detector.is_idle() is True
+    cpu[0] = 80.0
+    assert detector.is_idle() is False
+    cpu[0] = 5.0
+    battery["plugged_in"] = False
+    assert detector.is_idle() is False
+    detector.allow_on_battery = True
+    assert detector.is_idle() is True
+
+
+def test_first_idle_check_covers_a_full_window(monkeypatch):
+    monkeypatch.setattr(background_tasks, "get_battery_info", lambda: {"plugged_in": True})
+    monkeypatch.setattr(background_tasks.psutil, "cpu_percent", lambda interval=None: 5.0)
+    received = [0]
+    monkeypatch.setattr(IdleDetector, "net_bytes", lambda self: received[0])
+    detector = IdleDetector(max_cpu_percent=20, max_network_kbps=100, sample_window=0.3)
+    # Traffic right after the detector was created must still count
+    received[0] = 1024 * 1024
+
+    started = time.monotonic()
+    sample = detector.sample()
+    assert time.monotonic() - started >= 0.25
+    assert sample["network_kbps"] > 1000
+    assert detector.is_idle() is True
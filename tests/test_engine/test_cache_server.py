@@ -0,0 +1,266 @@
+"""FrozeCrate - Test Cache Server"""
+
+import functools
+import hashlib
+import json
+import os
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from config import save_settings
+from engine import lan_cache
+from engine.cache_server import CacheServer, parse_range
+from engine.installer_cache import InstallerCache, cache_installer
+from engine.update_checker import UpdateChecker
+
+PAYLOAD = os.urandom(3 * 1024 * 1024 + 17)
+SHA256 = hashlib.sha256(PAYLOAD).hexdigest()
+
+
+class Origin:
+    """The internet: a Range-capable download server that counts requests"""
+
+    def __init__(self, bytes_per_second=None):
+        self.requests = []
+        origin = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                origin.requests.append(self.headers.get("Range"))
+                start = int(self.headers["Range"].split("=")[1].split("-")[0]) if self.headers.get("Range") else 0
+                self.send_response(206 if self.headers.get("Range") else 200)
+                if self.headers.get("Range"):
+                    self.send_header("Content-Range", f"bytes {start}-{len(PAYLOAD) - 1}/{len(PAYLOAD)}")
+                self.send_header("Content-Length", str(len(PAYLOAD) - start))
+                self.end_headers()
+                try:
+                    for i in range(start, len(PAYLOAD), 64 * 1024):
+                        self.wfile.write(PAYLOAD[i:i + 64 * 1024])
+                        if bytes_per_second:
+                            time.sleep(64 * 1024 / bytes_per_second)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/blender.zip"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def office(tmp_path, monkeypatch):
+    """An origin, a cache server with a synced catalog, and a way to make clients"""
+    monkeypatch.chdir(tmp_path)
+    started = []
+
+    def start(bytes_per_second=None):
+        origin = Origin(bytes_per_second)
+        app = {"id": "blender", "name": "Blender", "version": "4.1", "download_url": origin.url, "sha256": SHA256}
+        checker = UpdateChecker()
+        checker.server_db_path = str(tmp_path / "server" / "server_app.db")
+        os.makedirs(os.path.dirname(checker.server_db_path))
+        with open(checker.server_db_path, "w", encoding="utf-8") as f:
+            json.dump([app], f)
+
+        server = CacheServer("127.0.0.1", 0, InstallerCache(str(tmp_path / "server" / "installers")), checker)
+        server.start_background(sync_catalog=False, discovery=False)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        started.append((origin, server))
+        save_settings({"lan_cache_url": server.url})
+        return origin, server, app
+
+    yield start
+    for origin, server in started:
+        server.shutdown()
+        server.server_close()
+        origin.close()
+
+
+def client_cache(tmp_path, name):
+    return InstallerCache(str(tmp_path / name / "installers"))
+
+
+def test_parse_range():
+    assert parse_range(None, 100) is None
+    assert parse_range("bytes=0-", 100) == (0, 99)
+    assert parse_range("bytes=10-19", 100) == (10, 19)
+    assert parse_range("bytes=90-200", 100) == (90, 99)
+    assert parse_range("bytes=-10", 100) == (90, 99)
+    with pytest.raises(ValueError):
+        parse_range("bytes=100-", 100)
+
+
+def test_ping(office):
+    origin, server, app = office()
+    assert lan_cache.ping(server.url)
+    # Install commands and checksums only ever come from the repositories
+    assert requests.get(f"{server.url}/catalog").status_code == 404
+
+
+def test_each_installer_crosses_the_wan_once(office, tmp_path):
+    origin, server, app = office()
+    for name in ("alice", "bob", "carol"):
+        cache = client_cache(tmp_path, name)
+        assert cache_installer(app, cache=cache) == SHA256
+        with open(cache.get("blender", "4.1"), "rb") as f:
+            assert f.read() == PAYLOAD
+    assert len(origin.requests) == 1
+    assert server.cache.lookup("blender", "4.1") == SHA256
+
+
+def test_concurrent_clients_share_one_origin_download(office, tmp_path):
+    origin, server, app = office(bytes_per_second=2 * 1024 * 1024)
+    results = {}
+
+    def install(name):
+        results[name] = cache_installer(app, cache=client_cache(tmp_path, name))
+
+    threads = [threading.Thread(target=install, args=(name,)) for name in ("alice", "bob", "carol")]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(30)
+
+    assert results == {"alice": SHA256, "bob": SHA256, "carol": SHA256}
+    # Clients were streamed the download while it was still arriving
+    assert len(origin.requests) == 1
+
+
+def test_stalled_client_does_not_hold_up_the_cache(office, tmp_path):
+    origin, server, app = office(bytes_per_second=2 * 1024 * 1024)
+    stalled = socket.socket()
+    stalled.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+    stalled.connect(("127.0.0.1", server.server_address[1]))
+    try:
+        # Starts the pull-through and then never reads the body
+        stalled.sendall(b"GET /apps/blender/4.1 HTTP/1.1\r\nHost: cache\r\n\r\n")
+        stalled.recv(1024)
+
+        deadline = time.time() + 15
+        while server.cache.lookup("blender", "4.1") is None and time.time() < deadline:
+            time.sleep(0.1)
+        assert server.cache.lookup("blender", "4.1") == SHA256
+        assert cache_installer(app, cache=client_cache(tmp_path, "alice")) == SHA256
+        assert len(origin.requests) == 1
+    finally:
+        stalled.close()
+
+
+def test_blob_range_requests(office, tmp_path):
+    origin, server, app = office()
+    cache_installer(app, cache=client_cache(tmp_path, "alice"))
+
+    url = f"{server.url}/blobs/{SHA256}"
+    response = requests.get(url, headers={"Range": "bytes=100-199"})
+    assert response.status_code == 206
+    assert response.content == PAYLOAD[100:200]
+    assert response.headers["Content-Range"] == f"bytes 100-199/{len(PAYLOAD)}"
+
+    assert requests.get(url, headers={"Range": "bytes=-5"}).content == PAYLOAD[-5:]
+    assert requests.get(url).content == PAYLOAD
+    assert requests.get(url, headers={"Range": f"bytes={len(PAYLOAD)}-"}).status_code == 416
+    assert requests.head(url).headers["Content-Length"] == str(len(PAYLOAD))
+
+
+def test_unknown_installers(office):
+    origin, server, app = office()
+    assert requests.get(f"{server.url}/apps/gimp/2.10").status_code == 404
+    assert requests.get(f"{server.url}/apps/blender/3.0").status_code == 404
+    assert requests.get(f"{server.url}/blobs/{'0' * 64}").status_code == 404
+    assert requests.get(f"{server.url}/blobs/../../etc/passwd").status_code == 404
+    assert origin.requests == []
+
+
+def test_unhashed_installers_skip_the_cache(office, tmp_path):
+    origin, server, app = office()
+    unhashed = {key: value for key, value in app.items() if key != "sha256"}
+    with open(server.checker.server_db_path, "w", encoding="utf-8") as f:
+        json.dump([unhashed], f)
+    assert requests.get(f"{server.url}/apps/blender/4.1").status_code == 404
+    assert origin.requests == []
+
+    # Nothing to check the cache's bytes against, so the client goes to the origin
+    cache = client_cache(tmp_path, "alice")
+    assert cache_installer(unhashed, cache=cache) == SHA256
+    assert len(origin.requests) == 1
+    assert server.cache.lookup("blender", "4.1") is None
+
+
+def test_tampered_cache_is_rejected(office, tmp_path):
+    origin, server, app = office()
+
+    class Rogue(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header("Content-Length", "4")
+            self.end_headers()
+            self.wfile.write(b"evil")
+
+    rogue = ThreadingHTTPServer(("127.0.0.1", 0), Rogue)
+    threading.Thread(target=rogue.serve_forever, daemon=True).start()
+    try:
+        save_settings({"lan_cache_url": f"http://127.0.0.1:{rogue.server_address[1]}"})
+        cache = client_cache(tmp_path, "alice")
+        with pytest.raises(ValueError):
+            cache_installer(app, cache=cache)
+        assert cache.lookup("blender", "4.1") is None
+    finally:
+        rogue.shutdown()
+        rogue.server_close()
+
+
+def test_falls_back_to_origin_without_cache(office, tmp_path):
+    origin, server, app = office()
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        dead_port = sock.getsockname()[1]
+    save_settings({"lan_cache_url": f"http://127.0.0.1:{dead_port}"})
+
+    assert cache_installer(app, cache=client_cache(tmp_path, "alice")) == SHA256
+    assert len(origin.requests) == 1
+    assert server.cache.lookup("blender", "4.1") is None
+
+
+def test_catalog_sync_ignores_lan_cache(office, tmp_path, monkeypatch):
+    origin, server, app = office()
+    checker = UpdateChecker()
+    checker.server_db_path = str(tmp_path / "client" / "server_app.db")
+    checker.repository_cache_dir = str(tmp_path / "client" / "repositories")
+    repositories = [{"name": "main_repo", "url": "https://repo.example/apps.json"}]
+    origin_app = {**app, "install_command": "{installer} /S"}
+    monkeypatch.setattr(UpdateChecker, "load_repositories", lambda self: repositories)
+    monkeypatch.setattr(UpdateChecker, "fetch_repositories", lambda self, repos: {"main_repo": [origin_app]})
+
+    assert checker.download_remote_db()
+    with open(checker.server_db_path, encoding="utf-8") as f:
+        assert json.load(f) == [{**origin_app, "repository": "main_repo"}]
+
+
+def test_discovery(office, monkeypatch):
+    origin, server, app = office()
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server.answer_discovery(port)
+
+    assert lan_cache.discover(address="127.0.0.1", port=port) == server.url
+
+    save_settings({"lan_cache_url": "", "lan_cache_discovery": True})
+    monkeypatch.setattr(lan_cache, "discover", functools.partial(lan_cache.discover, address="127.0.0.1", port=port))
+    monkeypatch.setattr(lan_cache, "_discovered", None)
+    assert lan_cache.get_cache_url() == server.url
@@ -0,0 +1,196 @@
+"""FrozeCrate - Test Compatibility"""
+
+import itertools
+import random
+import time
+
+from engine import compatibility
+from engine.compatibility import (RECOMMENDED, SUPPORTED, UNKNOWN, UNSUPPORTED,
+                                  CompatibilityEngine, evaluate_catalog)
+
+
+def make_specs(ram_gb=16, cores=8, threads=16, vram_gb=8, gpu="RTX 3060",
+               resolution="1920x1080", os_name="Windows 10", architecture="64bit"):
+    return {
+        "processor": {"cores": cores, "threads": threads},
+        "memory": {"total_ram_gb": ram_gb},
+        "graphics": {"dedicated": {"brand": "NVIDIA", "model": gpu, "vram_gb": vram_gb}},
+        "display": {"resolution": resolution},
+        "operating_system": {"name": os_name, "architecture": architecture},
+    }
+
+
+BLENDER = {
+    "id": "blender",
+    "requirements": {
+        "minimum": {"ram_gb": 8, "cores": 4, "vram_gb": 2, "resolution": "1920x1080"},
+        "recommended": {"ram_gb": 32, "cores": 8, "vram_gb": 8},
+    },
+}
+
+
+def test_statuses():
+    engine = CompatibilityEngine([BLENDER, {"id": "notepad"}])
+
+    result = engine.check("blender", make_specs(ram_gb=31.6))  # reported slightly under 32
+    assert result["status"] == RECOMMENDED
+
+    result = engine.check("blender", make_specs(ram_gb=16))
+    assert result["status"] == SUPPORTED
+    assert result["below_recommended"] == ["ram_gb"]
+
+    result = engine.check("blender", make_specs(cores=2, resolution="1366x768"))
+    assert result["status"] == UNSUPPORTED
+    assert result["failed"] == ["cores", "resolution"]
+
+    assert engine.check("notepad", make_specs())["status"] == UNKNOWN
+
+
+def test_undetected_values_never_fail():
+    engine = CompatibilityEngine([BLENDER])
+    result = engine.check("blender", make_specs(ram_gb=32, vram_gb=0, gpu="Unknown", resolution="Unknown"))
+    assert result["status"] == RECOMMENDED
+    assert result["unknown"] == ["resolution", "vram_gb"]
+
+    # A detected GPU without dedicated memory is a real failure
+    assert engine.check("blender", make_specs(vram_gb=0, gpu="Intel UHD"))["failed"] == ["vram_gb"]
+
+
+def test_os_and_invalid_requirements():
+    apps = [
+        {"id": "winonly", "requirements": {"minimum": {"os": "Windows", "architecture": "64bit"}}},
+        {"id": "typo", "requirements": {"minimum": {"ram": 4, "resolution": "big"}}},
+    ]
+    engine = CompatibilityEngine(apps)
+    assert engine.check("winonly", make_specs())["status"] == SUPPORTED
+    assert engine.check("winonly", make_specs(os_name="Linux 6.1"))["failed"] == ["os"]
+    assert engine.check("winonly", make_specs(architecture="32bit"))["failed"] == ["architecture"]
+    # Unknown keys and bad values are ignored rather than failing every machine
+    assert engine.check("typo", make_specs(ram_gb=1))["status"] == SUPPORTED
+
+
+def test_results_cached_per_spec_snapshot():
+    engine = CompatibilityEngine([BLENDER])
+    first = engine.evaluate(make_specs())
+    # Fields the requirements don't look at don't change the snapshot hash
+    specs = make_specs()
+    specs["battery"] = {"percent": 40}
+    assert engine.evaluate(specs) is first
+    assert engine.evaluate(make_specs(ram_gb=8)) is not first
+
+    engine.max_profiles = 2
+    engine.evaluate(make_specs(ram_gb=4))
+    assert len(engine._results) == 2
+
+
+def test_shared_engine_rebuilt_on_catalog_change(monkeypatch):
+    monkeypatch.setattr(compatibility, "_engine", None)
+    apps = [BLENDER]
+    engine = compatibility.get_engine(apps)
+    assert compatibility.get_engine([dict(BLENDER)]) is engine
+    assert compatibility.get_engine(apps + [{"id": "gimp"}]) is not engine
+
+
+def test_shared_engine_reused_by_version(monkeypatch):
+    monkeypatch.setattr(compatibility, "_engine", None)
+    apps = [{"id": f"app{i}", "requirements": {"minimum": {"ram_gb": i % 16}}} for i in range(10_000)]
+    specs = make_specs()
+    engine = compatibility.get_engine(apps, version=1)
+    evaluate_catalog(apps, specs, version=1)
+
+    start = time.perf_counter()
+    for _ in range(100):
+        assert evaluate_catalog(apps, specs, version=1)["app1"]["status"] == SUPPORTED
+    # Far below one fingerprint of the whole catalog per call
+    assert time.perf_counter() - start < 0.1
+
+    # A version stands in for the catalog's contents
+    edited = apps[:10]
+    assert compatibility.get_engine(edited, version=1) is engine
+    assert compatibility.get_engine(edited, version=2) is not engine
+
+
+def test_shared_engine_sees_edits_in_place(monkeypatch):
+    monkeypatch.setattr(compatibility, "_engine", None)
+    apps = [{"id": "blender", "requirements": {"minimum": {"ram_gb": 4}}}]
+    specs = make_specs()
+    assert evaluate_catalog(apps, specs)["blender"]["status"] == SUPPORTED
+
+    apps[0]["requirements"] = {"minimum": {"ram_gb": 1024}}
+    apps.append({"id": "gimp"})
+    results = evaluate_catalog(apps, specs)
+    assert results["blender"]["status"] == UNSUPPORTED
+    assert results["gimp"]["status"] == UNKNOWN
+
+
+def reference_status(requirements, features):
+    """Straightforward per-app evaluation to compare the engine against"""
+    if not requirements:
+        return UNKNOWN
+
+    def meets(reqs):
+        for key, value in reqs.items():
+            actual = features[key]
+            if actual is None:
+                continue
+            if key == "ram_gb" and actual < value * compatibility.RAM_TOLERANCE:
+                return False
+            if key in ("cores", "vram_gb") and actual < value:
+                return False
+            if key == "resolution":
+                width, height = map(int, value.split("x"))
+                if actual[0] < width or actual[1] < height:
+                    return False
+        return True
+
+    if not meets(requirements["minimum"]):
+        return UNSUPPORTED
+    return RECOMMENDED if meets(requirements["recommended"]) else SUPPORTED
+
+
+def test_bulk_catalog_against_many_profiles(monkeypatch):
+    rng = random.Random(35)
+    levels = [
+        {"ram_gb": ram, "cores": cores, "vram_gb": vram, "resolution": resolution}
+        for ram, cores, vram, resolution in itertools.product(
+            [2, 4, 8, 16], [2, 4, 8], [0, 2, 4], ["1280x720", "1920x1080", "2560x1440"])
+    ]
+    apps = []
+    for i in range(10_000):
+        if i % 10 == 0:
+            apps.append({"id": f"app{i}"})
+            continue
+        minimum = rng.choice(levels)
+        apps.append({"id": f"app{i}", "requirements": {
+            "minimum": minimum,
+            "recommended": {**minimum, "ram_gb": minimum["ram_gb"] * 2},
+        }})
+    profiles = [
+        make_specs(ram_gb=ram, cores=cores, vram_gb=vram, resolution=resolution,
+                   gpu="Unknown" if vram == 0 else "GPU")
+        for ram, cores, vram, resolution in itertools.product(
+            [3.8, 7.8, 15.9, 31.9], [2, 4, 6, 16], [0, 4, 12], ["1366x768", "1920x1080", "3840x2160"])
+    ]
+
+    compiled = []
+    original = compatibility.compile_checks
+    monkeypatch.setattr(compatibility, "compile_checks",
+                        lambda *args: compiled.append(1) or original(*args))
+
+    engine = CompatibilityEngine(apps)
+    # Identical requirement sets compile once, however many apps share them
+    assert len(engine.requirements) <= len(levels) + 1
+    assert len(compiled) == 2 * len(engine.requirements)
+
+    engine.max_profiles = len(profiles)
+    for specs in profiles:
+        results = engine.evaluate(specs)
+        assert len(results) == len(apps)
+        features = compatibility.extract_features(specs)
+        for app in rng.sample(apps, 200):
+            assert results[app["id"]]["status"] == reference_status(app.get("requirements"), features)
+
+    assert len(engine._results) == len(profiles)
+    assert all(engine.evaluate(specs) is engine._results[compatibility.get_spec_hash(
+        compatibility.extract_features(specs))] for specs in profiles)
+    assert evaluate_catalog(apps, profiles[0])["app0"]["status"] == UNKNOWN
@@ -1,2 +1,326 @@
 """FrozeCrate - Test Download Manager"""
 
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from engine import download_manager
+from engine.download_manager import MirrorDownloader, MirrorError, MirrorScores, get_app_mirrors
+from utils import file_operations, network_utils
+from utils.file_operations import InsufficientSpaceError
+from utils.network_utils import BandwidthLimiter
+
+PAYLOAD = os.urandom(2 * 1024 * 1024 + 123)
+
+
+class ThrottledMirror:
+    """Local HTTP server with Range support, a bandwidth cap and an optional stall point"""
+
+    def __init__(self, bytes_per_second=None, stall_after=None, status=200):
+        self.bytes_per_second = bytes_per_second
+        self.stall_after = stall_after
+        self.status = status
+        self.requests = []
+        self.release = threading.Event()
+        mirror = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_HEAD(self):
+                if mirror.status != 200:
+                    self.send_error(mirror.status)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Length", str(len(PAYLOAD)))
+                self.end_headers()
+
+            def do_GET(self):
+                mirror.requests.append(self.headers.get("Range"))
+                if mirror.status != 200:
+                    self.send_error(mirror.status)
+                    return
+                start = 0
+                range_header = self.headers.get("Range")
+                if range_header:
+                    start = int(range_header.split("=")[1].split("-")[0])
+                    self.send_response(206)
+                    self.send_header("Content-Range", f"bytes {start}-{len(PAYLOAD) - 1}/{len(PAYLOAD)}")
+                else:
+                    self.send_response(200)
+                self.send_header("Content-Length", str(len(PAYLOAD) - start))
+                self.end_headers()
+
+                sent = start
+                step = 16 * 1024
+                try:
+                    while sent < len(PAYLOAD):
+                        if mirror.stall_after is not None and sent >= mirror.stall_after:
+                            mirror.release.wait(10)
+                            return
+                        chunk = PAYLOAD[sent:sent + step]
+                        self.wfile.write(chunk)
+                        sent += len(chunk)
+                        if mirror.bytes_per_second:
+                            time.sleep(len(chunk) / mirror.bytes_per_second)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/installer.exe"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.release.set()
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def mirrors():
+    started = []
+
+    def start(**kwargs):
+        mirror = ThrottledMirror(**kwargs)
+        started.append(mirror)
+        return mirror
+
+    yield start
+    for mirror in started:
+        mirror.close()
+
+
+def make_downloader(urls, tmp_path):
+    downloader = MirrorDownloader(urls, MirrorScores(str(tmp_path / "scores.json")))
+    downloader.stall_timeout = 1
+    downloader.first_segment_size = 128 * 1024
+    return downloader
+
+
+def test_get_app_mirrors():
+    app = {"download_url": "http://a/x.exe", "mirrors": ["http://b/x.exe", "http://a/x.exe"]}
+    assert get_app_mirrors(app) == ["http://b/x.exe", "http://a/x.exe"]
+    assert get_app_mirrors({"id": "gimp"}) == []
+
+
+def test_single_mirror_download(tmp_path, mirrors):
+    mirror = mirrors()
+    dest = tmp_path / "installer.exe"
+    progress = []
+
+    make_downloader(mirror.url, tmp_path).download(str(dest), lambda done, total: progress.append((done, total)))
+
+    assert dest.read_bytes() == PAYLOAD
+    assert progress[-1] == (len(PAYLOAD), len(PAYLOAD))
+
+
+def test_fastest_mirror_wins_race(tmp_path, mirrors):
+    slow = mirrors(bytes_per_second=256 * 1024)
+    # Slow enough that both mirrors are connected before the race is decided
+    fast = mirrors(bytes_per_second=4 * 1024 * 1024)
+    dest = tmp_path / "installer.exe"
+    downloader = make_downloader([slow.url, fast.url], tmp_path)
+
+    start = time.monotonic()
+    downloader.download(str(dest))
+
+    assert dest.read_bytes() == PAYLOAD
+    assert time.monotonic() - start < 4  # the slow mirror alone needs ~8s
+    scores = MirrorScores(str(tmp_path / "scores.json"))
+    assert scores.rank([slow.url, fast.url]) == [fast.url, slow.url]
+
+
+def test_switches_mirror_when_stalled(tmp_path, mirrors):
+    stalling = mirrors(stall_after=768 * 1024)
+    backup = mirrors(bytes_per_second=4 * 1024 * 1024)
+    dest = tmp_path / "installer.exe"
+    downloader = make_downloader([stalling.url, backup.url], tmp_path)
+    # Make sure the stalling mirror wins the race
+    downloader.race_candidates = 1
+
+    downloader.download(str(dest))
+
+    assert dest.read_bytes() == PAYLOAD
+    resumed = [r for r in backup.requests if r != "bytes=0-"]
+    assert resumed and int(resumed[0].split("=")[1].split("-")[0]) > 0
+
+
+def test_switches_mirror_when_too_slow(tmp_path, mirrors):
+    crawling = mirrors(bytes_per_second=64 * 1024)
+    backup = mirrors()
+    dest = tmp_path / "installer.exe"
+    downloader = make_downloader([crawling.url, backup.url], tmp_path)
+    downloader.race_candidates = 1
+    downloader.min_throughput = 512 * 1024
+    downloader.throughput_window = 0.5
+
+    downloader.download(str(dest))
+
+    assert dest.read_bytes() == PAYLOAD
+    assert len(backup.requests) == 1
+
+
+def test_bandwidth_cap_is_not_mistaken_for_slow_mirrors(tmp_path, mirrors, monkeypatch):
+    first, second = mirrors(), mirrors()
+    # The cap is far below min_throughput, the mirrors themselves are fast
+    monkeypatch.setattr(network_utils, "_limiter", BandwidthLimiter(rate=1024 * 1024))
+    dest = tmp_path / "installer.exe"
+    downloader = make_downloader([first.url, second.url], tmp_path)
+    downloader.min_throughput = 4 * 1024 * 1024
+    downloader.throughput_window = 0.2
+
+    start = time.monotonic()
+    downloader.download(str(dest))
+
+    assert dest.read_bytes() == PAYLOAD
+    assert time.monotonic() - start >= 0.8  # the cap did apply
+    assert downloader.racers_done.wait(5)
+    scores = MirrorScores(str(tmp_path / "scores.json"))
+    assert not any(entry.get("failures") for entry in scores.scores.values())
+
+
+def test_failed_mirror_is_skipped(tmp_path, mirrors):
+    broken = mirrors(status=503)
+    working = mirrors()
+    dest = tmp_path / "installer.exe"
+
+    downloader = make_downloader([broken.url, working.url], tmp_path)
+    downloader.download(str(dest))
+
+    assert dest.read_bytes() == PAYLOAD
+    assert downloader.racers_done.wait(5)
+    scores = MirrorScores(str(tmp_path / "scores.json"))
+    assert scores.scores[download_manager.mirror_key(broken.url)]["failures"] == 1
+
+
+def test_late_race_failure_is_saved(tmp_path, mirrors):
+    hanging = mirrors(stall_after=0)
+    working = mirrors(bytes_per_second=2 * 1024 * 1024)
+    dest = tmp_path / "installer.exe"
+    downloader = make_downloader([hanging.url, working.url], tmp_path)
+    downloader.stall_timeout = 2
+
+    downloader.download(str(dest))
+    assert not downloader.racers_done.is_set()
+
+    # The hanging mirror times out after download() returned
+    assert downloader.racers_done.wait(5)
+    scores = MirrorScores(str(tmp_path / "scores.json"))
+    assert scores.scores[download_manager.mirror_key(hanging.url)]["failures"] == 1
+
+
+def test_unconnected_loser_is_not_scored(tmp_path):
+    scores = MirrorScores(str(tmp_path / "scores.json"))
+    scores.record_failure("http://flaky/a")
+    downloader = MirrorDownloader(["http://flaky/a"], scores)
+    release = threading.Event()
+
+    class Winner:
+        def iter_content(self, chunk_size):
+            yield b"x" * downloader.first_segment_size
+
+        def close(self):
+            pass
+
+    def fake_open(url, offset=0):
+        if url == "http://flaky/a":
+            release.wait(5)
+            raise MirrorError("gave up")
+        return Winner()
+
+    downloader.open = fake_open
+    try:
+        winner = downloader.race_first_segment(["http://flaky/a", "http://fast/a"])
+        assert winner["url"] == "http://fast/a"
+        assert scores.scores[download_manager.mirror_key("http://flaky/a")]["failures"] == 1
+    finally:
+        release.set()
+
+
+def test_all_mirrors_fail(tmp_path, mirrors):
+    broken = mirrors(status=404)
+    with pytest.raises(MirrorError):
+        make_downloader([broken.url], tmp_path).download(str(tmp_path / "installer.exe"))
+
+
+def test_download_is_preallocated(tmp_path, mirrors):
+    mirror = mirrors()
+    dest = tmp_path / "installer.exe"
+    sizes = []
+
+    make_downloader(mirror.url, tmp_path).download(str(dest), lambda done, total: sizes.append(os.path.getsize(dest)))
+
+    assert sizes[0] == len(PAYLOAD)
+    assert dest.read_bytes() == PAYLOAD
+
+
+def test_full_disk_fails_before_download(tmp_path, mirrors, monkeypatch):
+    slow = mirrors(bytes_per_second=256 * 1024)
+    monkeypatch.setattr(file_operations, "get_free_space", lambda path: 1024 * 1024)
+    downloader = make_downloader(slow.url, tmp_path)
+    responses = []
+    open_mirror = downloader.open
+    downloader.open = lambda url, offset=0: responses.append(open_mirror(url, offset)) or responses[-1]
+
+    start = time.monotonic()
+    with pytest.raises(InsufficientSpaceError):
+        downloader.download(str(tmp_path / "installer.exe"))
+    # Only the first segment was fetched, the whole file would take ~8s
+    assert time.monotonic() - start < 2
+    assert responses and responses[0].raw.closed
+
+
+def test_size_from_head_request(tmp_path, mirrors):
+    broken = mirrors(status=404)
+    working = mirrors()
+    assert make_downloader([broken.url, working.url], tmp_path).get_size() == len(PAYLOAD)
+    # Asking for the size downloads nothing
+    assert working.requests == []
+    assert make_downloader([broken.url], tmp_path).get_size() is None
+
+
+def test_scores_rank_known_mirrors(tmp_path):
+    scores = MirrorScores(str(tmp_path / "scores.json"))
+    scores.record_success("http://slow/a", latency=0.5, throughput=1000)
+    scores.record_success("http://fast/a", latency=0.1, throughput=5000)
+    scores.record_failure("http://dead/a")
+
+    assert scores.rank(["http://dead/a", "http://slow/b", "http://new/a", "http://fast/b"]) == [
+        "http://new/a", "http://fast/b", "http://slow/b", "http://dead/a",
+    ]
+
+
+def test_concurrent_score_savers_keep_each_others_updates(tmp_path):
+    path = str(tmp_path / "scores.json")
+    # Like a prefetch and an install, each with its own view of the file
+    savers = [MirrorScores(path) for _ in range(8)]
+    barrier = threading.Barrier(len(savers))
+
+    def record(i, scores):
+        for _ in range(5):
+            scores.record_failure(f"http://mirror{i}/a")
+            scores.record_failure("http://shared/a")
+        barrier.wait()
+        scores.save()
+
+    threads = [threading.Thread(target=record, args=(i, scores)) for i, scores in enumerate(savers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+
+    saved = MirrorScores(path).scores
+    assert all(saved[f"http://mirror{i}"]["failures"] == 5 for i in range(len(savers)))
+    assert saved["http://shared"]["failures"] == 5 * len(savers)
+    # No temp files left behind
+    assert sorted(os.listdir(tmp_path)) == ["scores.json", "scores.json.lock"]
+
+
+def test_downloaders_share_scores(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    assert MirrorDownloader("http://a/x").scores is MirrorDownloader("http://b/y").scores
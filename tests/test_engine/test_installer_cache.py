@@ -0,0 +1,161 @@
+"""FrozeCrate - Test Installer Cache"""
+
+import hashlib
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+from engine import download_manager
+from engine.installer_cache import InstallerCache, cache_installer, file_sha256, get_version_source
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def make_installer(tmp_path, name, data):
+    path = tmp_path / name
+    path.write_bytes(data)
+    return str(path)
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return InstallerCache(cache_dir=str(tmp_path / "cache"), max_size=1000)
+
+
+def test_add_and_get(tmp_path, cache):
+    path = make_installer(tmp_path, "gimp.exe", b"gimp installer")
+    sha256 = cache.add(path, "gimp", "2.10")
+
+    assert not os.path.exists(path)
+    assert cache.lookup("gimp", "2.10") == sha256
+    with open(cache.get("gimp", "2.10"), "rb") as f:
+        assert f.read() == b"gimp installer"
+    assert cache.get("gimp", "2.99") is None
+
+
+def test_identical_content_is_stored_once(tmp_path, cache):
+    first = cache.add(make_installer(tmp_path, "a.exe", b"same"), "app-a", "1")
+    second = cache.add(make_installer(tmp_path, "b.exe", b"same"), "app-b", "1")
+
+    assert first == second
+    refs = cache.load_index()["blobs"][first]["refs"]
+    assert refs == [{"app_id": "app-a", "version": "1"}, {"app_id": "app-b", "version": "1"}]
+    assert cache.total_size() == 4
+
+
+def test_checksum_mismatch(tmp_path, cache):
+    path = make_installer(tmp_path, "gimp.exe", b"tampered")
+    with pytest.raises(ValueError):
+        cache.add(path, "gimp", "2.10", expected_sha256="0" * 64)
+    assert cache.lookup("gimp", "2.10") is None
+
+
+def test_link_uses_hardlink(tmp_path, cache):
+    sha256 = cache.add(make_installer(tmp_path, "gimp.exe", b"gimp"), "gimp", "2.10")
+    dest = tmp_path / "downloads" / "gimp.exe"
+    cache.link(sha256, str(dest))
+
+    assert dest.read_bytes() == b"gimp"
+    assert os.path.samefile(dest, cache.blob_path(sha256))
+
+
+def test_lru_eviction_on_add(tmp_path, cache):
+    old = cache.add(make_installer(tmp_path, "a.exe", b"a" * 400), "a", "1")
+    time.sleep(0.01)
+    used = cache.add(make_installer(tmp_path, "b.exe", b"b" * 400), "b", "1")
+    time.sleep(0.01)
+    cache.get("a", "1")  # a is now the most recently used
+    time.sleep(0.01)
+    cache.add(make_installer(tmp_path, "c.exe", b"c" * 400), "c", "1")
+
+    assert cache.lookup("a", "1") == old
+    assert cache.lookup("b", "1") is None
+    assert not os.path.exists(cache.blob_path(used))
+    assert cache.total_size() == 800
+
+
+def test_prune(tmp_path, cache):
+    sha256 = cache.add(make_installer(tmp_path, "a.exe", b"a" * 100), "a", "1")
+    stray = os.path.join(cache.cache_dir, "blobs", "zz", "leftover")
+    os.makedirs(os.path.dirname(stray))
+    with open(stray, "wb") as f:
+        f.write(b"junk")
+
+    assert cache.prune() == []
+    assert not os.path.exists(stray)
+    assert cache.prune(0) == [sha256]
+    assert cache.versions("a") == []
+
+
+def test_concurrent_adds_keep_every_entry(tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    errors = []
+
+    def add_many(name):
+        # Separate instances, like an install and the prefetcher
+        cache = InstallerCache(cache_dir)
+        for i in range(100):
+            try:
+                cache.add(make_installer(tmp_path, f"{name}-{i}.exe", f"{name} {i}".encode()), name, str(i))
+            except Exception as e:
+                errors.append(e)
+
+    threads = [threading.Thread(target=add_many, args=(name,)) for name in ("a", "b", "c")]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    cache = InstallerCache(cache_dir)
+    assert errors == []
+    assert len(cache.load_index()["blobs"]) == 300
+    assert cache.prune() == []
+    assert all(len(cache.versions(name)) == 100 for name in ("a", "b", "c"))
+
+
+def test_concurrent_adds_across_processes(tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    script = (
+        "import sys\n"
+        "from engine.installer_cache import InstallerCache\n"
+        "cache = InstallerCache(sys.argv[1])\n"
+        "for i in range(50):\n"
+        "    path = f'{sys.argv[1]}-{sys.argv[2]}-{i}.exe'\n"
+        "    open(path, 'wb').write(f'{sys.argv[2]} {i}'.encode())\n"
+        "    cache.add(path, sys.argv[2], str(i))\n"
+    )
+    processes = [subprocess.Popen([sys.executable, "-c", script, cache_dir, name], cwd=REPO_ROOT)
+                 for name in ("a", "b")]
+    assert [process.wait(60) for process in processes] == [0, 0]
+
+    assert len(InstallerCache(cache_dir).load_index()["blobs"]) == 100
+
+
+def test_version_source():
+    app = {"id": "blender", "version": "4.0", "latest_version": "4.1",
+           "download_url": "http://mirror/blender-4.0.exe", "sha256": "a" * 64,
+           "downloads": {"4.1": {"download_url": "http://mirror/blender-4.1.exe", "sha256": "b" * 64},
+                         "4.2": {"download_url": "http://mirror/blender-4.2.exe"}}}
+
+    assert get_version_source(app) == (["http://mirror/blender-4.0.exe"], "a" * 64)
+    assert get_version_source(app, "4.1") == (["http://mirror/blender-4.1.exe"], "b" * 64)
+    assert get_version_source(app, "4.2") is None  # no checksum
+    assert get_version_source(app, "3.6") is None
+
+
+def test_catalog_download_is_not_cached_as_latest_version(tmp_path, cache, monkeypatch):
+    monkeypatch.setattr(download_manager, "download_file", lambda *a, **k: pytest.fail("downloaded"))
+    app = {"id": "blender", "version": "4.0", "latest_version": "4.1", "download_url": "http://mirror/blender.exe"}
+
+    assert cache_installer(app, "4.1", cache=cache) is None
+    assert cache.lookup("blender", "4.1") is None
+
+
+def test_file_sha256(tmp_path):
+    data = os.urandom(3 * 1024 * 1024 + 5)
+    path = make_installer(tmp_path, "big.exe", data)
+    assert file_sha256(path) == hashlib.sha256(data).hexdigest()
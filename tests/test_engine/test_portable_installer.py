@@ -0,0 +1,211 @@
+"""FrozeCrate - Test Portable Installer"""
+
+import io
+import os
+import time
+import zipfile
+
+import pytest
+
+from engine import download_manager, portable_installer
+from engine.installer_cache import InstallerCache
+from engine.portable_installer import ZipStreamExtractor, extract_zip, install_portable, safe_path
+
+FILES = {
+    "blender-4.1/blender.exe": os.urandom(300 * 1024),
+    "blender-4.1/readme.txt": b"hello " * 5000,
+    "blender-4.1/lib/python.dll": os.urandom(50 * 1024) + b"\0" * 200 * 1024,
+    "blender-4.1/empty.cfg": b"",
+}
+
+
+class Unseekable(io.RawIOBase):
+    """Forces zipfile to write data descriptors, like streaming zip tools do"""
+
+    def __init__(self):
+        self.data = bytearray()
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self.data += b
+        return len(b)
+
+
+def make_zip(compression=zipfile.ZIP_DEFLATED, seekable=True, force_zip64=False):
+    target = io.BytesIO() if seekable else Unseekable()
+    with zipfile.ZipFile(target, "w", compression=compression) as archive:
+        archive.writestr("blender-4.1/", b"")
+        for name, data in FILES.items():
+            info = zipfile.ZipInfo(name)
+            info.compress_type = compression
+            with archive.open(info, "w", force_zip64=force_zip64) as f:
+                f.write(data)
+    return bytes(target.getvalue() if seekable else target.data)
+
+
+def assert_extracted(root, prefix=""):
+    for name, data in FILES.items():
+        with open(os.path.join(root, name[len(prefix):]), "rb") as f:
+            assert f.read() == data
+
+
+@pytest.mark.parametrize("options", [
+    {},
+    {"compression": zipfile.ZIP_STORED},
+    {"seekable": False},
+    {"force_zip64": True},
+    {"seekable": False, "force_zip64": True},
+])
+def test_stream_extractor(tmp_path, options):
+    data = make_zip(**options)
+    extractor = ZipStreamExtractor(str(tmp_path))
+    for i in range(0, len(data), 7777):
+        extractor.feed(data[i:i + 7777])
+
+    assert extractor.failed is None
+    assert extractor.done
+    assert_extracted(tmp_path)
+    assert extractor.bytes_written == sum(len(d) for d in FILES.values())
+
+
+def test_stream_extractor_stops_on_unsupported_method(tmp_path):
+    extractor = ZipStreamExtractor(str(tmp_path))
+    extractor.feed(make_zip(compression=zipfile.ZIP_BZIP2))
+    assert extractor.failed
+    assert not [name for name in extractor.extracted if not name.endswith("/")]
+
+
+def test_safe_path_rejects_escapes(tmp_path):
+    assert safe_path(str(tmp_path), "a/b.txt") == os.path.join(str(tmp_path), "a", "b.txt")
+    for name in ("../evil.exe", "a/../../evil.exe", "/etc/passwd", "C:\\Windows\\evil.exe"):
+        with pytest.raises(ValueError):
+            safe_path(str(tmp_path), name)
+
+
+def test_extract_zip_in_parallel(tmp_path):
+    archive = tmp_path / "app.zip"
+    archive.write_bytes(make_zip())
+    files, size = extract_zip(str(archive), str(tmp_path / "out"), workers=4)
+
+    assert files == len(FILES)
+    assert size == sum(len(d) for d in FILES.values())
+    assert_extracted(tmp_path / "out")
+
+
+@pytest.fixture
+def serve_archive(monkeypatch, tmp_path):
+    """Fake download that writes the archive in chunks, like the real downloader"""
+    monkeypatch.chdir(tmp_path)
+    archives = {}
+
+    def fake_download(mirrors, dest_path, progress_callback=None, priority=None, preferred=None):
+        data = archives[mirrors[0]]
+        with open(dest_path, "wb") as f:
+            for i in range(0, len(data), 64 * 1024):
+                f.write(data[i:i + 64 * 1024])
+                f.flush()
+                if progress_callback:
+                    progress_callback(min(i + 64 * 1024, len(data)), len(data))
+        return dest_path
+
+    monkeypatch.setattr(download_manager, "download_file", fake_download)
+    return archives
+
+
+def make_app(url):
+    return {"id": "blender", "name": "Blender", "version": "4.1", "install_type": "portable", "download_url": url}
+
+
+def test_install_portable_streams_zip(tmp_path, serve_archive):
+    serve_archive["http://mirror/blender.zip"] = make_zip(seekable=False)
+    cache = InstallerCache(str(tmp_path / "cache"))
+    install_dir = tmp_path / "apps" / "blender"
+    progress = []
+
+    stats = install_portable(make_app("http://mirror/blender.zip"), install_dir=str(install_dir),
+                             progress_callback=lambda done, total: progress.append(done), cache=cache)
+
+    # The single top-level folder is stripped
+    assert_extracted(install_dir, prefix="blender-4.1/")
+    assert stats["streamed_files"] == len(FILES)
+    assert stats["files"] == len(FILES)
+    assert progress and progress[-1] == len(serve_archive["http://mirror/blender.zip"])
+    assert os.listdir(tmp_path / "apps") == ["blender"]
+
+
+@pytest.mark.parametrize("compression", [zipfile.ZIP_DEFLATED, zipfile.ZIP_BZIP2])
+def test_install_portable_times_extraction_separately(tmp_path, serve_archive, monkeypatch, compression):
+    serve_archive["http://mirror/blender.zip"] = make_zip(compression=compression)
+    fake_download = download_manager.download_file
+
+    def slow_download(*args, **kwargs):
+        time.sleep(0.5)
+        return fake_download(*args, **kwargs)
+
+    monkeypatch.setattr(download_manager, "download_file", slow_download)
+    stats = install_portable(make_app("http://mirror/blender.zip"), install_dir=str(tmp_path / "apps" / "blender"),
+                             cache=InstallerCache(str(tmp_path / "cache")))
+
+    assert stats["download_seconds"] >= 0.5
+    assert 0 < stats["extract_seconds"] < 0.5
+    assert stats["mb_per_s"] == pytest.approx(stats["bytes"] / (1024 ** 2) / stats["extract_seconds"])
+
+
+def test_install_portable_falls_back_when_stream_fails(tmp_path, serve_archive):
+    serve_archive["http://mirror/blender.zip"] = make_zip(compression=zipfile.ZIP_BZIP2)
+    install_dir = tmp_path / "apps" / "blender"
+
+    stats = install_portable(make_app("http://mirror/blender.zip"), install_dir=str(install_dir),
+                             cache=InstallerCache(str(tmp_path / "cache")))
+
+    assert stats["streamed_files"] == 0
+    assert (install_dir / "lib" / "python.dll").read_bytes() == FILES["blender-4.1/lib/python.dll"]
+
+
+def test_reinstall_replaces_previous_files(tmp_path, serve_archive):
+    serve_archive["http://mirror/blender.zip"] = make_zip()
+    install_dir = tmp_path / "apps" / "blender"
+    install_dir.mkdir(parents=True)
+    (install_dir / "stale.dll").write_bytes(b"old")
+    cache = InstallerCache(str(tmp_path / "cache"))
+
+    install_portable(make_app("http://mirror/blender.zip"), install_dir=str(install_dir), cache=cache)
+
+    assert not (install_dir / "stale.dll").exists()
+    assert sorted(os.listdir(tmp_path / "apps")) == ["blender"]
+
+    # Second install comes straight from the cache
+    serve_archive.clear()
+    install_portable(make_app("http://mirror/blender.zip"), install_dir=str(install_dir), cache=cache)
+    assert (install_dir / "readme.txt").exists()
+
+
+def test_install_portable_7z(tmp_path, serve_archive):
+    py7zr = pytest.importorskip("py7zr")
+    buffer = io.BytesIO()
+    with py7zr.SevenZipFile(buffer, "w") as archive:
+        for name, data in FILES.items():
+            archive.writef(io.BytesIO(data), name)
+    serve_archive["http://mirror/godot.7z"] = buffer.getvalue()
+    install_dir = tmp_path / "apps" / "godot"
+
+    stats = install_portable(make_app("http://mirror/godot.7z"), install_dir=str(install_dir),
+                             cache=InstallerCache(str(tmp_path / "cache")))
+
+    assert stats["files"] == len(FILES)
+    assert (install_dir / "blender.exe").read_bytes() == FILES["blender-4.1/blender.exe"]
+
+
+def test_rejects_non_archive(tmp_path):
+    with pytest.raises(ValueError):
+        install_portable(make_app("http://mirror/setup.exe"), install_dir=str(tmp_path / "x"),
+                         cache=InstallerCache(str(tmp_path / "cache")))
+
+
+def test_uninstall_portable(tmp_path):
+    install_dir = tmp_path / "blender"
+    install_dir.mkdir()
+    assert portable_installer.uninstall_portable({"id": "blender"}, str(install_dir)) is True
+    assert portable_installer.uninstall_portable({"id": "blender"}, str(install_dir)) is False
@@ -0,0 +1,176 @@
+"""FrozeCrate - Test Resource Monitor"""
+
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import time
+
+import psutil
+import pytest
+
+from engine import resource_monitor
+from engine.resource_monitor import MONITOR_INTERVAL, ResourceMonitor
+
+# A launcher-like parent that starts the real app as a child and waits for it
+PARENT = (
+    "import subprocess, sys; "
+    "subprocess.run([sys.executable, '-c', sys.argv[1]])"
+)
+def kill_children(process):
+    for child in psutil.Process(process.pid).children(recursive=True):
+        child.kill()
+
+
+SLEEPER = "import time; time.sleep(60)"
+BUSY = "import time\nend = time.time() + 60\nwhile time.time() < end: pass"
+
+
+@pytest.fixture
+def launch():
+    processes = []
+
+    def launch(child=SLEEPER, session=False):
+        process = subprocess.Popen([sys.executable, "-c", PARENT, child], start_new_session=session)
+        processes.append(process)
+        time.sleep(0.5)  # let the child start
+        return process
+
+    yield launch
+    for process in processes:
+        if process.poll() is None:
+            kill_children(process)
+            process.kill()
+        process.wait()
+
+
+@pytest.fixture
+def monitor(monkeypatch):
+    monitor = ResourceMonitor(interval=3600, history=5)
+    # Tests drive sample() themselves instead of the sampling thread
+    monkeypatch.setattr(monitor, "start", lambda: None)
+    return monitor
+
+
+def test_tracks_process_tree(monitor, launch):
+    pushed = []
+    monitor.subscribe(pushed.append)
+    assert monitor.track("blender", launch(BUSY))
+    monitor.sample()
+
+    time.sleep(0.5)
+    changes = monitor.sample()
+    sample = changes["blender"]
+    assert sample.processes == 2
+    assert sample.rss > 0
+    # The busy child, not the waiting parent, is what uses the CPU
+    assert sample.cpu_percent > 50 / resource_monitor.CPU_COUNT
+    assert pushed[-1] is changes
+
+
+def test_only_changed_values_pushed(monitor, launch):
+    pushed = []
+    monitor.subscribe(pushed.append)
+    monitor.track("kdenlive", launch())
+    first = monitor.sample()
+    assert "kdenlive" in first
+
+    time.sleep(0.2)
+    assert monitor.sample() == {}
+    assert len(pushed) == 1
+    assert len(monitor.history_for("kdenlive")) == 2
+
+
+def test_history_ring_buffer(monitor, launch):
+    monitor.track("gimp", launch())
+    for _ in range(8):
+        monitor.sample()
+    assert len(monitor.history_for("gimp")) == 5
+
+
+def test_exit_pushes_none(monitor, launch):
+    process = launch()
+    monitor.track("krita", process)
+    monitor.sample()
+
+    kill_children(process)
+    process.wait(10)
+    changes = monitor.sample()
+    assert changes == {"krita": None}
+    assert "krita" not in monitor.apps
+
+
+def test_late_child_found_on_rescan(monitor):
+    process = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(0.3); " + PARENT, SLEEPER])
+    try:
+        monitor.track("blender", process)
+        assert monitor.sample()["blender"].processes == 1
+
+        time.sleep(1)
+        for _ in range(monitor.child_scan_interval):
+            monitor.sample()
+        assert monitor.history_for("blender")[-1].processes == 2
+    finally:
+        kill_children(process)
+        process.kill()
+        process.wait()
+
+
+@pytest.mark.skipif(os.name != "posix", reason="sessions are POSIX")
+def test_app_outlives_launching_shell(monitor):
+    # Launched like launcher.launch_app, the shell exits right after starting the app
+    process = subprocess.Popen("sleep 0.3; sleep 20 & exit 0", shell=True, start_new_session=True)
+    try:
+        monitor.track("gimp", process)
+        monitor.sample()
+
+        process.wait(5)
+        time.sleep(0.2)
+        changes = monitor.sample()
+        assert changes["gimp"].processes == 1
+        assert "gimp" in monitor.apps
+    finally:
+        os.killpg(process.pid, signal.SIGKILL)
+        process.wait()
+
+
+def test_thread_stops_when_nothing_tracked(launch):
+    monitor = ResourceMonitor(interval=0.05)
+    monitor.track("krita", launch())
+    thread = monitor.thread
+    time.sleep(0.2)
+    assert thread.is_alive()
+
+    monitor.untrack("krita")
+    thread.join(5)
+    assert not thread.is_alive()
+    assert monitor.thread is None
+
+
+@pytest.fixture
+def crowded():
+    """A desktop-sized process table, the monitor's cost must not grow with it"""
+    sleep = shutil.which("sleep")
+    others = [subprocess.Popen([sleep, "60"]) for _ in range(400)] if sleep else []
+    yield
+    for process in others:
+        process.kill()
+        process.wait()
+
+
+def test_sampling_overhead(monitor, launch, crowded):
+    # Launched like launcher.launch_app, so the session check runs too
+    monitor.track("blender", launch(session=True))
+    monitor.track("kdenlive", launch(session=True))
+    samples = 20
+    for _ in range(samples):
+        monitor.sample()
+    # CPU spent per sample against the default interval, well under 1% of a core
+    assert monitor.cpu_time / (samples * MONITOR_INTERVAL) < 0.005
+
+
+def test_track_missing_process(monitor):
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    assert monitor.track("ghost", process) is False
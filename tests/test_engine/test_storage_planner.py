@@ -0,0 +1,109 @@
+"""FrozeCrate - Test Storage Planner"""
+
+import errno
+import os
+
+import pytest
+
+from config import save_settings
+from engine import download_manager, storage_planner
+from engine.installer_cache import InstallerCache
+from utils import file_operations
+from utils.file_operations import SPACE_MARGIN, InsufficientSpaceError, check_space, preallocate
+
+MB = 1024 * 1024
+
+
+@pytest.fixture
+def volumes(tmp_path, monkeypatch):
+    """Two fake volumes: the working directory (A) and tmp_path/volume_b (B)"""
+    (tmp_path / "volume_a").mkdir()
+    monkeypatch.chdir(tmp_path / "volume_a")
+    volume_b = tmp_path / "volume_b"
+    volume_b.mkdir()
+    free = {"a": 1000 * MB, "b": 1000 * MB}
+
+    def volume_of(path):
+        return "b" if os.path.abspath(path).startswith(str(volume_b)) else "a"
+
+    monkeypatch.setattr(file_operations, "get_volume_id", volume_of)
+    monkeypatch.setattr(storage_planner, "get_volume_id", volume_of)
+    monkeypatch.setattr(file_operations, "get_free_space", lambda path: free[volume_of(path)])
+    monkeypatch.setattr(storage_planner, "get_candidate_volumes", lambda: [str(volume_b)])
+    monkeypatch.setattr(storage_planner, "get_system_install_root", lambda: str(tmp_path / "volume_a"))
+    return {"free": free, "b": volume_b, "cache": InstallerCache(str(tmp_path / "volume_a" / "cache"))}
+
+
+def app(**fields):
+    return {"id": "blender", "version": "4.1", **fields}
+
+
+def test_plan_fits(volumes):
+    plan = storage_planner.plan_install(app(download_size=300 * MB, install_size=400 * MB), cache=volumes["cache"])
+    assert plan["download_size"] == 300 * MB
+    assert plan["install_size"] == 400 * MB
+    assert plan["install_dir"] is None
+
+
+def test_download_and_install_on_one_volume_add_up(volumes):
+    with pytest.raises(InsufficientSpaceError) as error:
+        storage_planner.plan_install(app(download_size=500 * MB, install_size=400 * MB), cache=volumes["cache"])
+    assert error.value.required == 900 * MB + SPACE_MARGIN
+
+
+def test_size_asked_from_mirrors_without_catalog_size(volumes, monkeypatch):
+    asked = []
+    monkeypatch.setattr(download_manager, "get_download_size", lambda mirrors: asked.append(mirrors) or 500 * MB)
+    with pytest.raises(InsufficientSpaceError) as error:
+        storage_planner.plan_install(app(download_url="http://mirror/blender.zip", install_size=400 * MB),
+                                     cache=volumes["cache"])
+    assert asked == [["http://mirror/blender.zip"]]
+    assert error.value.required == 900 * MB + SPACE_MARGIN
+
+
+def test_cached_installer_needs_no_download(volumes, monkeypatch):
+    monkeypatch.setattr(volumes["cache"], "lookup", lambda app_id, version: "abc")
+    plan = storage_planner.plan_install(app(download_size=500 * MB, install_size=400 * MB), cache=volumes["cache"])
+    assert plan["download_size"] == 0
+
+
+def test_cache_on_another_volume_counts_the_copy(volumes):
+    cache = InstallerCache(str(volumes["b"] / "cache"))
+    volumes["free"]["b"] = 400 * MB
+    with pytest.raises(InsufficientSpaceError) as error:
+        storage_planner.plan_install(app(download_size=300 * MB), cache=cache)
+    assert error.value.path == cache.cache_dir
+
+
+def test_portable_app_moves_to_roomier_volume(volumes):
+    volumes["free"].update(a=600 * MB, b=2000 * MB)
+    portable = app(install_type="portable", download_size=200 * MB, install_size=800 * MB)
+    plan = storage_planner.plan_install(portable, cache=volumes["cache"])
+    assert plan["install_dir"] == os.path.join(str(volumes["b"]), "FrozeCrate", "apps", "blender")
+
+    # An install location the user picked is never second-guessed
+    save_settings({"portable_install_dir": "apps"})
+    with pytest.raises(InsufficientSpaceError):
+        storage_planner.plan_install(portable, cache=volumes["cache"])
+
+
+def test_check_space_margin(volumes):
+    check_space([("data", 1000 * MB - SPACE_MARGIN)])
+    with pytest.raises(InsufficientSpaceError):
+        check_space([("data", 1000 * MB - SPACE_MARGIN + 1)])
+
+
+def test_preallocate(tmp_path, monkeypatch):
+    path = tmp_path / "installer.part"
+    with open(path, "wb") as f:
+        preallocate(f, 5 * MB)
+        f.write(b"head")
+    assert os.path.getsize(path) == 5 * MB
+
+    def full_disk(fd, offset, length):
+        raise OSError(errno.ENOSPC, "No space left on device")
+
+    monkeypatch.setattr(os, "posix_fallocate", full_disk, raising=False)
+    with open(path, "wb") as f:
+        with pytest.raises(InsufficientSpaceError):
+            preallocate(f, 5 * MB, str(path))
@@ -1,2 +1,272 @@
 """FrozeCrate - Test Update Checker"""
 
+import json
+import os
+import threading
+import time
+
+import pytest
+import requests
+
+from engine import update_checker
+from engine.update_checker import UpdateChecker, HASH_BACKENDS
+
+
+@pytest.mark.parametrize("algorithm", sorted(HASH_BACKENDS))
+def test_get_file_hash_matches_backend(tmp_path, algorithm):
+    data = os.urandom(3 * update_checker.HASH_BUFFER_SIZE + 17)
+    path = tmp_path / "app.db"
+    path.write_bytes(data)
+
+    expected = HASH_BACKENDS[algorithm]()
+    expected.update(data)
+
+    checker = UpdateChecker(hash_algorithm=algorithm)
+    assert checker.get_file_hash(str(path)) == expected.hexdigest()
+
+
+def test_get_file_hash_missing_file(tmp_path):
+    assert UpdateChecker().get_file_hash(str(tmp_path / "missing.db")) is None
+
+
+def test_unknown_hash_algorithm():
+    with pytest.raises(ValueError):
+        UpdateChecker(hash_algorithm="crc-nope")
+
+
+def test_get_file_hash_skips_unchanged_file(tmp_path, monkeypatch):
+    path = tmp_path / "app.db"
+    path.write_bytes(b"catalog" * 1000)
+    checker = UpdateChecker()
+    first = checker.get_file_hash(str(path))
+
+    def fail(*args, **kwargs):
+        raise AssertionError("unchanged file was hashed again")
+
+    monkeypatch.setitem(HASH_BACKENDS, checker.hash_algorithm, fail)
+    assert checker.get_file_hash(str(path)) == first
+
+
+def test_get_file_hash_rehashes_modified_file(tmp_path):
+    path = tmp_path / "app.db"
+    path.write_bytes(b"a" * 100)
+    checker = UpdateChecker()
+    first = checker.get_file_hash(str(path))
+
+    path.write_bytes(b"b" * 100)
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert checker.get_file_hash(str(path)) != first
+
+
+def test_compare_versions(tmp_path):
+    local = tmp_path / "app.db"
+    remote = tmp_path / "server_app.db"
+    local.write_bytes(b"same contents")
+    remote.write_bytes(b"same contents")
+    checker = UpdateChecker()
+
+    assert checker.compare_versions(str(local), str(remote)) is False
+
+    remote.write_bytes(b"diff contents")
+    assert checker.compare_versions(str(local), str(remote)) is True
+
+
+def test_compare_versions_size_mismatch_skips_hashing(tmp_path, monkeypatch):
+    local = tmp_path / "app.db"
+    remote = tmp_path / "server_app.db"
+    local.write_bytes(b"short")
+    remote.write_bytes(b"much longer contents")
+    checker = UpdateChecker()
+    monkeypatch.setattr(checker, "get_file_hash", lambda *a: pytest.fail("hashed"))
+
+    assert checker.compare_versions(str(local), str(remote)) is True
+
+
+def test_compare_versions_missing_files(tmp_path):
+    existing = tmp_path / "app.db"
+    existing.write_bytes(b"x")
+    checker = UpdateChecker()
+
+    assert checker.compare_versions(str(tmp_path / "nope.db"), str(existing)) is True
+    assert checker.compare_versions(str(existing), str(tmp_path / "nope.db")) is False
+
+
+class FakeResponse:
+    def __init__(self, payload, status_code=200, etag=None):
+        self.payload = payload
+        self.status_code = status_code
+        self.headers = {"ETag": etag} if etag else {}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"HTTP {self.status_code}")
+
+    def iter_content(self, chunk_size=1):
+        if self.payload is not None:
+            yield json.dumps(self.payload).encode()
+
+    def close(self):
+        pass
+
+
+def make_checker(tmp_path, repositories):
+    repos_file = tmp_path / "repositories.json"
+    repos_file.write_text(json.dumps(repositories))
+    checker = UpdateChecker()
+    checker.repositories_path = str(repos_file)
+    checker.repository_cache_dir = str(tmp_path / "cache")
+    checker.server_db_path = str(tmp_path / "server_app.db")
+    return checker
+
+
+def test_load_repositories_filters_and_orders(tmp_path):
+    checker = make_checker(tmp_path, {
+        "community": {"url": "http://community", "priority": 2},
+        "disabled": {"url": "http://off", "priority": 0, "enabled": False},
+        "official": {"url": "http://official", "priority": 1, "enabled": True},
+        "broken": {"enabled": True},
+    })
+    assert [repo["name"] for repo in checker.load_repositories()] == ["official", "community"]
+
+
+def test_load_repositories_falls_back_to_remote_url(tmp_path):
+    checker = make_checker(tmp_path, {})
+    assert [repo["url"] for repo in checker.load_repositories()] == [checker.remote_url]
+
+
+def test_download_remote_db_merges_by_priority(tmp_path, monkeypatch):
+    checker = make_checker(tmp_path, {
+        "public": {"url": "http://public", "priority": 2},
+        "internal": {"url": "http://internal", "priority": 1},
+    })
+    payloads = {
+        "http://public": [{"id": "gimp", "version": "2.10"}, {"id": "krita", "version": "5.2"}],
+        "http://internal": {"apps": [{"id": "gimp", "version": "2.10-patched"}, {"id": "tool", "version": "1"}]},
+    }
+    monkeypatch.setattr(requests, "get",
+                        lambda url, **kwargs: FakeResponse(payloads[url]))
+
+    assert checker.download_remote_db() is True
+    with open(checker.server_db_path) as f:
+        merged = json.load(f)
+    assert [(app["id"], app["version"], app["repository"]) for app in merged] == [
+        ("gimp", "2.10-patched", "internal"),
+        ("tool", "1", "internal"),
+        ("krita", "5.2", "public"),
+    ]
+
+
+def test_failing_repository_uses_cache(tmp_path, monkeypatch):
+    checker = make_checker(tmp_path, {
+        "public": {"url": "http://public", "priority": 1, "cache_ttl_minutes": 0},
+        "mirror": {"url": "http://mirror", "priority": 2, "cache_ttl_minutes": 0},
+    })
+    checker.save_repository_cache(checker.load_repositories()[1], [{"id": "cached-app"}])
+
+    def fake_get(url, **kwargs):
+        if url == "http://mirror":
+            raise requests.ConnectionError("mirror down")
+        return FakeResponse([{"id": "gimp"}])
+
+    monkeypatch.setattr(requests, "get", fake_get)
+    catalogs = checker.fetch_repositories(checker.load_repositories())
+    assert catalogs == {"public": [{"id": "gimp"}], "mirror": [{"id": "cached-app"}]}
+
+
+def test_stale_repository_is_served_without_waiting(tmp_path, monkeypatch):
+    checker = make_checker(tmp_path, {
+        "fast": {"url": "http://fast", "priority": 1},
+        "slow": {"url": "http://slow", "priority": 2, "cache_ttl_minutes": 0},
+    })
+    repos = checker.load_repositories()
+    checker.save_repository_cache(repos[1], [{"id": "stale"}])
+    release = threading.Event()
+
+    def fake_get(url, **kwargs):
+        if url == "http://slow":
+            release.wait(5)
+            return FakeResponse([{"id": "fresh"}])
+        return FakeResponse([{"id": "gimp"}])
+
+    monkeypatch.setattr(requests, "get", fake_get)
+    started = time.monotonic()
+    try:
+        catalogs = checker.fetch_repositories(repos)
+        assert time.monotonic() - started < 2
+        assert catalogs == {"fast": [{"id": "gimp"}], "slow": [{"id": "stale"}]}
+        assert checker.stale_repositories == ["slow"]
+        # A check that served a stale catalog is repeated next time
+        checker.last_check_file = str(tmp_path / "last_update_check.json")
+        checker.update_last_check_time()
+        assert not os.path.exists(checker.last_check_file)
+    finally:
+        release.set()
+
+    # The background revalidation refreshes the cache for the next sync
+    assert checker.revalidations["slow"].result(5)["apps"] == [{"id": "fresh"}]
+    assert checker.load_repository_cache(repos[1])["apps"] == [{"id": "fresh"}]
+
+
+def test_revalidation_finished_during_sync_is_used(tmp_path, monkeypatch):
+    checker = make_checker(tmp_path, {
+        "new": {"url": "http://new", "priority": 1},
+        "old": {"url": "http://old", "priority": 2, "cache_ttl_minutes": 0},
+    })
+    repos = checker.load_repositories()
+    checker.save_repository_cache(repos[1], [{"id": "stale"}])
+
+    def fake_get(url, **kwargs):
+        if url == "http://new":
+            time.sleep(0.3)  # the uncached repository keeps the sync running
+            return FakeResponse([{"id": "gimp"}])
+        return FakeResponse([{"id": "fresh"}])
+
+    monkeypatch.setattr(requests, "get", fake_get)
+    assert checker.fetch_repositories(repos) == {"new": [{"id": "gimp"}], "old": [{"id": "fresh"}]}
+    assert checker.stale_repositories == []
+
+
+def test_uncached_slow_repository_is_left_out(tmp_path, monkeypatch):
+    checker = make_checker(tmp_path, {
+        "fast": {"url": "http://fast", "priority": 1},
+        "slow": {"url": "http://slow", "priority": 2},
+    })
+    checker.fetch_deadline = 0.2
+    release = threading.Event()
+
+    def fake_get(url, **kwargs):
+        if url == "http://slow":
+            release.wait(5)
+        return FakeResponse([{"id": "gimp"}])
+
+    monkeypatch.setattr(requests, "get", fake_get)
+    try:
+        assert checker.fetch_repositories(checker.load_repositories()) == {"fast": [{"id": "gimp"}]}
+    finally:
+        release.set()
+
+
+def test_fresh_cache_skips_network(tmp_path, monkeypatch):
+    checker = make_checker(tmp_path, {"main_repo": {"url": "http://main"}})
+    repo = checker.load_repositories()[0]
+    checker.save_repository_cache(repo, [{"id": "gimp"}])
+    monkeypatch.setattr(requests, "get", lambda *a, **k: pytest.fail("fetched"))
+
+    assert checker.fetch_repositories([repo]) == {"main_repo": [{"id": "gimp"}]}
+
+
+def test_not_modified_keeps_cached_catalog(tmp_path, monkeypatch):
+    checker = make_checker(tmp_path, {"main_repo": {"url": "http://main", "cache_ttl_minutes": 0}})
+    repo = checker.load_repositories()[0]
+    checker.save_repository_cache(repo, [{"id": "gimp"}], etag='"v1"')
+    seen = {}
+
+    def fake_get(url, headers=None, **kwargs):
+        seen.update(headers or {})
+        return FakeResponse(None, status_code=304)
+
+    monkeypatch.setattr(requests, "get", fake_get)
+    assert checker.fetch_repositories([repo]) == {"main_repo": [{"id": "gimp"}]}
+    assert checker.revalidations["main_repo"].result(5)["apps"] == [{"id": "gimp"}]
+    assert seen["If-None-Match"] == '"v1"'
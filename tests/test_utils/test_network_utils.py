@@ -0,0 +1,87 @@
+"""FrozeCrate - Test Network Utils"""
+
+import threading
+import time
+
+from utils import network_utils
+from utils.network_utils import (
+    PRIORITY_INSTALL, PRIORITY_PREFETCH, PRIORITY_SYNC, BandwidthLimiter, TokenBucket, iter_limited,
+)
+
+MB = 1024 * 1024
+
+
+def consume(limiter, total, priority, chunk=64 * 1024):
+    start = time.monotonic()
+    for _ in range(total // chunk):
+        limiter.acquire(chunk, priority)
+    return time.monotonic() - start
+
+
+def test_unlimited_does_not_block():
+    assert consume(BandwidthLimiter(), 100 * MB, PRIORITY_INSTALL) < 0.5
+
+
+def test_global_rate_limit():
+    limiter = BandwidthLimiter(rate=2 * MB)
+    # The first 2 MB are the burst, the next 1 MB has to wait ~0.5s
+    elapsed = consume(limiter, 3 * MB, PRIORITY_INSTALL)
+    assert 0.35 < elapsed < 1.5
+
+
+def test_limited_iterator_reports_wait_time(monkeypatch):
+    class Response:
+        def iter_content(self, chunk_size):
+            for _ in range(3 * MB // chunk_size):
+                yield b"x" * chunk_size
+
+    monkeypatch.setattr(network_utils, "_limiter", BandwidthLimiter(rate=2 * MB))
+    chunks = iter_limited(Response(), PRIORITY_INSTALL, 64 * 1024)
+    start = time.monotonic()
+    assert sum(len(chunk) for chunk in chunks) == 3 * MB
+    assert 0.35 < chunks.waited <= time.monotonic() - start
+
+
+def test_bucket_debt_for_large_chunks():
+    bucket = TokenBucket(rate=1000)
+    now = time.monotonic()
+    bucket.consume(3000)
+    assert 1.9 < bucket.wait_time(now) < 2.1
+
+
+def test_background_cap_only_applies_to_background():
+    limiter = BandwidthLimiter(background_rate=MB)
+    assert consume(limiter, 3 * MB, PRIORITY_INSTALL) < 0.3
+    assert consume(limiter, 2 * MB, PRIORITY_SYNC) > 0.6
+
+
+def test_background_backs_off_while_install_runs():
+    limiter = BandwidthLimiter(busy_background_rate=256 * 1024)
+    assert consume(limiter, MB, PRIORITY_PREFETCH) < 0.3
+
+    limiter.acquire(1024, PRIORITY_INSTALL)
+    # Burst of 256 KB, the remaining 256 KB take ~1s at the busy cap
+    assert consume(limiter, 512 * 1024, PRIORITY_PREFETCH) > 0.7
+
+
+def test_install_goes_before_waiting_background():
+    limiter = BandwidthLimiter(rate=MB)
+    limiter.acquire(2 * MB, PRIORITY_INSTALL)  # drain the burst and go 1s into debt
+    order = []
+
+    def worker(priority, delay):
+        time.sleep(delay)
+        limiter.acquire(256 * 1024, priority)
+        order.append(priority)
+
+    threads = [
+        threading.Thread(target=worker, args=(PRIORITY_PREFETCH, 0)),
+        threading.Thread(target=worker, args=(PRIORITY_SYNC, 0.02)),
+        threading.Thread(target=worker, args=(PRIORITY_INSTALL, 0.04)),
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+
+    assert order == [PRIORITY_INSTALL, PRIORITY_SYNC, PRIORITY_PREFETCH]
@@ -1,2 +1,103 @@
 """FrozeCrate - Status Panel"""
 
+from PySide6.QtCore import QObject, QPointF, Qt, Signal
+from PySide6.QtGui import QColor, QPainter, QPen, QPolygonF
+from PySide6.QtWidgets import QHBoxLayout, QLabel, QVBoxLayout, QWidget
+
+from engine.resource_monitor import MB, get_monitor
+
+
+class Sparkline(QWidget):
+    """Small line chart of recent CPU usage"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.values = []
+        self.setFixedSize(120, 28)
+
+    def set_values(self, values):
+        self.values = values
+        self.update()
+
+    def paintEvent(self, event):
+        if len(self.values) < 2:
+            return
+        width, height = self.width(), self.height()
+        peak = max(max(self.values), 1.0)
+        step = width / (len(self.values) - 1)
+        points = QPolygonF([
+            QPointF(i * step, height - 1 - value / peak * (height - 2))
+            for i, value in enumerate(self.values)
+        ])
+        painter = QPainter(self)
+        painter.setRenderHint(QPainter.Antialiasing)
+        painter.setPen(QPen(QColor("#4a90d9"), 1.5))
+        painter.drawPolyline(points)
+
+
+class AppUsageRow(QWidget):
+    def __init__(self, name, parent=None):
+        super().__init__(parent)
+        layout = QHBoxLayout(self)
+        layout.setContentsMargins(4, 2, 4, 2)
+
+        self.name_label = QLabel(name)
+        self.name_label.setStyleSheet("font-weight: bold;")
+        self.cpu_label = QLabel()
+        self.ram_label = QLabel()
+        self.io_label = QLabel()
+        self.sparkline = Sparkline()
+
+        layout.addWidget(self.name_label, 1)
+        for label in (self.cpu_label, self.ram_label, self.io_label):
+            label.setMinimumWidth(80)
+            label.setAlignment(Qt.AlignRight | Qt.AlignVCenter)
+            layout.addWidget(label)
+        layout.addWidget(self.sparkline)
+
+    def show_sample(self, sample, cpu_history):
+        self.cpu_label.setText(f"CPU {sample.cpu_percent:.1f}%")
+        self.ram_label.setText(f"RAM {sample.rss / MB:.0f} MB")
+        self.io_label.setText("I/O n/a" if sample.io_rate is None else f"I/O {sample.io_rate / 1024:.0f} KB/s")
+        self.sparkline.set_values(cpu_history)
+
+
+class MonitorBridge(QObject):
+    # Monitor callbacks run on its sampling thread, the signal delivers them on the GUI thread
+    changed = Signal(dict)
+
+
+class StatusPanel(QWidget):
+    """Live CPU, memory and I/O of apps launched from FrozeCrate"""
+
+    def __init__(self, monitor=None, app_names=None, parent=None):
+        super().__init__(parent)
+        self.monitor = monitor or get_monitor()
+        self.app_names = app_names or {}
+        self.rows = {}
+
+        self.layout = QVBoxLayout(self)
+        self.layout.setAlignment(Qt.AlignTop)
+        self.empty_label = QLabel("No running apps")
+        self.layout.addWidget(self.empty_label)
+
+        self.bridge = MonitorBridge()
+        self.bridge.changed.connect(self.apply_changes)
+        self.unsubscribe = self.monitor.subscribe(self.bridge.changed.emit)
+        self.destroyed.connect(lambda: self.unsubscribe())
+
+    def apply_changes(self, changes):
+        """Only rows whose values changed are touched, so only they repaint"""
+        for app_id, sample in changes.items():
+            row = self.rows.get(app_id)
+            if sample is None:
+                if row is not None:
+                    self.layout.removeWidget(row)
+                    row.deleteLater()
+                    del self.rows[app_id]
+                continue
+            if row is None:
+                row = self.rows[app_id] = AppUsageRow(self.app_names.get(app_id, app_id))
+                self.layout.addWidget(row)
+            row.show_sample(sample, [s.cpu_percent for s in self.monitor.history_for(app_id)])
+        self.empty_label.setVisible(not self.rows)
@@ -1,2 +1,112 @@
 """FrozeCrate - File Operations"""
 
+import errno
+import os
+import shutil
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+MB = 1024 * 1024
+SPACE_MARGIN = 256 * MB  # left free on every volume for the OS and temp files
+
+
+class InsufficientSpaceError(Exception):
+    """Raised before a download or install that would not fit on its volume"""
+
+    def __init__(self, path, required, available):
+        self.path = path
+        self.required = required
+        self.available = available
+        super().__init__(
+            f"Not enough space on the volume of {path}: "
+            f"{required / MB:.0f} MB needed, {available / MB:.0f} MB free"
+        )
+
+
+def existing_parent(path):
+    """The path itself or its nearest existing parent directory"""
+    path = os.path.abspath(path)
+    while not os.path.exists(path):
+        parent = os.path.dirname(path)
+        if parent == path:
+            break
+        path = parent
+    return path
+
+
+def get_free_space(path):
+    return shutil.disk_usage(existing_parent(path)).free
+
+
+def get_volume_id(path):
+    return os.stat(existing_parent(path)).st_dev
+
+
+def check_space(requirements):
+    """
+    requirements is a list of (path, bytes). Paths on the same volume are
+    added up. Raises InsufficientSpaceError for the first volume short of room.
+    """
+    volumes = {}
+    for path, size in requirements:
+        if not size:
+            continue
+        volume = volumes.setdefault(get_volume_id(path), [path, 0])
+        volume[1] += size
+    for path, required in volumes.values():
+        available = get_free_space(path)
+        if required + SPACE_MARGIN > available:
+            raise InsufficientSpaceError(path, required + SPACE_MARGIN, available)
+
+
+@contextmanager
+def file_lock(path):
+    """Exclusive lock on path that other processes respect, held for the block"""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "a+b") as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            while True:
+                f.seek(0)
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    pass  # LK_LOCK gives up after 10 seconds, keep waiting
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def preallocate(f, size, path=None):
+    """
+    Reserve size bytes for an open file so a full disk fails now and the file
+    is laid out in one piece. Where the platform can't reserve space the file
+    is extended instead (allocated on NTFS, sparse elsewhere).
+    """
+    fd = f.fileno()
+    try:
+        if hasattr(os, "posix_fallocate"):
+            try:
+                os.posix_fallocate(fd, 0, size)
+                return
+            except OSError as e:
+                if e.errno not in (errno.EOPNOTSUPP, errno.EINVAL):
+                    raise
+        os.ftruncate(fd, size)
+    except OSError as e:
+        if e.errno in (errno.ENOSPC, errno.EFBIG, getattr(errno, "EDQUOT", errno.ENOSPC)):
+            target = path or getattr(f, "name", "download")
+            raise InsufficientSpaceError(target, size, get_free_space(target)) from e
+        raise
@@ -1,2 +1,9 @@
 """FrozeCrate - Logger"""
 
+from datetime import datetime
+
+
+def log_event(message, level="INFO"):
+    """Print a timestamped log line"""
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    print(f"[{timestamp}] {level}: {message}")
@@ -1,2 +1,189 @@
 """FrozeCrate - Network Utils"""
 
+import threading
+import time
+
+import requests
+
+# Download priorities, lower runs first
+PRIORITY_INSTALL = 0   # user-initiated installs and updates
+PRIORITY_SYNC = 1      # catalog syncs and release lookups
+PRIORITY_PREFETCH = 2  # speculative background downloads
+
+BUSY_WINDOW = 2.0  # seconds a foreground transfer counts as active after its last chunk
+READ_CHUNK_SIZE = 64 * 1024
+
+
+class TokenBucket:
+    """Token bucket in bytes/s; rate 0 means unlimited.
+
+    The bucket may go into debt so a chunk larger than the burst size still
+    passes, the following callers then wait for the debt to be paid off.
+    """
+
+    def __init__(self, rate=0, burst=1.0):
+        self.burst = burst
+        self.set_rate(rate)
+
+    def set_rate(self, rate):
+        self.rate = max(0, rate)
+        self.capacity = self.rate * self.burst
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def refill(self, now):
+        if self.rate:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now):
+        """Seconds until the bucket can hand out tokens again"""
+        if not self.rate:
+            return 0
+        self.refill(now)
+        return 0 if self.tokens > 0 else -self.tokens / self.rate
+
+    def consume(self, nbytes):
+        if self.rate:
+            self.tokens -= nbytes
+
+
+class BandwidthLimiter:
+    """Global download rate limiter shared by every transfer.
+
+    Callers report each chunk they read with acquire(), which blocks as long as
+    the transfer is over its cap. Higher priority waiters always go first, and
+    while a PRIORITY_INSTALL transfer is running lower priorities are held to
+    the busy cap so background work backs off on its own.
+    """
+
+    def __init__(self, rate=0, background_rate=0, busy_background_rate=0):
+        self.condition = threading.Condition()
+        self.total = TokenBucket(rate)
+        self.background = TokenBucket(background_rate)
+        self.busy = TokenBucket(busy_background_rate)
+        self.waiting = {}
+        self.last_foreground = None
+
+    def configure(self, rate=0, background_rate=0, busy_background_rate=0):
+        """Change the caps (bytes/s) of a running limiter"""
+        with self.condition:
+            self.total.set_rate(rate)
+            self.background.set_rate(background_rate)
+            self.busy.set_rate(busy_background_rate)
+            self.condition.notify_all()
+
+    def foreground_active(self, now=None):
+        if self.waiting.get(PRIORITY_INSTALL):
+            return True
+        if self.last_foreground is None:
+            return False
+        return (now or time.monotonic()) - self.last_foreground < BUSY_WINDOW
+
+    def buckets_for(self, priority, now):
+        buckets = [self.total]
+        if priority > PRIORITY_INSTALL:
+            buckets.append(self.background)
+            if self.foreground_active(now):
+                buckets.append(self.busy)
+        return buckets
+
+    def acquire(self, nbytes, priority=PRIORITY_INSTALL):
+        """Account for nbytes received, sleeping while the transfer is over its cap.
+
+        Returns the seconds spent waiting.
+        """
+        start = time.monotonic()
+        with self.condition:
+            self.waiting[priority] = self.waiting.get(priority, 0) + 1
+            try:
+                while True:
+                    now = time.monotonic()
+                    if any(count for p, count in self.waiting.items() if p < priority):
+                        self.condition.wait(0.05)
+                        continue
+                    buckets = self.buckets_for(priority, now)
+                    delay = max(bucket.wait_time(now) for bucket in buckets)
+                    if delay <= 0:
+                        for bucket in buckets:
+                            bucket.consume(nbytes)
+                        break
+                    self.condition.wait(delay)
+                if priority == PRIORITY_INSTALL:
+                    self.last_foreground = time.monotonic()
+            finally:
+                self.waiting[priority] -= 1
+                self.condition.notify_all()
+        return time.monotonic() - start
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+BANDWIDTH_SETTINGS = ("download_limit_kbps", "background_limit_kbps", "busy_background_limit_kbps")
+
+
+def get_limiter():
+    """Return the process-wide limiter, configured from the settings and kept in sync with them"""
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            from config import subscribe
+            _limiter = BandwidthLimiter()
+            configure_limiter()
+            subscribe(lambda changed: configure_limiter() if set(changed) & set(BANDWIDTH_SETTINGS) else None)
+    return _limiter
+
+
+def configure_limiter(settings=None):
+    """Apply the bandwidth settings (in KB/s) to the shared limiter"""
+    if settings is None:
+        from config import load_settings
+        settings = load_settings()
+    limiter = _limiter or get_limiter()
+    limiter.configure(
+        int(settings.get("download_limit_kbps", 0)) * 1024,
+        int(settings.get("background_limit_kbps", 0)) * 1024,
+        int(settings.get("busy_background_limit_kbps", 0)) * 1024,
+    )
+    return limiter
+
+
+class LimitedIterator:
+    """Chunks of a streamed response, throttled by the shared limiter.
+
+    waited is the time spent held back by the limiter, which callers judging
+    the speed of the other end must leave out.
+    """
+
+    def __init__(self, response, priority, chunk_size=READ_CHUNK_SIZE):
+        self.chunks = response.iter_content(chunk_size=chunk_size)
+        self.priority = priority
+        self.limiter = get_limiter()
+        self.waited = 0.0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        chunk = next(self.chunks)
+        while not chunk:
+            chunk = next(self.chunks)
+        self.waited += self.limiter.acquire(len(chunk), self.priority)
+        return chunk
+
+
+def iter_limited(response, priority, chunk_size=READ_CHUNK_SIZE):
+    """Iterate over a streamed response, throttled by the shared limiter"""
+    return LimitedIterator(response, priority, chunk_size)
+
+
+def limited_get(url, priority, **kwargs):
+    """GET a URL through the shared limiter; returns (response, content)"""
+    response = requests.get(url, stream=True, **kwargs)
+    try:
+        content = b"".join(iter_limited(response, priority))
+    finally:
+        response.close()
+    return response, content